@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+FIS 3.2 负载生成器 - 模拟 N 个父代理 × M 个子代理的完整任务流
+
+每个 ticket 一条流程 (线程池并发执行)：
+    create_task → 子代理 "工作" (随机耗时) → 写交付物到 workspace-<agent>/output → verify → complete
+
+- 按 --rate 匀速派发 (0 表示不限速)；线程池排满时记录排队时间，用于判断容量上限
+- 交付物大小按类型取对数正态分布 (报告几 KB、数据几十 KB、图片上百 KB)
+- 离线运行：临时 HOME + openclaw stub (见 offline.py)，不会发送任何消息
+- 每个阶段记录延迟直方图，整轮记录一次端到端吞吐 (完成 ticket 数 / 总耗时)，输出 JSON，可与不同 hub 布局 / 锁 / 索引方案对比
+
+用法：
+    python3 benchmarks/load_generator.py --parents 4 --agents 40 --tickets 2000 --rate 50 --concurrency 16
+    python3 benchmarks/load_generator.py --tickets 200 --badges          # 同时渲染工牌 (需要 Pillow)
+"""
+
+import argparse
+import contextlib
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from offline import has_pillow, setup_offline_home
+
+ROLES = ['worker', 'researcher', 'reviewer', 'formatter']
+
+# 交付物类型：(文件名, 对数正态中位数字节, sigma)
+DELIVERABLES = [
+    ("report.md", 8 * 1024, 0.8),
+    ("data.json", 32 * 1024, 1.2),
+    ("analysis.py", 4 * 1024, 0.7),
+    ("chart.png", 120 * 1024, 0.9),
+    ("summary.txt", 2 * 1024, 0.6),
+]
+MAX_DELIVERABLE_BYTES = 16 * 1024 * 1024
+
+# 延迟直方图上界 (ms)
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000)
+STAGES = ('queue', 'create', 'work', 'deliver', 'verify', 'complete', 'end_to_end')
+
+
+class LatencyRecorder:
+    """各阶段延迟样本 (线程安全)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {stage: [] for stage in STAGES}
+        self.errors = {}
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.samples[stage].append(seconds)
+
+    def error(self, stage, exc):
+        with self._lock:
+            key = f"{stage}: {type(exc).__name__}"
+            self.errors[key] = self.errors.get(key, 0) + 1
+
+    def summary(self):
+        report = {}
+        for stage, samples in self.samples.items():
+            if not samples:
+                continue
+            samples = sorted(samples)
+            n = len(samples)
+            buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+            for s in samples:
+                ms = s * 1000
+                for i, bound in enumerate(LATENCY_BUCKETS_MS):
+                    if ms <= bound:
+                        buckets[i] += 1
+                        break
+                else:
+                    buckets[-1] += 1
+            report[stage] = {
+                'count': n,
+                'mean_ms': round(sum(samples) / n * 1000, 3),
+                'p50_ms': round(samples[n // 2] * 1000, 3),
+                'p90_ms': round(samples[min(n - 1, int(n * 0.90))] * 1000, 3),
+                'p99_ms': round(samples[min(n - 1, int(n * 0.99))] * 1000, 3),
+                'max_ms': round(samples[-1] * 1000, 3),
+                'histogram_ms': {**{str(b): c for b, c in zip(LATENCY_BUCKETS_MS, buckets)}, '+Inf': buckets[-1]},
+            }
+        return report
+
+
+def deliverable_size(rng, median, sigma):
+    return max(1, min(MAX_DELIVERABLE_BYTES, int(rng.lognormvariate(math.log(median), sigma))))
+
+
+def write_deliverables(output_dir, ticket_id, requirements, rng):
+    """按要求写入交付物 (文件名带 ticket 后缀，同一 agent 的多个任务互不覆盖)，返回总字节"""
+    from fis_ids import ticket_token
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    suffix = (ticket_token(ticket_id) or ticket_id)[-6:]
+    total = 0
+    for name, median, sigma in requirements:
+        size = deliverable_size(rng, median, sigma)
+        stem, ext = os.path.splitext(name)
+        # 图片写随机字节 (不可压缩)，文本写重复内容
+        data = os.urandom(size) if ext == '.png' else (b"lorem ipsum dolor sit amet\n" * (size // 27 + 1))[:size]
+        (output_dir / f"{stem}_{suffix}{ext}").write_bytes(data)
+        total += size
+    return total
+
+
+def run_load(args, home, log):
+    from fis_lifecycle import SubAgentLifecycle
+
+    recorder = LatencyRecorder()
+    parents = [SubAgentLifecycle(f"parent-{p}") for p in range(args.parents)]
+    agents = [f"sim-{a:04d}" for a in range(args.agents)]
+    bytes_written = [0]
+    bytes_lock = threading.Lock()
+
+    def ticket_flow(i, scheduled):
+        rng = random.Random(args.seed * 1_000_003 + i)
+        start = time.perf_counter()
+        recorder.add('queue', start - scheduled)
+        lifecycle = parents[i % len(parents)]
+        agent = agents[i % len(agents)]
+        requirements = rng.sample(DELIVERABLES, rng.randint(1, 3))
+        stage = 'create'
+        try:
+            t = time.perf_counter()
+            ticket_id, _ = lifecycle.create_task(
+                agent, f"Load test task {i}: 汇总 {agent} 的模拟输出", ROLES[i % len(ROLES)],
+                [name for name, _, _ in requirements], args.deadline_days, args.timeout_minutes)
+            recorder.add('create', time.perf_counter() - t)
+
+            stage = 'work'
+            t = time.perf_counter()
+            time.sleep(rng.expovariate(1000 / args.work_ms) if args.work_ms > 0 else 0)
+            recorder.add('work', time.perf_counter() - t)
+
+            stage = 'deliver'
+            t = time.perf_counter()
+            output_dir = home / ".openclaw" / f"workspace-{agent.lower()}" / "output"
+            size = write_deliverables(output_dir, ticket_id, requirements, rng)
+            recorder.add('deliver', time.perf_counter() - t)
+            with bytes_lock:
+                bytes_written[0] += size
+
+            stage = 'verify'
+            t = time.perf_counter()
+            lifecycle.verify_deliverables(ticket_id)
+            recorder.add('verify', time.perf_counter() - t)
+
+            stage = 'complete'
+            t = time.perf_counter()
+            if not lifecycle.complete_task(ticket_id, auto_collect=not args.no_collect, force=True):
+                raise RuntimeError(f"complete_task returned False for {ticket_id}")
+            recorder.add('complete', time.perf_counter() - t)
+            recorder.add('end_to_end', time.perf_counter() - start)
+        except Exception as e:
+            recorder.error(stage, e)
+
+    interval = 1.0 / args.rate if args.rate > 0 else 0.0
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        for i in range(args.tickets):
+            scheduled = started + i * interval
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(ticket_flow, i, max(scheduled, started))
+            if args.progress and (i + 1) % args.progress == 0:
+                log(f"  dispatched {i + 1}/{args.tickets} ({time.perf_counter() - started:.1f}s)")
+    elapsed = time.perf_counter() - started
+
+    total, _ = parents[0].index.query(limit=0)
+    completed, _ = parents[0].index.query(state='completed', limit=0)
+    # 吞吐量只按整轮计算一次：各阶段共用同一时间窗口，分阶段的 n/elapsed 没有意义
+    finished = len(recorder.samples['end_to_end'])
+    return {
+        'elapsed_s': round(elapsed, 3),
+        'throughput_per_s': round(finished / elapsed, 2) if elapsed else None,
+        'stages': recorder.summary(),
+        'errors': recorder.errors,
+        'hub': {'tickets': total, 'completed': completed, 'deliverable_bytes': bytes_written[0]},
+    }
+
+
+def print_summary(report, log):
+    log(f"\n  {'stage':<12} {'count':>7} {'p50 ms':>10} {'p90 ms':>10} {'p99 ms':>10} {'max ms':>10}")
+    for stage, s in report['stages'].items():
+        log(f"  {stage:<12} {s['count']:>7} {s['p50_ms']:>10.2f} "
+            f"{s['p90_ms']:>10.2f} {s['p99_ms']:>10.2f} {s['max_ms']:>10.2f}")
+    hub = report['hub']
+    log(f"\n  hub: {hub['tickets']} tickets ({hub['completed']} completed), "
+        f"{hub['deliverable_bytes'] / 1024 / 1024:.1f} MB deliverables, {report['elapsed_s']}s, "
+        f"{report['throughput_per_s']} tickets/s end-to-end")
+    for key, count in report['errors'].items():
+        log(f"  ⚠️ {count} × {key}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FIS 3.2 Synthetic Fleet Load Generator")
+    parser.add_argument('--parents', type=int, default=4, help='Parent agents (one SubAgentLifecycle each)')
+    parser.add_argument('--agents', type=int, default=40, help='Simulated subagents (tickets round-robin)')
+    parser.add_argument('--tickets', type=int, default=500, help='Tickets to run end to end')
+    parser.add_argument('--rate', type=float, default=0, help='Tickets dispatched per second (0 = unthrottled)')
+    parser.add_argument('--concurrency', type=int, default=16, help='Concurrent ticket flows')
+    parser.add_argument('--work-ms', type=float, default=50, help='Mean simulated agent work time (exponential)')
+    parser.add_argument('--deadline-days', type=float, default=1)
+    parser.add_argument('--timeout-minutes', type=int, default=None)
+    parser.add_argument('--no-collect', action='store_true', help='Do not copy deliverables into results/')
+    parser.add_argument('--badges', action='store_true', help='Render badges too (needs Pillow)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--progress', type=int, default=0, help='Print progress every N dispatched tickets')
+    parser.add_argument('--output', default='load_results.json', help='Result JSON path')
+    parser.add_argument('--keep-home', action='store_true', help='Keep the offline HOME for inspection')
+    args = parser.parse_args()
+
+    if args.badges and not has_pillow():
+        print("⚠️ Pillow not installed: running without badges")
+        args.badges = False
+    home = setup_offline_home(link_skill=args.badges)
+
+    console = sys.stdout
+
+    def log(message):
+        print(message, file=console, flush=True)
+
+    log(f"🏁 FIS load: {args.parents} parents × {args.agents} agents, {args.tickets} tickets, "
+        f"rate {args.rate or '∞'}/s, concurrency {args.concurrency} (offline HOME: {home})")
+
+    # 被测代码的 emoji 输出全部丢弃 (线程共享 stdout)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        report = run_load(args, home, log)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+        },
+        'config': vars(args),
+        **report,
+    }
+    print_summary(report, log)
+    Path(args.output).write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    log(f"\n✅ Results: {args.output}")
+
+    if args.keep_home:
+        log(f"📁 Hub kept at {home}")
+    else:
+        shutil.rmtree(home, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
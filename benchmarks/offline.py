@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+FIS 3.2 离线测试环境 - 供 benchmark / 负载生成使用
+
+- 独立的临时 HOME (hub、workspace、badges 全部隔离)
+- PATH 中注入假的 `openclaw` 可执行文件 (--version / message send 立即成功)
+- lib/ 加入 sys.path
+
+注意：lib 模块在导入时根据 Path.home() 解析路径，必须先调用 setup_offline_home()
+再导入 fis_lifecycle 等模块。
+"""
+
+import os
+import stat
+import sys
+import tempfile
+from pathlib import Path
+
+LIB_DIR = Path(__file__).resolve().parent.parent / "lib"
+
+OPENCLAW_STUB = """#!/bin/sh
+# FIS offline stub - never touches the network
+case "$1" in
+  --version) echo "openclaw version 2026.2.17" ;;
+  *) exit 0 ;;
+esac
+"""
+
+
+def setup_offline_home(home=None, link_skill=False):
+    """
+    准备离线环境，返回临时 HOME 路径
+
+    Args:
+        home: 指定 HOME 目录 (默认新建临时目录)
+        link_skill: 将本仓库 lib/ 链接到 workspace/skills/fis-architecture/lib，
+                    使 fis_lifecycle 的工牌子进程可用 (需要 Pillow)
+    """
+    home = Path(home or tempfile.mkdtemp(prefix="fis-offline-"))
+    openclaw = home / ".openclaw"
+    for sub in ("fis-hub/tickets/active", "fis-hub/tickets/completed",
+                "fis-hub/results", "fis-hub/knowledge", "output/badges", "workspace/output"):
+        (openclaw / sub).mkdir(parents=True, exist_ok=True)
+
+    bin_dir = home / "bin"
+    bin_dir.mkdir(exist_ok=True)
+    stub = bin_dir / "openclaw"
+    stub.write_text(OPENCLAW_STUB)
+    stub.chmod(stub.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+    if link_skill:
+        skill_dir = openclaw / "workspace" / "skills" / "fis-architecture"
+        skill_dir.mkdir(parents=True, exist_ok=True)
+        if not (skill_dir / "lib").exists():
+            (skill_dir / "lib").symlink_to(LIB_DIR)
+
+    os.environ["HOME"] = str(home)
+    os.environ["PATH"] = f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}"
+    os.environ.pop("OPENCLAW_WORKSPACE", None)
+    if str(LIB_DIR) not in sys.path:
+        sys.path.insert(0, str(LIB_DIR))
+    return home
+
+
+def has_pillow():
+    try:
+        import PIL  # noqa: F401
+        return True
+    except ImportError:
+        return False
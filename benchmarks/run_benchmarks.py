@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+FIS 3.2 Benchmark Suite - 工牌流水线 + 生命周期操作
+
+离线运行 (openclaw 被替换为本地 stub)，结果输出为 JSON，便于版本间对比：
+
+    python3 benchmarks/run_benchmarks.py --output bench_results.json
+    python3 benchmarks/run_benchmarks.py --sizes 1000 10000 --baseline old.json
+
+覆盖：
+- badge.single            单张工牌渲染
+- badge.collage           多工牌拼接 (1/4/16/100 张)
+- badge.encode            单张工牌编码 (png / png8 / webp)，附文件大小
+- html.sheet              HTML 工牌页生成 (badge_generator_ascii)
+- lifecycle.*             create / verify / complete / list，合成 hub 规模 1k/10k/100k
+- json.*                  整个 hub 的 ticket 编码 / 解码 (json / orjson × pretty / compact)，附字节数
+- startup.*               CLI 冷启动 (新解释器执行 list / verify)
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from offline import LIB_DIR, has_pillow, setup_offline_home
+
+ROLES = ['worker', 'researcher', 'reviewer', 'formatter']
+
+
+@contextlib.contextmanager
+def quiet():
+    """屏蔽被测代码的 emoji 输出"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def measure(name, params, fn, repeat):
+    """
+    运行 fn(i) repeat 次计时，再额外运行一次记录 tracemalloc 峰值
+
+    fn 接收调用序号，消耗型操作 (complete) 需准备 repeat + 1 份输入。
+    """
+    times = []
+    for i in range(repeat):
+        with quiet():
+            start = time.perf_counter()
+            fn(i)
+            times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    with quiet():
+        fn(repeat)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    times.sort()
+    result = {
+        'name': name,
+        'params': params,
+        'runs': repeat,
+        'mean_s': statistics.fmean(times),
+        'min_s': times[0],
+        'p50_s': times[len(times) // 2],
+        'p95_s': times[min(len(times) - 1, int(len(times) * 0.95))],
+        'max_s': times[-1],
+        'peak_alloc_kb': round(peak / 1024, 1),
+    }
+    print(f"  {name:<26} {json.dumps(params):<28} mean {result['mean_s'] * 1000:9.2f} ms"
+          f"  p95 {result['p95_s'] * 1000:9.2f} ms  peak {result['peak_alloc_kb']:>9} KB")
+    return result
+
+
+def _card(i):
+    return {
+        'agent_name': f"Bench-{i:03d}",
+        'role': ROLES[i % len(ROLES)],
+        'task_desc': f"Benchmark task {i}: 统计 workspace 下所有 Python 文件的行数",
+        'task_requirements': ["report.md", "stats.json", "top5.txt"],
+    }
+
+
+# ---------- 工牌 ----------
+
+def bench_badges(card_counts, repeat):
+    from badge_generator_v7 import (BadgeGenerator, IMAGE_FORMATS, encode_image, encode_settings,
+                                    generate_multi_badge, generate_badge_with_task)
+
+    results = []
+    with quiet():
+        generator = BadgeGenerator()
+    agent_data = {
+        'name': 'Bench-Single', 'id': 'CYBERMAO-SA-2026-BENCH', 'role': 'worker',
+        'task_id': '#WORK-0101', 'soul': '"Benchmark badge"',
+        'task_requirements': ["report.md", "stats.json"], 'status': 'PENDING',
+    }
+
+    results.append(measure('badge.init', {}, lambda i: BadgeGenerator(), repeat))
+    results.append(measure('badge.single', {}, lambda i: generator.create_badge(agent_data), repeat))
+    results.append(measure('badge.bytes', {}, lambda i: generator.render_bytes(agent_data), repeat))
+    results.append(measure('badge.with_task', {}, lambda i: generate_badge_with_task(
+        'Bench', 'worker', 'Benchmark task', ['report.md']), repeat))
+
+    # 同一张画布按不同格式编码
+    with quiet():
+        canvas = generator.render(agent_data)
+    for fmt in IMAGE_FORMATS:
+        settings = encode_settings(fmt)
+        result = measure('badge.encode', {'format': fmt},
+                         lambda i: encode_image(canvas, io.BytesIO(), settings), repeat)
+        result['bytes'] = encode_image(canvas, io.BytesIO(), settings)['bytes']
+        print(f"  {'':<26} {'':<28} size {result['bytes'] / 1024:7.1f} KB")
+        results.append(result)
+
+    for n in card_counts:
+        cards = [_card(i) for i in range(n)]
+        runs = max(1, repeat // max(1, n // 4))
+        results.append(measure('badge.collage', {'cards': n},
+                               lambda i: generate_multi_badge(cards, f"bench_collage_{n}.png"), runs))
+    return results
+
+
+# ---------- HTML ----------
+
+HTML_TEMPLATE = """<!DOCTYPE html><html><head><meta charset="UTF-8"><style>
+.badge { width: 420px; font-family: monospace; }
+</style></head><body>
+<div class="badge"><span class="role-worker">Worker</span>
+<span class="status-dot status-active">ACTIVE</span> 🤖 CYBERMAO-SA-2026-0001 小毛-Worker-001
+cybermao 2026-02-17 22:48
+<span>✓</span><span>Read Shared Hub</span>
+<span>✗</span><span>Write (via Parent)</span>
+<span>✗</span><span>Call Other Agents</span>
+<span>✗</span><span>Modify Tickets</span></div>
+</body></html>"""
+
+
+def bench_html(card_counts, repeat, home):
+    import badge_generator_ascii
+
+    template = home / "badge_template.html"
+    template.write_text(HTML_TEMPLATE)
+    badge_generator_ascii.TEMPLATE_PATH = template
+
+    results = []
+    for n in card_counts:
+        cards = [{
+            'employee_id': f"CYBERMAO-SA-2026-{i:04d}", 'name': f"Bench-{i:03d}",
+            'role': ROLES[i % len(ROLES)], 'status': 'active', 'parent': 'cybermao',
+            'task': {'deadline': '2026-02-17T22:48:00'},
+            'permissions': {'can_read_shared_hub': True},
+        } for i in range(n)]
+        results.append(measure('html.sheet', {'cards': n},
+                               lambda i: badge_generator_ascii.save_badge_html(cards, f"bench_{n}.html"),
+                               repeat))
+    return results
+
+
+# ---------- 生命周期 ----------
+
+def synthetic_ticket(i, size, now, active_ratio=0.1, days=90):
+    """第 i 张合成 ticket → (state, ticket)：active_ratio 比例为 active，创建时间分布在 days 天内"""
+    created = now - timedelta(minutes=(i * days * 24 * 60) // max(1, size))
+    state = "active" if i < size * active_ratio else "completed"
+    ticket = {
+        "ticket_id": f"TASK_BENCH_{created.strftime('%Y%m%d_%H%M%S')}_{i % 1000:03d}SEED{i:04d}_seed-{i}",
+        "agent_id": f"seed-{i % 50}", "parent": f"parent-{i % 7}",
+        "role": ROLES[i % len(ROLES)],
+        "task": {"description": f"Synthetic task {i}: 汇总模拟输出", "created_at": created.isoformat(),
+                 "deadline": (created + timedelta(days=1)).isoformat(), "status": "pending"},
+        "output_requirements": ["report.md"], "deliverables": [],
+        "completed_at": None if state == "active" else (created + timedelta(hours=2)).isoformat(),
+    }
+    return state, ticket
+
+
+def seed_hub(lifecycle, size):
+    """写入合成 ticket (见 synthetic_ticket)"""
+    now = datetime.now()
+    for i in range(size):
+        state, ticket = synthetic_ticket(i, size, now)
+        lifecycle.store.write(state, ticket["ticket_id"], ticket)
+
+
+def bench_lifecycle(sizes, ops, home):
+    import fis_index
+    import fis_lifecycle
+    from fis_lifecycle import SubAgentLifecycle
+    from fis_metrics import HubMetrics
+
+    agent = "bench-agent"
+    output_dir = home / ".openclaw" / f"workspace-{agent}" / "output"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    (output_dir / "report.md").write_text("# Benchmark deliverable\n")
+
+    results = []
+    for size in sizes:
+        shutil.rmtree(fis_lifecycle.TICKETS_DIR, ignore_errors=True)
+        lifecycle = SubAgentLifecycle("bench")
+
+        start = time.perf_counter()
+        seed_hub(lifecycle, size)
+        HubMetrics().rebuild(lifecycle.store)
+        print(f"  (seeded {size} tickets in {time.perf_counter() - start:.1f}s)")
+
+        created = []
+        results.append(measure('lifecycle.create', {'hub': size}, lambda i: created.append(
+            lifecycle.create_task(agent, f"Benchmark task {i}", output_requirements=["report.md"])[0]
+        ), ops))
+        results.append(measure('lifecycle.verify', {'hub': size},
+                               lambda i: lifecycle.verify_deliverables(created[i]), ops))
+        results.append(measure('lifecycle.complete', {'hub': size},
+                               lambda i: lifecycle.complete_task(created[i], auto_collect=False), ops))
+        list_runs = max(1, min(ops, 200_000 // size))
+        results.append(measure('lifecycle.list_active', {'hub': size},
+                               lambda i: lifecycle.list_active(), list_runs))
+        results.append(measure('lifecycle.list_completed', {'hub': size},
+                               lambda i: lifecycle.list_completed(), list_runs))
+        # 稳态：等刚写入的分片目录超出 racy 窗口后预热索引，计时只含增量同步 + 查询
+        time.sleep(fis_index.RACY_WINDOW_NS / 1e9)
+        lifecycle.index.refresh()
+        results.append(measure('lifecycle.query', {'hub': size}, lambda i: lifecycle.index.query(
+            role=ROLES[i % len(ROLES)], parent=f"parent-{i % 7}", sort='deadline', limit=20), ops))
+    return results
+
+
+# ---------- JSON 编解码 ----------
+
+def bench_json(sizes, repeat):
+    """整个 hub 的 ticket 编码 / 解码：已安装的每个后端 × pretty / compact"""
+    import fis_json
+
+    now = datetime.now()
+    results = []
+    for size in sizes:
+        tickets = [synthetic_ticket(i, size, now)[1] for i in range(size)]
+        for codec in fis_json.available_codecs():
+            for pretty in (True, False):
+                params = {'hub': size, 'backend': codec.name, 'format': 'pretty' if pretty else 'compact'}
+                blobs = [codec.dumpb(t, pretty) for t in tickets]
+                result = measure('json.encode', params, lambda i: [codec.dumpb(t, pretty) for t in tickets], repeat)
+                result['bytes'] = sum(len(b) for b in blobs)
+                results.append(result)
+                results.append(measure('json.decode', params, lambda i: [codec.loads(b) for b in blobs], repeat))
+    if fis_json.orjson is None:
+        print("  (orjson not installed: stdlib backend only)")
+    return results
+
+
+# ---------- 冷启动 ----------
+
+def bench_startup(repeat):
+    """新解释器执行轻量 CLI 命令的耗时，并确认未导入图像库"""
+    lifecycle_cli = str(LIB_DIR / "fis_lifecycle.py")
+    results = []
+    for name, argv in [
+        ('startup.import', [sys.executable, '-c', 'import fis_lifecycle']),
+        ('startup.list', [sys.executable, lifecycle_cli, 'list']),
+        ('startup.verify', [sys.executable, lifecycle_cli, 'verify', '--ticket-id', 'TASK_NONE']),
+    ]:
+        results.append(measure(name, {}, lambda i: subprocess.run(
+            argv, cwd=LIB_DIR, capture_output=True, check=False), repeat))
+
+    probe = subprocess.run(
+        [sys.executable, '-c', 'import sys, fis_lifecycle; print(sorted(m for m in ("PIL", "qrcode") if m in sys.modules))'],
+        cwd=LIB_DIR, capture_output=True, text=True)
+    print(f"  imaging modules loaded by fis_lifecycle: {probe.stdout.strip()}")
+    return results
+
+
+# ---------- 汇总 ----------
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=LIB_DIR,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def compare(results, baseline_path):
+    """与基线 JSON 对比 mean_s，打印比值 (>1 表示变慢)"""
+    baseline = json.loads(Path(baseline_path).read_text())
+    base = {(r['name'], json.dumps(r['params'], sort_keys=True)): r for r in baseline['results']}
+    print(f"\n📊 Compared with {baseline_path} ({baseline['meta'].get('git_revision')}):")
+    for r in results:
+        old = base.get((r['name'], json.dumps(r['params'], sort_keys=True)))
+        if old and old['mean_s'] > 0:
+            ratio = r['mean_s'] / old['mean_s']
+            flag = "⚠️" if ratio > 1.10 else "  "
+            print(f"  {flag} {r['name']:<26} {json.dumps(r['params']):<28} x{ratio:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FIS 3.2 Benchmark Suite")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help='Synthetic hub sizes (tickets)')
+    parser.add_argument('--cards', type=int, nargs='+', default=[1, 4, 16, 100],
+                        help='Card counts for collage / HTML sheet')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per render benchmark')
+    parser.add_argument('--ops', type=int, default=50, help='Operations per lifecycle benchmark')
+    parser.add_argument('--only', nargs='+', choices=['badge', 'html', 'lifecycle', 'json', 'startup'],
+                        default=['badge', 'html', 'lifecycle', 'json', 'startup'])
+    parser.add_argument('--output', default='bench_results.json', help='Result JSON path')
+    parser.add_argument('--baseline', help='Previous result JSON to compare against')
+    args = parser.parse_args()
+
+    home = setup_offline_home()
+    print(f"🏁 FIS benchmarks (offline HOME: {home})")
+
+    results = []
+    skipped = []
+    if 'badge' in args.only:
+        if has_pillow():
+            results += bench_badges(args.cards, args.repeat)
+        else:
+            skipped.append({'suite': 'badge', 'reason': 'Pillow not installed'})
+            print("  ⚠️ badge suite skipped: Pillow not installed")
+    if 'html' in args.only:
+        results += bench_html(args.cards, args.repeat, home)
+    if 'lifecycle' in args.only:
+        results += bench_lifecycle(args.sizes, args.ops, home)
+    if 'json' in args.only:
+        results += bench_json(args.sizes, args.repeat)
+    if 'startup' in args.only:
+        results += bench_startup(args.repeat * 2)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'git_revision': _git_revision(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'pillow': has_pillow(),
+            'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        },
+        'skipped': skipped,
+        'results': results,
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    print(f"\n✅ Results: {args.output}")
+
+    if args.baseline:
+        compare(results, args.baseline)
+
+    shutil.rmtree(home, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
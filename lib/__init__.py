@@ -0,0 +1,111 @@
+"""
+FIS 3.2 Python helpers (lib/)
+
+按需加载：导入本包不会加载任何子模块，访问属性时才导入对应模块。
+例如 lib.SubAgentLifecycle 只导入 fis_lifecycle —— Pillow / qrcode 只在真正渲染工牌时加载。
+
+子模块之间使用平铺导入 (from fis_storage import ...)，以便作为脚本直接运行
+(python3 fis_lifecycle.py ...，脚本目录自动位于 sys.path 首位)。导入本包时把 lib/ 加入
+sys.path，并注册别名：import lib.fis_storage 得到的就是平铺导入的 fis_storage 模块对象，
+两种写法不会各自加载一份 (共享缓存、JSON 后端等模块级状态只有一份)。
+子模块自身不再修改 sys.path。
+"""
+
+import importlib
+import importlib.abc
+import importlib.util
+import os
+import sys
+
+_LIB_DIR = os.path.dirname(os.path.abspath(__file__))
+if _LIB_DIR not in sys.path:
+    sys.path.insert(0, _LIB_DIR)
+
+# 子模块 (lib.fis_lifecycle 等)
+_SUBMODULES = {
+    'badge_generator_ascii',
+    'badge_fonts',
+    'badge_generator_v7',
+    'badge_layout',
+    'fis_admission',
+    'fis_archive',
+    'fis_client',
+    'fis_config',
+    'fis_daemon',
+    'fis_ids',
+    'fis_index',
+    'fis_journal',
+    'fis_json',
+    'fis_lifecycle',
+    'fis_metrics',
+    'fis_registry',
+    'fis_retention',
+    'fis_scheduler',
+    'fis_search',
+    'fis_storage',
+    'fis_subagent_tool',
+    'fis_ticket',
+    'fis_trace',
+    'multi_worker_demo',
+}
+
+class _FlatAlias(importlib.abc.MetaPathFinder, importlib.abc.Loader):
+    """lib.<子模块> → 平铺导入的同一模块对象"""
+
+    def find_spec(self, fullname, path=None, target=None):
+        package, _, name = fullname.rpartition('.')
+        if package == __name__ and name in _SUBMODULES:
+            return importlib.util.spec_from_loader(fullname, self)
+        return None
+
+    def create_module(self, spec):
+        return importlib.import_module(spec.name.rpartition('.')[2])
+
+    def exec_module(self, module):
+        pass        # 平铺导入时已执行
+
+
+if not any(isinstance(f, _FlatAlias) for f in sys.meta_path):
+    sys.meta_path.insert(0, _FlatAlias())
+
+# 公开名称 → 所在子模块
+_EXPORTS = {
+    'SubAgentLifecycle': 'fis_lifecycle',
+    'TicketStore': 'fis_storage',
+    'TicketCache': 'fis_storage',
+    'TicketArchive': 'fis_archive',
+    'TicketIndex': 'fis_index',
+    'Ticket': 'fis_ticket',
+    'KnowledgeIndex': 'fis_search',
+    'BadgeRetention': 'fis_retention',
+    'SubagentRegistry': 'fis_registry',
+    'DeadlineScheduler': 'fis_scheduler',
+    'AdmissionError': 'fis_admission',
+    'HubMetrics': 'fis_metrics',
+    'Journal': 'fis_journal',
+    'new_ticket_id': 'fis_ids',
+    'new_ulid': 'fis_ids',
+    'span': 'fis_trace',
+    'DaemonClient': 'fis_client',
+    'get_shared_hub_path': 'fis_config',
+    'BadgeGenerator': 'badge_generator_v7',
+    'generate_badge_with_task': 'badge_generator_v7',
+    'generate_multi_badge': 'badge_generator_v7',
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        module = importlib.import_module(name)
+    elif name in _EXPORTS:
+        module = getattr(importlib.import_module(_EXPORTS[name]), name)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = module
+    return module
+
+
+def __dir__():
+    return sorted(set(globals()) | _SUBMODULES | set(_EXPORTS))
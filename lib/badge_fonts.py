@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+FIS 3.2 工牌字体回退链 - 按字形覆盖拆分文本，逐段选择字体
+
+单一字体无法覆盖全部字符：中文字体缺 "⚡"，等宽字体缺中文，"▸" 等符号也常缺失，
+缺字形的字符会渲染成方框 (tofu)。这里：
+
+- 直接读取字体 cmap 表 (format 4 / 12，支持 .ttc 索引)，生成 0x110000 位的覆盖位图
+  查询某字符是否有字形只需一次位运算 (O(1))，位于每个字符的热路径上
+- 覆盖位图按 (路径, 索引, mtime, 大小) 缓存在 .fis3.1/font_coverage/ 下，进程内再缓存一份
+- FallbackChain 把文本拆成连续的同字体片段，逐段绘制 (基线对齐)；
+  回退字体在第一次需要时才加载
+- 所有字体都不含的字符交给首选字体 (与旧行为一致)
+
+FIS_BADGE_FONTS 可追加回退字体文件 (os.pathsep 分隔，优先于内置列表)。
+"""
+
+import hashlib
+import os
+import struct
+import zlib
+from pathlib import Path
+
+COVERAGE_DIR = Path.home() / ".openclaw" / "fis-hub" / ".fis3.1" / "font_coverage"
+MAX_CODEPOINT = 0x110000
+
+_coverages = {}
+
+
+class FontCoverage:
+    """字体 cmap 覆盖位图"""
+
+    __slots__ = ('bits',)
+
+    def __init__(self, bits):
+        self.bits = bits
+
+    def __contains__(self, codepoint):
+        return codepoint < MAX_CODEPOINT and (self.bits[codepoint >> 3] >> (codepoint & 7)) & 1
+
+
+def _cmap_subtable(data, index):
+    """定位 cmap 中最合适的 Unicode 子表，返回 (format, offset)"""
+    base = 0
+    if data[:4] == b'ttcf':
+        num_fonts = struct.unpack_from('>I', data, 8)[0]
+        if index >= num_fonts:
+            raise ValueError(f"font index {index} out of range ({num_fonts} faces)")
+        base = struct.unpack_from('>I', data, 12 + 4 * index)[0]
+    num_tables = struct.unpack_from('>H', data, base + 4)[0]
+    cmap = None
+    for i in range(num_tables):
+        tag, _, offset, _ = struct.unpack_from('>4sIII', data, base + 12 + 16 * i)
+        if tag == b'cmap':
+            cmap = offset
+            break
+    if cmap is None:
+        raise ValueError("font has no cmap table")
+
+    candidates = {}
+    for i in range(struct.unpack_from('>H', data, cmap + 2)[0]):
+        platform, encoding, offset = struct.unpack_from('>HHI', data, cmap + 4 + 8 * i)
+        fmt = struct.unpack_from('>H', data, cmap + offset)[0]
+        candidates[(platform, encoding, fmt)] = cmap + offset
+    # 完整 Unicode (format 12) 优先，其次 BMP (format 4)
+    for key in [(3, 10, 12), (0, 6, 12), (0, 4, 12), (3, 1, 4), (0, 3, 4), (0, 2, 4), (0, 1, 4), (0, 0, 4)]:
+        if key in candidates:
+            return key[2], candidates[key]
+    raise ValueError("font has no Unicode cmap subtable (format 4/12)")
+
+
+def _set_range(bits, start, end):
+    for codepoint in range(start, min(end, MAX_CODEPOINT - 1) + 1):
+        bits[codepoint >> 3] |= 1 << (codepoint & 7)
+
+
+def read_coverage(path, index=0):
+    """解析字体文件 cmap，返回覆盖位图 (bytearray)"""
+    data = Path(path).read_bytes()
+    fmt, offset = _cmap_subtable(data, index or 0)
+    bits = bytearray(MAX_CODEPOINT >> 3)
+
+    if fmt == 12:
+        groups = struct.unpack_from('>I', data, offset + 12)[0]
+        for i in range(groups):
+            start, end, glyph = struct.unpack_from('>III', data, offset + 16 + 12 * i)
+            # 映射到 glyph 0 (.notdef) 的起始字符不算覆盖
+            _set_range(bits, start + (glyph == 0), end)
+        return bits
+
+    seg_count = struct.unpack_from('>H', data, offset + 6)[0] // 2
+    ends = struct.unpack_from(f'>{seg_count}H', data, offset + 14)
+    starts_at = offset + 16 + 2 * seg_count
+    starts = struct.unpack_from(f'>{seg_count}H', data, starts_at)
+    deltas = struct.unpack_from(f'>{seg_count}h', data, starts_at + 2 * seg_count)
+    range_at = starts_at + 4 * seg_count
+    range_offsets = struct.unpack_from(f'>{seg_count}H', data, range_at)
+    for i in range(seg_count):
+        start, end = starts[i], ends[i]
+        if start == 0xFFFF:
+            continue
+        if range_offsets[i] == 0:
+            for codepoint in range(start, end + 1):
+                if (codepoint + deltas[i]) & 0xFFFF:
+                    bits[codepoint >> 3] |= 1 << (codepoint & 7)
+            continue
+        # idRangeOffset 相对自身位置寻址 glyphIdArray
+        for codepoint in range(start, end + 1):
+            at = range_at + 2 * i + range_offsets[i] + 2 * (codepoint - start)
+            if at + 2 <= len(data) and struct.unpack_from('>H', data, at)[0]:
+                bits[codepoint >> 3] |= 1 << (codepoint & 7)
+    return bits
+
+
+def coverage(path, index=0):
+    """
+    字体覆盖 (进程内 + 磁盘缓存)
+
+    Returns:
+        FontCoverage；无法解析时返回 None (视为覆盖全部字符)
+    """
+    key = (str(path), index or 0)
+    if key in _coverages:
+        return _coverages[key]
+    try:
+        stat = os.stat(path)
+        digest = hashlib.sha1(f"{key[0]}|{key[1]}|{stat.st_mtime_ns}|{stat.st_size}".encode()).hexdigest()
+        cache_file = COVERAGE_DIR / f"{digest}.bin"
+        try:
+            bits = bytearray(zlib.decompress(cache_file.read_bytes()))
+        except (OSError, zlib.error):
+            bits = read_coverage(path, index)
+            try:
+                COVERAGE_DIR.mkdir(parents=True, exist_ok=True)
+                tmp = cache_file.with_name(f".{cache_file.name}.{os.getpid()}.tmp")
+                tmp.write_bytes(zlib.compress(bytes(bits), 6))
+                os.replace(tmp, cache_file)
+            except OSError:
+                pass
+        result = FontCoverage(bits) if len(bits) == MAX_CODEPOINT >> 3 else None
+    except (OSError, ValueError, struct.error) as e:
+        print(f"  Font coverage unavailable for {path}: {e}")
+        result = None
+    _coverages[key] = result
+    return result
+
+
+class FallbackChain:
+    """
+    同字号的一组字体：首选字体 + 按需加载的回退字体
+
+    提供 getlength / path / size，可直接交给 badge_layout 测量。
+    """
+
+    def __init__(self, primary, fallbacks=(), primary_spec=None):
+        """
+        Args:
+            primary: 已加载的首选 FreeTypeFont
+            fallbacks: [(path, index), ...] 回退字体文件 (与首选相同字号)
+            primary_spec: 首选字体的 (path, index)，用于读取覆盖；None 时视为覆盖全部
+        """
+        self.primary = primary
+        self.size = getattr(primary, 'size', None)
+        self.index = 0
+        self._specs = [primary_spec] + [spec for spec in fallbacks if spec != primary_spec]
+        self._faces = [primary] + [None] * (len(self._specs) - 1)
+        self._coverages = [coverage(*primary_spec) if primary_spec else None] + [False] * (len(self._specs) - 1)
+        self.path = '|'.join(f"{p}#{i or 0}" for p, i in filter(None, self._specs)) or None
+        self._face_of = {}
+        try:
+            self.ascent = primary.getmetrics()[0]
+        except AttributeError:
+            self.ascent = 0
+
+    def _coverage(self, i):
+        if self._coverages[i] is False:
+            self._coverages[i] = coverage(*self._specs[i])
+        return self._coverages[i]
+
+    def _face(self, i):
+        if self._faces[i] is None:
+            from PIL import ImageFont
+            path, index = self._specs[i]
+            self._faces[i] = ImageFont.truetype(path, self.size, index=index or 0)
+        return self._faces[i]
+
+    def face_index(self, ch):
+        """能显示 ch 的第一个字体序号 (逐字符记忆)"""
+        i = self._face_of.get(ch)
+        if i is None:
+            codepoint = ord(ch)
+            i = 0
+            for j in range(len(self._specs)):
+                covered = self._coverage(j)
+                if covered is None or codepoint in covered:
+                    i = j
+                    break
+            self._face_of[ch] = i
+        return i
+
+    def runs(self, text):
+        """[(片段, 字体)] - 连续同字体的字符合为一段"""
+        runs = []
+        current = None
+        start = 0
+        for pos, ch in enumerate(text):
+            i = self.face_index(ch)
+            if i != current:
+                if current is not None:
+                    runs.append((text[start:pos], self._face(current)))
+                current, start = i, pos
+        if current is not None:
+            runs.append((text[start:], self._face(current)))
+        return runs
+
+    def getlength(self, text):
+        return sum(face.getlength(run) for run, face in self.runs(text))
+
+    def draw(self, draw, xy, text, fill=None):
+        """逐段绘制；只有一段时与 draw.text 完全一致"""
+        runs = self.runs(text)
+        if not runs or (len(runs) == 1 and runs[0][1] is self.primary):
+            draw.text(xy, text, fill=fill, font=self.primary)
+            return
+        x, y = xy
+        baseline = y + self.ascent
+        for run, face in runs:
+            draw.text((x, baseline), run, fill=fill, font=face, anchor='ls')
+            x += face.getlength(run)
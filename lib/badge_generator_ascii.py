@@ -170,31 +170,29 @@ def generate_badge_image(cards: list, output_name: str = None) -> str:
 # CLI interface
 if __name__ == "__main__":
     import sys
+    from itertools import islice
     sys.path.insert(0, str(Path(__file__).parent))
-    from subagent_lifecycle import SubAgentLifecycleManager
+    from fis_registry import SubagentRegistry, registry_paths
     
     print("🎫 FIS 3.1 Badge Image Generator")
     print("=" * 50)
     
-    # Load existing subagents
-    from fis_config import get_shared_hub_path
-    registry_file = get_shared_hub_path() / ".fis3.1" / "subagent_registry.json"
+    # Load existing subagents (SQLite registry; legacy JSON is imported on first use)
+    db_file, legacy_file = registry_paths()
     
-    if registry_file.exists():
-        with open(registry_file) as f:
-            registry = json.load(f)
+    if db_file.exists() or legacy_file.exists():
+        registry = SubagentRegistry()
+        count = registry.count()
         
-        subagents = registry.get("subagents", [])
-        
-        if subagents:
-            print(f"\nFound {len(subagents)} subagent(s)")
+        if count:
+            print(f"\nFound {count} subagent(s)")
             
             # Generate multi-badge HTML
-            html_path = save_badge_html(subagents, "all_badges.html")
+            html_path = save_badge_html(list(registry.iter()), "all_badges.html")
             print(f"\n✅ Multi-badge HTML saved: {html_path}")
             
             # Also generate individual badges
-            for card in subagents[:2]:  # Limit to first 2 for demo
+            for card in islice(registry.iter(), 2):  # Limit to first 2 for demo
                 single_path = save_badge_html(card, f"badge_{card['employee_id']}.html")
                 print(f"✅ Single badge: {single_path.name}")
             
@@ -16,18 +16,115 @@ Version: 3.1.4
 """
 
 from PIL import Image, ImageDraw, ImageFont
+import hashlib
+import io
+import json
 import random
 import os
 import subprocess
 import time
 from datetime import datetime, timedelta
 from pathlib import Path
+from badge_fonts import FallbackChain
+from badge_layout import ellipsize, text_width, wrap
+from fis_ids import content_stamp, next_stamp, ticket_stamp, ticket_token
+from fis_trace import span
+
 # qrcode module optional - fallback to placeholder if not available
-try:
-    import qrcode
-    HAS_QRCODE = True
-except ImportError:
-    HAS_QRCODE = False
+# 按需导入：首次生成 QR 码时才加载 (qrcode 本身也会拉起大量 PIL 插件)
+_qrcode = None
+
+
+def _load_qrcode():
+    """返回 qrcode 模块，未安装时返回 False"""
+    global _qrcode
+    if _qrcode is None:
+        try:
+            import qrcode
+            _qrcode = qrcode
+        except ImportError:
+            _qrcode = False
+    return _qrcode
+
+
+# 输出编码 (环境变量 FIS_BADGE_FORMAT / FIS_BADGE_COMPRESS / FIS_BADGE_OPTIMIZE / FIS_BADGE_COLORS)
+#   png   RGB PNG (默认，与旧版一致)
+#   png8  调色板 PNG：工牌只有少量平面色，量化后体积小得多，编码也更快
+#   webp  无损 WebP
+IMAGE_FORMATS = {'png': '.png', 'png8': '.png', 'webp': '.webp'}
+
+# 绘制逻辑变化时递增，使确定性模式下已缓存的工牌失效
+RENDER_REVISION = 3
+
+# 仅作回退的符号 / 全字符集字体 (首选字体缺字形时逐字符选用)
+SYMBOL_FONT_PATHS = [
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/truetype/noto/NotoSansSymbols2-Regular.ttf",
+    "/usr/share/fonts/truetype/noto/NotoSansSymbols-Regular.ttf",
+    "/usr/share/fonts/truetype/ancient-scripts/Symbola_hint.ttf",
+    "/usr/share/fonts/opentype/unifont/unifont.otf",
+]
+
+
+def _fallback_specs(chinese_font_configs, mono_font_paths):
+    """回退字体 [(path, index)]：FIS_BADGE_FONTS (path 或 path#index) → 中文 → 等宽 → 符号"""
+    specs = []
+    for entry in filter(None, os.environ.get('FIS_BADGE_FONTS', '').split(os.pathsep)):
+        path, _, index = entry.partition('#')
+        specs.append((path, int(index) if index else 0))
+    specs += [(path, index or 0) for path, index in chinese_font_configs]
+    specs += [(path, 0) for path in mono_font_paths + SYMBOL_FONT_PATHS]
+    seen = set()
+    return [spec for spec in specs if os.path.exists(spec[0]) and not (spec in seen or seen.add(spec))]
+
+
+def encode_settings(image_format=None, compress_level=None, optimize=None, colors=None):
+    """合并参数与环境变量默认值"""
+    image_format = (image_format or os.environ.get('FIS_BADGE_FORMAT', 'png')).lower()
+    if image_format not in IMAGE_FORMATS:
+        raise ValueError(f"Unknown badge format: {image_format} (expected {', '.join(IMAGE_FORMATS)})")
+    if compress_level is None:
+        compress_level = int(os.environ.get('FIS_BADGE_COMPRESS', '6'))
+    if optimize is None:
+        optimize = os.environ.get('FIS_BADGE_OPTIMIZE', '0') == '1'
+    if colors is None:
+        colors = int(os.environ.get('FIS_BADGE_COLORS', '64'))
+    return {
+        'format': image_format,
+        'compress_level': max(0, min(9, compress_level)),
+        'optimize': optimize,
+        'colors': max(2, min(256, colors)),
+    }
+
+
+def encode_image(image, fp, settings):
+    """
+    按 settings 编码图片写入 fp (路径或可写文件对象)
+    
+    Returns:
+        {'format', 'bytes', 'encode_ms'}
+    """
+    image_format = settings['format']
+    start = time.perf_counter()
+    if image_format == 'png8':
+        # 快速八叉树量化 (method=2)，不抖动 (dither=0)：平面色块保持干净，文字边缘保留少量过渡色
+        # 使用整数常量兼容 Pillow 9.0 (Image.Quantize / Image.Dither 枚举 9.1 起才有)
+        image = image.quantize(colors=settings['colors'], method=2, dither=0)
+    
+    start_pos = None if isinstance(fp, (str, Path)) else fp.tell()
+    if image_format == 'webp':
+        # 无损模式下 quality 表示压缩力度，method 0-6 为速度/体积权衡
+        level = settings['compress_level']
+        image.save(fp, 'WEBP', lossless=True, quality=round(level * 100 / 9),
+                   method=6 if settings['optimize'] else round(level * 6 / 9))
+    else:
+        image.save(fp, 'PNG', compress_level=settings['compress_level'], optimize=settings['optimize'])
+    elapsed = (time.perf_counter() - start) * 1000
+    
+    size = os.path.getsize(fp) if start_pos is None else fp.tell() - start_pos
+    return {'format': image_format, 'bytes': size, 'encode_ms': round(elapsed, 2)}
+
 
 class BadgeGenerator:
     """FIS 3.1 SubAgent Badge Generator - Optimized Layout"""
@@ -50,9 +147,27 @@ class BadgeGenerator:
         'translucent': (26, 26, 26, 128),  # 半透明黑色
     }
     
-    def __init__(self, output_dir=None):
+    def __init__(self, output_dir=None, image_format=None, compress_level=None, optimize=None, colors=None,
+                 deterministic=None):
+        """
+        Args:
+            image_format: png | png8 | webp (默认 FIS_BADGE_FORMAT，否则 png)
+            compress_level: 0-9 (PNG zlib 级别；WebP 映射为压缩力度)
+            optimize: PNG 额外优化 / WebP 最慢最小档
+            colors: png8 调色板颜色数
+            deterministic: 随机选择 (头像等) 由 agent ID + ticket ID 决定，文件按内容哈希命名，
+                           相同内容再次请求直接返回已有文件 (默认 FIS_BADGE_DETERMINISTIC=1 时开启)；
+                           generate_badge_with_task / generate_badge_batch 未传 ticket_id 时，
+                           工号由任务内容哈希派生 (当天有效)，相同请求同样命中缓存
+        """
         self.width = self.WIDTH
         self.height = self.HEIGHT
+        self.encoding = encode_settings(image_format, compress_level, optimize, colors)
+        if deterministic is None:
+            deterministic = os.environ.get('FIS_BADGE_DETERMINISTIC', '0') == '1'
+        self.deterministic = deterministic
+        self.last_encode = None
+        self._rng = random.Random()
         
         # 动态获取输出目录 - 优先使用环境变量或标准路径
         if output_dir:
@@ -77,10 +192,12 @@ class BadgeGenerator:
         self.output_dir.mkdir(parents=True, exist_ok=True)
         
         # 加载字体 - 支持中文
-        self.fonts = self._load_fonts()
+        with span("badge.fonts"):
+            self.fonts = self._load_fonts()
         
         # 获取 OpenClaw 版本
-        self.openclaw_version = self._get_openclaw_version()
+        with span("badge.version"):
+            self.openclaw_version = self._get_openclaw_version()
     
     def _get_openclaw_version(self):
         """动态获取 OpenClaw 版本号 - 格式: vYYYY.MM.DD"""
@@ -187,46 +304,153 @@ class BadgeGenerator:
             fonts['pixel'] = ImageFont.truetype(mono_font, 9) if mono_font else default_font
         except Exception as e:
             print(f"  Font loading error: {e}")
-            fonts = {k: default_font for k in ['title', 'header', 'text', 'small', 'pixel']}
+            return {k: default_font for k in ['title', 'header', 'text', 'small', 'pixel']}
+        
+        # 回退链：首选字体缺字形 (⚡、▸、其他文字) 时逐字符选用能显示的字体
+        fallbacks = _fallback_specs(chinese_font_configs, mono_font_paths)
+        chinese_spec = (chinese_font, chinese_font_index or 0) if chinese_font else None
+        mono_spec = (mono_font, 0) if mono_font else None
+        for key, font in fonts.items():
+            spec = mono_spec if key == 'pixel' or not chinese_spec else chinese_spec
+            if spec and font is not default_font:
+                fonts[key] = FallbackChain(font, fallbacks, spec)
         
         return fonts
     
-    def create_badge(self, agent_data, output_path=None):
-        """Create optimized badge layout"""
-        # 创建画布
-        card = Image.new('RGB', (self.width, self.height), self.COLORS['background'])
-        draw = ImageDraw.Draw(card)
-        
-        # 添加纸质纹理
-        self._add_paper_texture(draw)
-        
-        # 添加边框
-        self._add_border(draw)
-        
-        # 添加头部
-        self._add_header(draw, agent_data)
-        
-        # 添加左侧区域（头像 + 身份信息）
-        self._add_left_section(draw, agent_data)
-        
-        # 添加右侧区域（职责 + 详细任务要求）
-        self._add_right_section(draw, agent_data)
-        
-        # 添加右侧垂直状态条装饰
-        self._add_tilted_pixel_badge(draw, agent_data)
-        
-        # 添加底部（并粘贴QR码）
-        self._add_footer(draw, agent_data, card)
-        
-        # 保存
+    def _text(self, draw, xy, text, fill=None, font=None):
+        """绘制文字：回退链逐段选择字体，普通字体直接绘制"""
+        if isinstance(font, FallbackChain):
+            font.draw(draw, xy, text, fill)
+        else:
+            draw.text(xy, text, fill=fill, font=font)
+    
+    def create_badge(self, agent_data, output_path=None, output_dir=None):
+        """
+        Create optimized badge layout - 渲染并写入文件，返回路径
+        
+        Args:
+            output_path: 目标文件 (默认在 output_dir 下自动命名)
+            output_dir: 覆盖 self.output_dir，例如直接写入消息通道允许的目录
+        """
         if output_path is None:
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            agent_id = agent_data.get('id', 'UNKNOWN').replace('/', '-')
-            output_path = self.output_dir / f"badge_v7_{agent_id}_{timestamp}.png"
-        
-        card.save(output_path)
+            cached = self.cached_badge(agent_data, output_dir)
+            if cached:
+                return cached
+        return self.save_badge(self.render(agent_data), agent_data, output_path, output_dir)
+    
+    def render_key(self, agent_data):
+        """渲染结果的内容哈希：工牌数据 + 影响像素/编码的全部设置"""
+        payload = {
+            'data': agent_data,
+            'revision': RENDER_REVISION,
+            'version': self.openclaw_version,
+            'size': [self.width, self.height],
+            'encoding': self.encoding,
+            'fonts': {name: getattr(font, 'path', None) for name, font in self.fonts.items()},
+        }
+        raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+    
+    def cached_badge(self, agent_data, output_dir=None):
+        """确定性模式下相同内容已渲染过的工牌路径，否则 None"""
+        if not self.deterministic:
+            return None
+        path = self._badge_path(agent_data, output_dir)
+        if not path.exists():
+            return None
+        with span("badge.cache", hit=True):
+            self.last_encode = {'format': self.encoding['format'], 'bytes': path.stat().st_size,
+                                'encode_ms': 0.0, 'cached': True}
+        return str(path)
+    
+    def _badge_path(self, agent_data, output_dir=None):
+        agent_id = agent_data.get('id', 'UNKNOWN').replace('/', '-')
+        suffix = IMAGE_FORMATS[self.encoding['format']]
+        output_dir = Path(output_dir) if output_dir else self.output_dir
+        output_dir.mkdir(parents=True, exist_ok=True)
+        if self.deterministic:
+            return output_dir / f"badge_v7_{agent_id}_{self.render_key(agent_data)[:16]}{suffix}"
+        timestamp, token = next_stamp()
+        return output_dir / f"badge_v7_{agent_id}_{timestamp.strftime('%Y%m%d_%H%M%S')}_{token}{suffix}"
+    
+    def _render_seed(self, agent_data):
+        """确定性模式的随机种子：agent ID + ticket ID"""
+        raw = f"{agent_data.get('id', '')}|{agent_data.get('ticket_id', '')}"
+        return int.from_bytes(hashlib.sha256(raw.encode('utf-8')).digest()[:8], 'big')
+    
+    def render(self, agent_data):
+        """只渲染，返回 PIL Image (不落盘)"""
+        # 每次渲染使用独立随机源，不改动全局 random 状态
+        self._rng = random.Random(self._render_seed(agent_data) if self.deterministic else None)
+        with span("badge.render", agent=agent_data.get('id')):
+            # 创建画布
+            card = Image.new('RGB', (self.width, self.height), self.COLORS['background'])
+            draw = ImageDraw.Draw(card)
+            
+            # 添加纸质纹理
+            with span("badge.texture"):
+                self._add_paper_texture(draw)
+            
+            # 添加边框
+            self._add_border(draw)
+            
+            # 添加头部
+            with span("badge.header"):
+                self._add_header(draw, agent_data)
+            
+            # 添加左侧区域（头像 + 身份信息）
+            with span("badge.left"):
+                self._add_left_section(draw, agent_data)
+            
+            # 添加右侧区域（职责 + 详细任务要求）
+            with span("badge.right"):
+                self._add_right_section(draw, agent_data)
+            
+            # 添加右侧垂直状态条装饰
+            self._add_tilted_pixel_badge(draw, agent_data)
+            
+            # 添加底部（并粘贴QR码）
+            with span("badge.footer"):
+                self._add_footer(draw, agent_data, card)
+        return card
+    
+    def write_badge(self, agent_data, fp):
+        """渲染并编码写入调用方提供的可写文件对象 (BytesIO、socket.makefile 等)，返回编码统计"""
+        return self._encode(self.render(agent_data), fp)
+    
+    def render_bytes(self, agent_data):
+        """渲染并返回编码后的 bytes"""
+        buffer = io.BytesIO()
+        self.write_badge(agent_data, buffer)
+        return buffer.getvalue()
+    
+    def render_buffer(self, agent_data):
+        """渲染并返回编码结果的 memoryview (零拷贝，直接交给 write/send)"""
+        buffer = io.BytesIO()
+        self.write_badge(agent_data, buffer)
+        return buffer.getbuffer()
+    
+    def save_badge(self, image, agent_data, output_path=None, output_dir=None):
+        """把已渲染的工牌写入文件 (一次写入)，返回路径"""
+        if output_path is None:
+            output_path = self._badge_path(agent_data, output_dir)
+        if not self.deterministic:
+            self._encode(image, output_path)
+            return str(output_path)
+        # 缓存文件：先写临时文件再原子替换，并发渲染同一内容时读者不会看到半个文件
+        output_path = Path(output_path)
+        tmp_path = output_path.with_name(f".{output_path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            self._encode(image, f)
+        os.replace(tmp_path, output_path)
         return str(output_path)
     
+    def _encode(self, image, fp):
+        with span("badge.save", format=self.encoding['format']) as s:
+            self.last_encode = encode_image(image, fp, self.encoding)
+            s.set(bytes=self.last_encode['bytes'])
+        return self.last_encode
+    
     def _add_paper_texture(self, draw):
         """添加纸质纹理线条"""
         for y in range(0, self.height, 2):
@@ -243,16 +467,16 @@ class BadgeGenerator:
         header_y = 30
         
         # Logo 和标题
-        draw.text((30, header_y), "⚡", fill=self.COLORS['primary'], font=self.fonts['title'])
-        draw.text((60, header_y), f"OPENCLAW {self.openclaw_version}", 
+        self._text(draw, (30, header_y), "⚡", fill=self.COLORS['primary'], font=self.fonts['title'])
+        self._text(draw, (60, header_y), f"OPENCLAW {self.openclaw_version}", 
                  fill=self.COLORS['border'], font=self.fonts['header'])
-        draw.text((60, header_y + 18), "FEDERAL INTELLIGENCE SYSTEM", 
+        self._text(draw, (60, header_y + 18), "FEDERAL INTELLIGENCE SYSTEM", 
                  fill=self.COLORS['secondary'], font=self.fonts['small'])
         
         # 右侧任务ID
         task_id = agent_data.get('task_id', '#UNKNOWN')
         # 计算文本宽度以便右对齐
-        draw.text((self.width - 120, header_y), task_id, 
+        self._text(draw, (self.width - 120, header_y), task_id, 
                  fill=self.COLORS['primary'], font=self.fonts['title'])
         
         # 虚线分隔线
@@ -269,7 +493,8 @@ class BadgeGenerator:
                       outline=self.COLORS['primary'], width=4)
         
         # 随机小动物像素头像（每次生成随机，不绑定工号）
-        self._draw_animal_avatar(draw, left_x, avatar_y)
+        with span("badge.avatar"):
+            self._draw_animal_avatar(draw, left_x, avatar_y)
         
         # 角色标签（固定宽度）
         role = agent_data.get('role', 'AGENT').upper()
@@ -279,18 +504,21 @@ class BadgeGenerator:
                       fill=self.COLORS['border'], outline=self.COLORS['primary'], width=2)
         
         # 居中文字
-        bbox = draw.textbbox((0, 0), role, font=self.fonts['pixel'])
-        text_width = bbox[2] - bbox[0]
-        text_x = left_x + (badge_width - text_width) // 2
-        draw.text((text_x, badge_y + 5), role, fill='#ffffff', font=self.fonts['pixel'])
+        role = ellipsize(self.fonts['pixel'], role, badge_width - 8)
+        text_x = left_x + (badge_width - int(text_width(self.fonts['pixel'], role))) // 2
+        self._text(draw, (text_x, badge_y + 5), role, fill='#ffffff', font=self.fonts['pixel'])
         
         # Agent 元数据
-        draw.text((left_x, badge_y + 35), "AGENT NAME", fill=self.COLORS['muted'], font=self.fonts['small'])
+        self._text(draw, (left_x, badge_y + 35), "AGENT NAME", fill=self.COLORS['muted'], font=self.fonts['small'])
+        # 左栏可用宽度：到分隔线 (x=210) 前留 10px
+        column_width = 200 - left_x
         name = agent_data.get('name', 'Unknown Agent')
-        draw.text((left_x, badge_y + 50), name[:18], fill=self.COLORS['border'], font=self.fonts['header'])
+        self._text(draw, (left_x, badge_y + 50), ellipsize(self.fonts['header'], name, column_width),
+                  fill=self.COLORS['border'], font=self.fonts['header'])
         
         agent_id = agent_data.get('id', 'UNKNOWN')
-        draw.text((left_x, badge_y + 72), f"ID: {agent_id}", fill=self.COLORS['secondary'], font=self.fonts['small'])
+        self._text(draw, (left_x, badge_y + 72), ellipsize(self.fonts['small'], f"ID: {agent_id}", column_width),
+                  fill=self.COLORS['secondary'], font=self.fonts['small'])
         
         # FIS INFO 信息框（移到左侧下方）
         info_y = badge_y + 100
@@ -304,27 +532,26 @@ class BadgeGenerator:
         # 信息框标题
         draw.rectangle([left_x, info_y, left_x + info_width, info_y + 22],
                       fill=self.COLORS['border'])
-        draw.text((left_x + 6, info_y + 5), "FIS INFO", fill='#ffffff', font=self.fonts['pixel'])
+        self._text(draw, (left_x + 6, info_y + 5), "FIS INFO", fill='#ffffff', font=self.fonts['pixel'])
         
         # 信息内容 - 增加行间距
-        draw.text((left_x + 6, info_y + 30), "Version:", fill=self.COLORS['secondary'], font=self.fonts['small'])
-        draw.text((left_x + 6, info_y + 48), "3.1 Lite", fill=self.COLORS['border'], font=self.fonts['text'])
+        self._text(draw, (left_x + 6, info_y + 30), "Version:", fill=self.COLORS['secondary'], font=self.fonts['small'])
+        self._text(draw, (left_x + 6, info_y + 48), "3.1 Lite", fill=self.COLORS['border'], font=self.fonts['text'])
         
-        draw.text((left_x + 6, info_y + 72), "Security:", fill=self.COLORS['secondary'], font=self.fonts['small'])
-        draw.text((left_x + 6, info_y + 90), "Level 1", fill='#00c853', font=self.fonts['text'])
+        self._text(draw, (left_x + 6, info_y + 72), "Security:", fill=self.COLORS['secondary'], font=self.fonts['small'])
+        self._text(draw, (left_x + 6, info_y + 90), "Level 1", fill='#00c853', font=self.fonts['text'])
         
-        draw.text((left_x + 6, info_y + 114), "Workspace:", fill=self.COLORS['secondary'], font=self.fonts['small'])
+        self._text(draw, (left_x + 6, info_y + 114), "Workspace:", fill=self.COLORS['secondary'], font=self.fonts['small'])
         ws_text = agent_data.get('id', 'N/A')[:10]
-        draw.text((left_x + 6, info_y + 132), ws_text, fill=self.COLORS['border'], font=self.fonts['small'])
+        self._text(draw, (left_x + 6, info_y + 132), ws_text, fill=self.COLORS['border'], font=self.fonts['small'])
     
     def _draw_animal_avatar(self, draw, left_x, avatar_y):
-        """绘制随机小动物像素头像（完全随机，每次不同）"""
-        # 完全随机，不绑定工号
-        random.seed()
+        """绘制随机小动物像素头像（默认每次不同；确定性模式下由 agent ID + ticket ID 决定）"""
+        rng = self._rng
         
         # 随机选择动物类型
         animals = ['cat', 'dog', 'rabbit', 'bear', 'fox', 'panda', 'owl']
-        animal = random.choice(animals)
+        animal = rng.choice(animals)
         
         # 颜色配置
         fur_colors = {
@@ -344,8 +571,8 @@ class BadgeGenerator:
         center_y = avatar_y + 35
         pixel_size = 4  # 从6减小到4，增加像素密度
         
-        fur_color = random.choice(fur_colors[animal])
-        bg_color = random.choice(bg_colors)
+        fur_color = rng.choice(fur_colors[animal])
+        bg_color = rng.choice(bg_colors)
         
         # 绘制方形背景
         for y in range(avatar_y + 2, avatar_y + 68, pixel_size):
@@ -367,8 +594,6 @@ class BadgeGenerator:
             self._draw_panda(draw, center_x, center_y, pixel_size, fur_color)
         elif animal == 'owl':
             self._draw_owl(draw, center_x, center_y, pixel_size, fur_color)
-        
-        random.seed()
     
     def _draw_cat(self, draw, cx, cy, ps, color):
         """绘制像素猫（高密度）"""
@@ -385,7 +610,7 @@ class BadgeGenerator:
                     draw.rectangle([x, y, x + ps, y + ps], fill=color)
         
         # 大眼睛（可爱风格）
-        eye_color = random.choice(['#228b22', '#4169e1', '#ffd700', '#9370db'])
+        eye_color = self._rng.choice(['#228b22', '#4169e1', '#ffd700', '#9370db'])
         draw.rectangle([cx - 14, cy - 6, cx - 4, cy + 6], fill=eye_color)
         draw.rectangle([cx + 4, cy - 6, cx + 14, cy + 6], fill=eye_color)
         draw.rectangle([cx - 12, cy - 4, cx - 6, cy + 2], fill='#000000')  # 瞳孔
@@ -424,7 +649,7 @@ class BadgeGenerator:
         draw.rectangle([cx - 5, cy + 6, cx + 5, cy + 12], fill='#333333')
         
         # 吐舌头（随机）
-        if random.random() > 0.5:
+        if self._rng.random() > 0.5:
             draw.rectangle([cx - 4, cy + 12, cx + 4, cy + 20], fill='#ff6b6b')
             draw.rectangle([cx - 2, cy + 16, cx + 2, cy + 22], fill='#ff4757')
     
@@ -551,7 +776,7 @@ class BadgeGenerator:
         draw.rectangle([cx, cy - 8, cx + 14, cy + 8], fill='#ffffff')
         
         # 瞳孔（更大）
-        eye_color = random.choice(['#ffd700', '#ffa500', '#ff6b00'])
+        eye_color = self._rng.choice(['#ffd700', '#ffa500', '#ff6b00'])
         draw.rectangle([cx - 10, cy - 4, cx - 2, cy + 6], fill=eye_color)
         draw.rectangle([cx + 2, cy - 4, cx + 10, cy + 6], fill=eye_color)
         draw.rectangle([cx - 8, cy - 2, cx - 4, cy + 4], fill='#000000')
@@ -563,20 +788,22 @@ class BadgeGenerator:
     def _add_right_section(self, draw, agent_data):
         """添加右侧区域 - 包含详细任务要求"""
         right_x = 240  # 向右移动，增加右侧区域宽度
+        right_edge = self.width - 40
         section_y = 90
         
-        # SOUL 标签（橙色）
+        # SOUL 标签（橙色）- 按宽度最多两行
         soul = agent_data.get('soul', '"Digital familiar navigating the void"')
         draw.rectangle([right_x, section_y, right_x + 70, section_y + 24],
                       fill=self.COLORS['primary'], outline=self.COLORS['border'], width=2)
-        draw.text((right_x + 8, section_y + 5), "SOUL", fill='#ffffff', font=self.fonts['pixel'])
-        draw.text((right_x + 82, section_y + 3), soul[:45], fill=self.COLORS['primary'], font=self.fonts['text'])
+        self._text(draw, (right_x + 8, section_y + 5), "SOUL", fill='#ffffff', font=self.fonts['pixel'])
+        for i, line in enumerate(self._soul_lines(soul, right_edge - (right_x + 82))):
+            self._text(draw, (right_x + 82, section_y + 3 + i * 17), line, fill=self.COLORS['primary'], font=self.fonts['text'])
         
         # RESPONSIBILITIES 标签（黑色）
         resp_y = section_y + 42
         draw.rectangle([right_x, resp_y, right_x + 140, resp_y + 24],
                       fill=self.COLORS['border'], outline=self.COLORS['border'], width=2)
-        draw.text((right_x + 8, resp_y + 5), "RESPONSIBILITIES", fill='#ffffff', font=self.fonts['pixel'])
+        self._text(draw, (right_x + 8, resp_y + 5), "RESPONSIBILITIES", fill='#ffffff', font=self.fonts['pixel'])
         
         # 职责列表
         responsibilities = agent_data.get('responsibilities', [
@@ -587,17 +814,17 @@ class BadgeGenerator:
         
         for i, bullet in enumerate(responsibilities[:3]):
             y = resp_y + 30 + (i * 20)
-            text = bullet[:58]  # 增加可显示字符数
-            draw.text((right_x + 8, y), f"▸ {text}", fill=self.COLORS['border'], font=self.fonts['small'])
+            text = ellipsize(self.fonts['small'], f"▸ {bullet}", right_edge - (right_x + 8))
+            self._text(draw, (right_x + 8, y), text, fill=self.COLORS['border'], font=self.fonts['small'])
         
         # 输出要求 - 格式标签
         out_y = resp_y + 100
         draw.rectangle([right_x, out_y, right_x + 100, out_y + 24],
                       fill='#666666', outline=self.COLORS['border'], width=2)
-        draw.text((right_x + 8, out_y + 5), "OUTPUT REQ", fill='#ffffff', font=self.fonts['pixel'])
+        self._text(draw, (right_x + 8, out_y + 5), "OUTPUT REQ", fill='#ffffff', font=self.fonts['pixel'])
         
         output_formats = agent_data.get('output_formats', 'MARKDOWN | JSON | TXT')
-        draw.text((right_x + 108, out_y + 5), output_formats, 
+        self._text(draw, (right_x + 108, out_y + 5), ellipsize(self.fonts['small'], output_formats, right_edge - (right_x + 108)),
                  fill=self.COLORS['border'], font=self.fonts['small'])
         
         # 输出要求 - 具体任务要求
@@ -608,24 +835,37 @@ class BadgeGenerator:
             "3. Report top 5 largest files",
         ])
         
-        draw.text((right_x, task_req_y), "任务要求:", 
+        self._text(draw, (right_x, task_req_y), "任务要求:", 
                  fill=self.COLORS['primary'], font=self.fonts['small'])
         
         for i, req in enumerate(task_requirements[:3]):
             y = task_req_y + 20 + (i * 18)
-            text = req[:55]  # 增加可显示字符数
-            draw.text((right_x + 8, y), f"• {text}", fill=self.COLORS['secondary'], font=self.fonts['small'])
+            text = ellipsize(self.fonts['small'], f"• {req}", right_edge - (right_x + 8))
+            self._text(draw, (right_x + 8, y), text, fill=self.COLORS['secondary'], font=self.fonts['small'])
         
         # 垂直分隔线（左侧）
         draw.line([(210, 80), (210, self.height - 80)], fill=self.COLORS['divider'], width=2)
     
+    def _soul_lines(self, soul, max_width, max_lines=2):
+        """SOUL 文本换行；带引号时省略号留在引号内"""
+        font = self.fonts['text']
+        if len(soul) < 2 or not (soul.startswith('"') and soul.endswith('"')):
+            return wrap(font, soul, max_width, max_lines)
+        lines = wrap(font, soul[1:-1], max_width - text_width(font, '"'), max_lines)
+        if not lines:
+            return ['""']
+        lines[0] = '"' + lines[0]
+        lines[-1] += '"'
+        return lines
+    
     def _add_tilted_pixel_badge(self, draw, agent_data):
         """右侧装饰区域 - 已移除"""
         pass
     
     def _generate_qr_code(self, url="https://github.com/MuseLinn/fis-architecture", size=50):
         """生成QR码（如果qrcode模块不可用则绘制类似QR码的图案）"""
-        if HAS_QRCODE:
+        qrcode = _load_qrcode()
+        if qrcode:
             qr = qrcode.QRCode(
                 version=1,
                 error_correction=qrcode.constants.ERROR_CORRECT_L,
@@ -662,12 +902,11 @@ class BadgeGenerator:
         draw.rectangle([box_size, size-box_size*2, box_size*2, size-box_size], fill='white')
         draw.rectangle([box_size+3, size-box_size*2+3, box_size*2-3, size-box_size-3], fill='black')
         
-        # 中间随机填充一些像素
-        import random
-        random.seed(url)
+        # 中间随机填充一些像素 (按 url 固定，独立随机源)
+        rng = random.Random(url)
         for y in range(box_size*3, size-box_size*3, 4):
             for x in range(box_size*3, size, 4):
-                if random.random() > 0.5:
+                if rng.random() > 0.5:
                     draw.rectangle([x, y, x+3, y+3], fill='black')
         
         return qr_img
@@ -689,7 +928,7 @@ class BadgeGenerator:
         
         # 条形码ID
         barcode_id = agent_data.get('barcode_id', f"OC-2025-{agent_data.get('role', 'AGENT')[:4].upper()}-001")
-        draw.text((30, footer_y + 35), barcode_id, fill='#666666', font=self.fonts['small'])
+        self._text(draw, (30, footer_y + 35), barcode_id, fill='#666666', font=self.fonts['small'])
         
         # 状态指示器
         status = agent_data.get('status', 'PENDING')
@@ -697,18 +936,19 @@ class BadgeGenerator:
         status_x = 280
         draw.ellipse([status_x, footer_y + 12, status_x + 12, footer_y + 24], 
                     fill=status_color, outline='#ffffff', width=1)
-        draw.text((status_x + 18, footer_y + 12), status, fill='#ffffff', font=self.fonts['pixel'])
+        self._text(draw, (status_x + 18, footer_y + 12), status, fill='#ffffff', font=self.fonts['pixel'])
         
         # 有效期
         valid_until = agent_data.get('valid_until', 
                                      (datetime.now() + timedelta(days=365)).strftime('%Y-%m-%d'))
-        draw.text((self.width - 200, footer_y + 12), f"VALID UNTIL: {valid_until}", 
+        self._text(draw, (self.width - 200, footer_y + 12), f"VALID UNTIL: {valid_until}", 
                  fill='#666666', font=self.fonts['small'])
         
         # 右下角QR码（GitHub Repo链接）
         qr_x, qr_y = self.width - 60, footer_y + 8
         try:
-            qr_img = self._generate_qr_code("https://github.com/MuseLinn/fis-architecture", size=45)
+            with span("badge.qr"):
+                qr_img = self._generate_qr_code("https://github.com/MuseLinn/fis-architecture", size=45)
             # 粘贴QR码到底部区域
             card_img.paste(qr_img, (qr_x, qr_y))
         except Exception as e:
@@ -720,29 +960,34 @@ class BadgeGenerator:
                                       fill='#ffffff')
 
 
-def generate_badge_with_task(agent_name, role, task_desc, task_requirements, output_dir=None):
+def _badge_stamp(ticket_id=None, content=None):
     """
-    便捷函数：生成带详细任务要求的工卡
-    
-    Args:
-        agent_name: 子代理名称
-        role: 角色 (WORKER/RESEARCHER/REVIEWER/FORMATTER)
-        task_desc: 任务描述
-        task_requirements: 任务输出要求列表
-        output_dir: 输出目录
+    工牌唯一标识：优先复用 ticket 的时间与 token (同一 ticket 总是相同)；
+    确定性模式 (传入 content) 下由内容哈希派生 (同一天内相同内容总是相同，可命中缓存)，否则新分配
     """
-    generator = BadgeGenerator(output_dir)
-    
-    # 生成唯一ID
-    timestamp = datetime.now()
-    agent_id = f"CYBERMAO-SA-{timestamp.year}-{timestamp.strftime('%m%d%H%M')}"
-    
+    if ticket_id:
+        stamp = ticket_stamp(ticket_id)
+        if stamp:
+            return stamp
+    timestamp, token = content_stamp(content) if content is not None else next_stamp()
+    if ticket_id:
+        token = ticket_token(ticket_id) or token
+    return timestamp, token
+
+
+def _task_agent_data(agent_name, role, task_desc, task_requirements, ticket_id=None, deterministic=False):
+    """任务工牌数据 (单张与批量渲染共用)；deterministic 时未关联 ticket 的编号由内容派生"""
+    content = None
+    if deterministic:
+        content = json.dumps([agent_name, role, task_desc, task_requirements, ticket_id],
+                             ensure_ascii=False, default=str)
+    timestamp, token = _badge_stamp(ticket_id, content)
     agent_data = {
         'name': agent_name,
-        'id': agent_id,
+        'id': f"CYBERMAO-SA-{timestamp.year}-{token}",
         'role': role,
         'task_id': f"#{role[:4].upper()}-{timestamp.strftime('%m%d')}",
-        'soul': f'"{task_desc[:30]}..."' if len(task_desc) > 30 else f'"{task_desc}"',
+        'soul': f'"{task_desc}"',  # 渲染时按像素宽度换行 / 省略
         'responsibilities': [
             "Execute task with precision and quality",
             "Report progress within deadline",
@@ -750,98 +995,141 @@ def generate_badge_with_task(agent_name, role, task_desc, task_requirements, out
         ],
         'output_formats': 'MARKDOWN | JSON | TXT',
         'task_requirements': task_requirements,
-        'barcode_id': f"OC-{timestamp.year}-{role[:4].upper()}-{timestamp.strftime('%m%d')}",
+        'barcode_id': f"OC-{timestamp.year}-{role[:4].upper()}-{token}",
         'status': 'PENDING',
+        'valid_until': (timestamp + timedelta(days=365)).strftime('%Y-%m-%d'),
     }
+    if ticket_id:
+        agent_data['ticket_id'] = ticket_id
+    return agent_data
+
+
+def generate_badge_with_task(agent_name, role, task_desc, task_requirements, output_dir=None,
+                             ticket_id=None, generator=None):
+    """
+    便捷函数：生成带详细任务要求的工卡
+    
+    Args:
+        agent_name: 子代理名称
+        role: 角色 (WORKER/RESEARCHER/REVIEWER/FORMATTER)
+        task_desc: 任务描述
+        task_requirements: 任务输出要求列表
+        output_dir: 输出目录 (复用 generator 时同样生效)
+        ticket_id: 关联的 Ticket ID (工号/条码复用其 token)
+        generator: 复用已有 BadgeGenerator (字体已加载)，常驻进程使用
+    """
+    if generator is None:
+        generator = BadgeGenerator(output_dir)
     
-    return generator.create_badge(agent_data)
+    agent_data = _task_agent_data(agent_name, role, task_desc, task_requirements, ticket_id,
+                                  generator.deterministic)
+    return generator.create_badge(agent_data, output_dir=output_dir)
 
 
-def generate_multi_badge(cards_data, output_name=None):
+def generate_badge_batch(cards_data, collage_name=None, generator=None, collage=True, collage_dir=None):
     """
-    生成多工牌拼接图 (2x2 网格或垂直排列)
+    批量渲染：一个 BadgeGenerator (字体只加载一次) 渲染全部工牌，并拼接为一张图
+    
+    每张工牌渲染后直接贴入内存中的拼接画布，不再从磁盘读回。
     
     Args:
-        cards_data: [{'agent_name': 'Worker-1', 'role': 'worker', 'task_desc': '...', 'task_requirements': [...]}, ...]
-        output_name: 输出文件名
+        cards_data: [{'agent_name', 'role', 'task_desc', 'task_requirements', 'ticket_id'}, ...]
+        collage_name: 拼接图文件名 (默认 badge_multi_{timestamp}.png)
+        generator: 复用已有 BadgeGenerator
+        collage: 是否生成拼接图
+        collage_dir: 拼接图目录 (默认 ~/.openclaw/output/badges)
     
     Returns:
-        拼接后的图片路径
+        (各工牌路径列表, 拼接图路径或 None)
     """
-    from PIL import Image
-    
-    generator = BadgeGenerator()
-    
-    # 生成单个工牌
-    badge_images = []
-    for card in cards_data:
-        agent_data = {
-            'name': card['agent_name'],
-            'id': f"CYBERMAO-SA-{datetime.now().year}-{datetime.now().strftime('%m%d%H%M')}",
-            'role': card['role'],
-            'task_id': f"#{card['role'][:4].upper()}-{datetime.now().strftime('%m%d')}",
-            'soul': f'"{card["task_desc"][:30]}..."' if len(card["task_desc"]) > 30 else f'"{card["task_desc"]}"',
-            'responsibilities': [
-                "Execute task with precision and quality",
-                "Report progress within deadline",
-                "Follow FIS 3.1 protocol standards",
-            ],
-            'output_formats': 'MARKDOWN | JSON | TXT',
-            'task_requirements': card.get('task_requirements', ['Report.md']),
-            'barcode_id': f"OC-{datetime.now().year}-{card['role'][:4].upper()}-{datetime.now().strftime('%m%d')}",
-            'status': 'PENDING',
-        }
-        badge_path = generator.create_badge(agent_data)
-        badge_images.append(Image.open(badge_path))
-    
-    # 拼接图片
-    n = len(badge_images)
-    if n == 0:
-        return None
-    
-    # 获取单张尺寸
-    w, h = badge_images[0].size
-    
-    # 决定布局: 2x2 网格或垂直排列
-    if n <= 2:
-        # 垂直排列
-        total_h = h * n
-        collage = Image.new('RGB', (w, total_h), (245, 245, 240))
-        for i, img in enumerate(badge_images):
-            collage.paste(img, (0, i * h))
-    elif n <= 4:
+    if not cards_data:
+        return [], None
+    if generator is None:
+        generator = BadgeGenerator()
+    
+    canvas = None
+    if collage:
+        size, positions = _collage_layout(len(cards_data), generator.width, generator.height)
+        canvas = Image.new('RGB', size, (245, 245, 240))
+    
+    badge_paths = []
+    total_bytes = total_ms = 0
+    with span("badge.batch", cards=len(cards_data)):
+        for i, card in enumerate(cards_data):
+            agent_data = _task_agent_data(
+                card['agent_name'], card['role'], card['task_desc'],
+                card.get('task_requirements', ['Report.md']), card.get('ticket_id'), generator.deterministic,
+            )
+            cached = generator.cached_badge(agent_data)
+            if cached:
+                badge_paths.append(cached)
+                image = Image.open(cached) if canvas is not None else None
+            else:
+                image = generator.render(agent_data)
+                badge_paths.append(generator.save_badge(image, agent_data))
+            if canvas is not None:
+                canvas.paste(image, positions[i])
+            total_bytes += generator.last_encode['bytes']
+            total_ms += generator.last_encode['encode_ms']
+    print(f"📦 {len(badge_paths)} badge(s): {total_bytes / 1024:.1f} KB "
+          f"({generator.encoding['format']}, encode {total_ms:.1f} ms)")
+    
+    if canvas is None:
+        return badge_paths, None
+    return badge_paths, _save_collage(canvas, collage_name, generator.encoding, collage_dir)
+
+
+def _collage_layout(n, w, h):
+    """
+    拼接布局 (≤2 张垂直，3-4 张 2x2 网格，更多垂直排列)
+    
+    Returns:
+        ((总宽, 总高), [(x, y), ...])
+    """
+    if 3 <= n <= 4:
         # 2x2 网格
         cols = 2
         rows = (n + 1) // 2
-        total_w = w * cols
-        total_h = h * rows
-        collage = Image.new('RGB', (total_w, total_h), (245, 245, 240))
-        for i, img in enumerate(badge_images):
-            row = i // cols
-            col = i % cols
-            collage.paste(img, (col * w, row * h))
-    else:
-        # 超过4张，垂直排列
-        total_h = h * n
-        collage = Image.new('RGB', (w, total_h), (245, 245, 240))
-        for i, img in enumerate(badge_images):
-            collage.paste(img, (0, i * h))
-    
-    # 保存
-    output_dir = Path.home() / ".openclaw" / "output" / "badges"
+        return (w * cols, h * rows), [((i % cols) * w, (i // cols) * h) for i in range(n)]
+    # 垂直排列
+    return (w, h * n), [(0, i * h) for i in range(n)]
+
+
+def _save_collage(collage, output_name=None, encoding=None, output_dir=None):
+    """编码并保存拼接画布"""
+    encoding = encoding or encode_settings()
+    output_dir = Path(output_dir) if output_dir else Path.home() / ".openclaw" / "output" / "badges"
     output_dir.mkdir(parents=True, exist_ok=True)
     
     if output_name is None:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_name = f"badge_multi_{timestamp}.png"
     
-    output_path = output_dir / output_name
-    collage.save(output_path, 'PNG', quality=95)
-    print(f"✅ Multi-badge collage: {output_path}")
+    # 扩展名跟随编码格式
+    output_path = (output_dir / output_name).with_suffix(IMAGE_FORMATS[encoding['format']])
+    with span("badge.collage.save", format=encoding['format']) as s:
+        stats = encode_image(collage, output_path, encoding)
+        s.set(bytes=stats['bytes'])
+    print(f"✅ Multi-badge collage: {output_path} "
+          f"({stats['bytes'] / 1024:.1f} KB, encode {stats['encode_ms']:.1f} ms)")
     
     return str(output_path)
 
 
+def generate_multi_badge(cards_data, output_name=None):
+    """
+    生成多工牌拼接图 (2x2 网格或垂直排列)
+    
+    Args:
+        cards_data: [{'agent_name': 'Worker-1', 'role': 'worker', 'task_desc': '...', 'task_requirements': [...]}, ...]
+        output_name: 输出文件名
+    
+    Returns:
+        拼接后的图片路径
+    """
+    return generate_badge_batch(cards_data, output_name)[1]
+
+
 if __name__ == "__main__":
     # 测试生成工卡
     print("=== FIS 3.1 Badge Generator v7.0 ===")
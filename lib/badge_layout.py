@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+FIS 3.2 工牌文字排版 - 按像素宽度换行 / 省略
+
+旧版按字符数截断 ([:58]、[:45] ...)：中文 (全角) 溢出版面，英文又浪费空间。
+这里按实际字宽排版：
+
+- 每个字体一张字宽表 (codepoint → advance)，跨渲染、跨 BadgeGenerator 实例缓存
+  首次遇到的字符调用一次 font.getlength，之后每个字符只是一次 dict 查找
+- 中日韩字符逐字可断行，拉丁文字按单词断行，超长单词逐字断开
+- 放不下时末行以 "..." 结尾
+
+用法：
+    from badge_layout import ellipsize, text_width, wrap
+    draw.text(xy, ellipsize(font, text, 400), font=font)
+"""
+
+import re
+
+ELLIPSIS = "..."
+
+# 可在任意两个字之间断行的字符 (CJK 统一表意文字、假名、谚文、全角符号)
+_CJK = r'\u2e80-\u9fff\uac00-\ud7af\uf900-\ufaff\ufe30-\ufe4f\uff00-\uffef'
+_TOKEN_RE = re.compile(rf'[{_CJK}]|[^\s{_CJK}]+\s*|\s+')
+
+_metrics = {}
+
+
+class GlyphMetrics:
+    """单个字体的字宽表"""
+
+    __slots__ = ('font', 'advances')
+
+    def __init__(self, font):
+        self.font = font
+        self.advances = {}
+
+    def _measure(self, ch):
+        try:
+            return self.font.getlength(ch)
+        except AttributeError:
+            # 旧版 Pillow 位图字体没有 getlength
+            bbox = self.font.getbbox(ch)
+            return bbox[2] - bbox[0]
+
+    def width(self, text):
+        advances = self.advances
+        total = 0.0
+        for ch in text:
+            advance = advances.get(ch)
+            if advance is None:
+                advance = advances[ch] = self._measure(ch)
+            total += advance
+        return total
+
+
+def metrics(font):
+    """字体对应的字宽表 (按字体文件 + 字号共享)"""
+    path = getattr(font, 'path', None)
+    key = (path, getattr(font, 'size', None), getattr(font, 'index', 0)) if path else id(font)
+    table = _metrics.get(key)
+    if table is None or (not path and table.font is not font):
+        table = _metrics[key] = GlyphMetrics(font)
+    return table
+
+
+def text_width(font, text):
+    """文本像素宽度 (不含字距调整，等宽 / CJK 字体下与 getlength 一致)"""
+    return metrics(font).width(text)
+
+
+def ellipsize(font, text, max_width, ellipsis=ELLIPSIS):
+    """放得下原样返回，否则截断并以 ellipsis 结尾"""
+    table = metrics(font)
+    if table.width(text) <= max_width:
+        return text
+    budget = max_width - table.width(ellipsis)
+    width = 0.0
+    for i, ch in enumerate(text):
+        width += table.width(ch)
+        if width > budget:
+            return text[:i].rstrip() + ellipsis
+    return text
+
+
+def _line_spans(table, text, max_width):
+    """贪心断行，返回每行在 text 中的 (start, end)，不含行尾空白"""
+    spans = []
+    start = None
+    end = 0
+    width = 0.0          # 当前行宽度 (含尾随空白)
+    for match in _TOKEN_RE.finditer(text):
+        token = match.group()
+        if token.isspace():
+            if start is not None:
+                width += table.width(token)
+            continue
+        word = token.rstrip()
+        word_width = table.width(word)
+        if start is not None and width + word_width <= max_width:
+            end = match.start() + len(word)
+            width += table.width(token)
+            continue
+        if start is not None:
+            spans.append((start, end))
+            start = None
+        if word_width <= max_width:
+            start, end, width = match.start(), match.start() + len(word), table.width(token)
+            continue
+        # 超长单词逐字断开
+        for i, ch in enumerate(word, match.start()):
+            advance = table.width(ch)
+            if start is not None and width + advance > max_width:
+                spans.append((start, end))
+                start = None
+            if start is None:
+                start, width = i, 0.0
+            width += advance
+            end = i + 1
+        width += table.width(token[len(word):])
+    if start is not None:
+        spans.append((start, end))
+    return spans
+
+
+def wrap(font, text, max_width, max_lines=None):
+    """
+    按像素宽度换行
+
+    Returns:
+        行列表；超过 max_lines 时末行省略
+    """
+    table = metrics(font)
+    spans = _line_spans(table, text, max_width)
+    lines = [text[start:end] for start, end in spans]
+    if max_lines and len(lines) > max_lines:
+        rest = text[spans[max_lines - 1][0]:].replace('\n', ' ')
+        lines = lines[:max_lines - 1] + [ellipsize(font, rest, max_width)]
+    return lines
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+FIS 3.2 准入控制 - 限制同时 active 的子代理数量
+
+突发创建会同时耗尽模型配额和主机资源。这里在创建 ticket 前检查并发上限：
+
+    FIS_MAX_ACTIVE               全局 active 上限
+    FIS_MAX_ACTIVE_PER_PARENT    每个父代理的上限，"4" 或 "cybermao=8,*=4"
+    FIS_MAX_ACTIVE_PER_ROLE      每个角色的上限，"worker=6,reviewer=2"
+    FIS_ADMISSION_MODE           queue (默认) | reject
+
+- 未设置任何上限时不做任何检查 (与旧行为一致，不加锁、不打开索引)
+- 已满时 queue 模式把 ticket 写入 tickets/queued/ (status=queued)，reject 模式抛出 AdmissionError
+- 名额释放 (完成 / 超时失败) 后按公平顺序激活排队 ticket：active 最少的父代理优先，
+  同一父代理内先进先出；被角色上限挡住的 ticket 不阻塞同一父代理的其他角色
+- 新 ticket 不插队：先激活可激活的排队 ticket，再判断新 ticket
+- 计数来自 ticket 索引 (fis_index)；检查与写入在 .fis3.1/admission.lock 文件锁内完成，
+  多进程 / 守护进程并发创建也不会超额
+"""
+
+import fcntl
+import os
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+SHARED_HUB = Path.home() / ".openclaw" / "fis-hub"
+ADMISSION_LOCK = SHARED_HUB / ".fis3.1" / "admission.lock"
+ADMISSION_MODES = ('queue', 'reject')
+
+
+class AdmissionError(Exception):
+    """reject 模式下超出并发上限"""
+
+    def __init__(self, message, scope=None, limit=None):
+        super().__init__(message)
+        self.scope = scope
+        self.limit = limit
+        self.promoted = []      # 同一次检查中已激活的排队 ticket，调用方仍需通知
+
+
+def parse_limits(raw):
+    """"4" → ({}, 4)；"worker=6,*=2" → ({"worker": 6}, 2)；0 / 空表示不限制"""
+    named, default = {}, 0
+    for part in (raw or '').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        key, sep, value = part.rpartition('=')
+        if not sep or key == '*':
+            default = int(value)
+        else:
+            named[key.strip()] = int(value)
+    return named, default
+
+
+class AdmissionLimits:
+    """并发上限 (0 表示不限制)"""
+
+    def __init__(self, max_active=0, per_parent=None, per_role=None, mode='queue'):
+        """
+        Args:
+            per_parent / per_role: 整数 (统一上限) 或 {名称: 上限}，"*" 键为默认值
+        """
+        if mode not in ADMISSION_MODES:
+            raise ValueError(f"Unknown admission mode: {mode} (choose from {', '.join(ADMISSION_MODES)})")
+        self.max_active = max_active or 0
+        self.per_parent = self._split(per_parent)
+        self.per_role = self._split(per_role)
+        self.mode = mode
+
+    @staticmethod
+    def _split(value):
+        if isinstance(value, dict):
+            named = {k: v for k, v in value.items() if k != '*'}
+            return named, value.get('*', 0)
+        return {}, value or 0
+
+    @classmethod
+    def from_env(cls):
+        def limits(name):
+            named, default = parse_limits(os.environ.get(name))
+            return dict(named, **{'*': default}) if default else named
+
+        return cls(int(os.environ.get('FIS_MAX_ACTIVE', '0') or 0),
+                   limits('FIS_MAX_ACTIVE_PER_PARENT'), limits('FIS_MAX_ACTIVE_PER_ROLE'),
+                   os.environ.get('FIS_ADMISSION_MODE', 'queue'))
+
+    @property
+    def enabled(self):
+        return bool(self.max_active or self.per_parent[1] or any(self.per_parent[0].values())
+                    or self.per_role[1] or any(self.per_role[0].values()))
+
+    def parent_limit(self, parent):
+        named, default = self.per_parent
+        return named.get(parent, default)
+
+    def role_limit(self, role):
+        named, default = self.per_role
+        return named.get(role, default)
+
+    def blocked_by(self, counts, parent, role):
+        """超出的上限 (scope, limit)，有名额时返回 None"""
+        if self.max_active and counts.total >= self.max_active:
+            return 'global', self.max_active
+        limit = self.parent_limit(parent)
+        if limit and counts.parents.get(parent, 0) >= limit:
+            return f'parent {parent}', limit
+        limit = self.role_limit(role)
+        if limit and counts.roles.get(role, 0) >= limit:
+            return f'role {role}', limit
+        return None
+
+    def describe(self):
+        def fmt(pair):
+            named, default = pair
+            parts = [f"{k}={v}" for k, v in sorted(named.items())] + ([f"*={default}"] if default else [])
+            return ','.join(parts) or '-'
+        return {'mode': self.mode, 'max_active': self.max_active or None,
+                'per_parent': fmt(self.per_parent), 'per_role': fmt(self.per_role)}
+
+
+class ActiveCounts:
+    """当前 active 数量：总数 / 按父代理 / 按角色"""
+
+    def __init__(self, grouped=None):
+        self.total = 0
+        self.parents = {}
+        self.roles = {}
+        for (parent, role), n in (grouped or {}).items():
+            self.add(parent, role, n)
+
+    def add(self, parent, role, n=1):
+        self.total += n
+        self.parents[parent] = self.parents.get(parent, 0) + n
+        self.roles[role] = self.roles.get(role, 0) + n
+
+
+def _queued_at(ticket):
+    return ticket.get('queued_at') or (ticket.get('task') or {}).get('created_at') or ''
+
+
+def fair_order(queued, counts, limits):
+    """
+    从排队 ticket 中选出现在可激活的，按公平顺序返回 (会更新 counts)
+
+    每一轮选 active 最少的父代理 (相同时比较队首排队时间)，取其队列中第一个不受角色上限阻挡的 ticket
+    """
+    queues = {}
+    for ticket in sorted(queued, key=_queued_at):
+        queues.setdefault(ticket.get('parent'), []).append(ticket)
+
+    chosen = []
+    while queues:
+        parent = min(queues, key=lambda p: (counts.parents.get(p, 0), _queued_at(queues[p][0])))
+        queue = queues[parent]
+        pick = None
+        for i, ticket in enumerate(queue):
+            blocked = limits.blocked_by(counts, parent, ticket.get('role'))
+            if blocked is None:
+                pick = i
+                break
+            if blocked[0] in ('global', f'parent {parent}'):
+                break
+        if pick is None:
+            if limits.max_active and counts.total >= limits.max_active:
+                break
+            del queues[parent]
+            continue
+        ticket = queue.pop(pick)
+        chosen.append(ticket)
+        counts.add(parent, ticket.get('role'))
+        if not queue:
+            del queues[parent]
+    return chosen
+
+
+class AdmissionController:
+    """准入检查 + 排队 ticket 激活 (跨进程以文件锁串行)"""
+
+    def __init__(self, store, index, limits=None, lock_path=ADMISSION_LOCK):
+        """
+        Args:
+            store: TicketStore
+            index: TicketIndex 或返回它的可调用对象 (只在启用上限时打开)
+            limits: AdmissionLimits (默认读取环境变量)
+        """
+        self.store = store
+        self._index = index
+        self.limits = limits or AdmissionLimits.from_env()
+        self.lock_path = Path(lock_path)
+
+    @property
+    def index(self):
+        return self._index() if callable(self._index) else self._index
+
+    @contextmanager
+    def _locked(self):
+        self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_path, 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def active_counts(self):
+        return ActiveCounts(self.index.counts('active', ('parent', 'role')))
+
+    @contextmanager
+    def slot(self, packages):
+        """
+        为新 ticket 分配状态，在锁内写入 ticket 文件：
+
+            with admission.slot(packages) as (states, promoted):
+                for package, state in zip(packages, states):
+                    store.create(state, ...)
+
+        states: 每个 package 的 "active" / "queued" (package 状态字段已相应设置)
+        promoted: 本次先行激活的排队 ticket (已移入 active)，调用方负责后续通知
+
+        reject 模式下任一 package 无名额时抛出 AdmissionError，不写入任何新 ticket。
+        """
+        if not self.limits.enabled:
+            yield ['active'] * len(packages), []
+            return
+
+        with self._locked():
+            counts = self.active_counts()
+            # 排队 ticket 先占用空闲名额，新 ticket 不插队
+            promoted = self._promote(counts)
+            states = []
+            for package in packages:
+                blocked = self.limits.blocked_by(counts, package.get('parent'), package.get('role'))
+                if blocked is None:
+                    counts.add(package.get('parent'), package.get('role'))
+                    states.append('active')
+                    continue
+                if self.limits.mode == 'reject':
+                    scope, limit = blocked
+                    error = AdmissionError(f"Admission rejected: {scope} limit {limit} reached", scope, limit)
+                    error.promoted = promoted
+                    raise error
+                _mark_queued(package)
+                states.append('queued')
+            yield states, promoted
+
+    def promote(self):
+        """有空闲名额时激活排队 ticket，返回已移入 active 的 ticket 列表"""
+        if not self.limits.enabled:
+            return []
+        with self._locked():
+            return self._promote(self.active_counts())
+
+    def _promote(self, counts):
+        _, queued = self.index.query(state='queued', limit=None, refresh=False)
+        if not queued:
+            return []
+        promoted = []
+        now = datetime.now().isoformat()
+        for ticket in fair_order(queued, counts, self.limits):
+            ticket['status'] = 'pending'
+            ticket['activated_at'] = now
+            if isinstance(ticket.get('task'), dict):
+                ticket['task']['status'] = 'pending'
+            self.store.move(ticket['ticket_id'], 'queued', 'active', ticket)
+            promoted.append(ticket)
+        return promoted
+
+    def stats(self):
+        """active / queued 数量 (按父代理、角色) 与排队时长"""
+        index = self.index
+        active = ActiveCounts(index.counts('active', ('parent', 'role')))
+        queued = ActiveCounts(index.counts('queued', ('parent', 'role'), refresh=False))
+        _, oldest = index.query(state='queued', sort='created_at', limit=1, refresh=False)
+        wait = None
+        if oldest:
+            try:
+                wait = (datetime.now() - datetime.fromisoformat(_queued_at(oldest[0]))).total_seconds()
+            except ValueError:
+                pass
+        return {
+            'limits': self.limits.describe(),
+            'active': {'total': active.total, 'by_parent': active.parents, 'by_role': active.roles},
+            'queued': {'total': queued.total, 'by_parent': queued.parents, 'by_role': queued.roles,
+                       'oldest_wait_s': round(wait, 1) if wait is not None else None},
+        }
+
+
+def _mark_queued(package):
+    package['status'] = 'queued'
+    package['queued_at'] = datetime.now().isoformat()
+    if isinstance(package.get('task'), dict):
+        package['task']['status'] = 'queued'
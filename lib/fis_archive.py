@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+FIS 3.2 Ticket 归档段 - 压缩 JSONL + 稀疏索引
+
+将 tickets/completed/ 中超过阈值的 ticket 压缩进只追加的段文件：
+    tickets/archive/seg_{FROM}_{TO}_{TOKEN}.jsonl.gz   (或 .jsonl.zst)
+    tickets/archive/seg_{FROM}_{TO}_{TOKEN}.idx.json
+
+- 段内记录按 ticket_id 排序，每 BLOCK_SIZE 条为一个独立压缩块 (gzip member / zstd frame)
+- 稀疏索引只记录每块的首个 ticket_id 与偏移 → 单条查找只解压一个块
+- 全量扫描按块顺序读取，无需解压到磁盘
+- 索引文件最后写入，作为段提交标记；没有索引的段视为未完成，读者忽略
+- 段内 ticket 的日期范围 (first_day / last_day) 取所有 ID 日期的最小 / 最大值记入索引，
+  按日期过滤时据此跳过整段 (ticket_id 排序以父代理为主，首尾 ID 不代表日期范围)
+
+zstd 为可选依赖 (pip install zstandard)，缺失时使用 gzip。
+"""
+
+import bisect
+import gzip
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import fis_json
+from fis_ids import next_stamp
+from fis_storage import SHARD_DATE_RE
+
+# zstandard module optional - fallback to gzip if not available
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+
+BLOCK_SIZE = 256
+CODEC_SUFFIX = {'gzip': '.jsonl.gz', 'zstd': '.jsonl.zst'}
+
+
+def _default_codec():
+    codec = os.environ.get('FIS_ARCHIVE_CODEC')
+    if codec:
+        return codec
+    return 'zstd' if HAS_ZSTD else 'gzip'
+
+
+def _compress(codec, data):
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def _decompress(codec, data):
+    if codec == 'zstd':
+        if not HAS_ZSTD:
+            raise RuntimeError("zstd archive segment requires: pip install zstandard")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class ArchiveSegment:
+    """单个已提交的归档段 (只读)"""
+
+    def __init__(self, index_path):
+        self.index_path = Path(index_path)
+        meta = fis_json.read(self.index_path)
+        self.codec = meta['codec']
+        self.count = meta['count']
+        self.blocks = meta['blocks']            # [[first_id, offset, length, count], ...]
+        self.first_id = meta['first_id']
+        self.last_id = meta['last_id']
+        # 日期范围；旧版索引没有该字段 (None)，读者不裁剪
+        self.first_day = meta.get('first_day')
+        self.last_day = meta.get('last_day')
+        self.data_path = self.index_path.with_name(meta['data'])
+        self._first_ids = [b[0] for b in self.blocks]
+
+    def _read_block(self, fh, block):
+        _, offset, length, _ = block
+        fh.seek(offset)
+        raw = _decompress(self.codec, fh.read(length))
+        return [fis_json.loads(line) for line in raw.splitlines() if line]
+
+    def __iter__(self):
+        """顺序扫描整个段"""
+        with open(self.data_path, 'rb') as fh:
+            for block in self.blocks:
+                yield from self._read_block(fh, block)
+
+    def get(self, ticket_id):
+        """稀疏索引查找：二分定位块，只解压一个块"""
+        if not (self.first_id <= ticket_id <= self.last_id):
+            return None
+        i = bisect.bisect_right(self._first_ids, ticket_id) - 1
+        if i < 0:
+            return None
+        with open(self.data_path, 'rb') as fh:
+            for ticket in self._read_block(fh, self.blocks[i]):
+                if ticket.get('ticket_id') == ticket_id:
+                    return ticket
+        return None
+
+
+class TicketArchive:
+    """completed ticket 压缩归档"""
+
+    def __init__(self, archive_dir, codec=None, block_size=BLOCK_SIZE):
+        self.root = Path(archive_dir)
+        self.codec = codec or _default_codec()
+        self.block_size = block_size
+
+    def segments(self):
+        """已提交的段 (按名称即时间顺序)"""
+        if not self.root.exists():
+            return []
+        return [ArchiveSegment(p) for p in sorted(self.root.glob("seg_*.idx.json"))]
+
+    def write_segment(self, tickets):
+        """写入一个新段，返回索引路径；tickets 为空时返回 None"""
+        tickets = sorted(tickets, key=lambda t: t['ticket_id'])
+        if not tickets:
+            return None
+        if self.codec == 'zstd' and not HAS_ZSTD:
+            raise RuntimeError("FIS_ARCHIVE_CODEC=zstd requires: pip install zstandard")
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        _, token = next_stamp()
+        days = {_day_of(t['ticket_id']) for t in tickets}
+        dated = sorted(d for d in days if d.isdigit())
+        # 含无日期 ID 的段无法按日期裁剪：不记录范围，始终扫描
+        first_day, last_day = (dated[0], dated[-1]) if dated and len(dated) == len(days) else (None, None)
+        stem = f"seg_{dated[0] if dated else 'undated'}_{dated[-1] if dated else 'undated'}_{token}"
+        data_path = self.root / f"{stem}{CODEC_SUFFIX[self.codec]}"
+        index_path = self.root / f"{stem}.idx.json"
+
+        blocks = []
+        offset = 0
+        with open(data_path, 'wb') as fh:
+            for start in range(0, len(tickets), self.block_size):
+                chunk = tickets[start:start + self.block_size]
+                lines = b''.join(fis_json.dumpb(t) + b'\n' for t in chunk)
+                payload = _compress(self.codec, lines)
+                fh.write(payload)
+                blocks.append([chunk[0]['ticket_id'], offset, len(payload), len(chunk)])
+                offset += len(payload)
+            fh.flush()
+            os.fsync(fh.fileno())
+
+        meta = {
+            'codec': self.codec,
+            'data': data_path.name,
+            'count': len(tickets),
+            'first_id': tickets[0]['ticket_id'],
+            'last_id': tickets[-1]['ticket_id'],
+            'first_day': first_day,
+            'last_day': last_day,
+            'created_at': datetime.now().isoformat(),
+            'blocks': blocks,
+        }
+        tmp = index_path.with_name(index_path.name + '.tmp')
+        tmp.write_bytes(fis_json.dumpb(meta))
+        os.replace(tmp, index_path)
+        return index_path
+
+    def get(self, ticket_id):
+        for segment in self.segments():
+            ticket = segment.get(ticket_id)
+            if ticket is not None:
+                return ticket
+        return None
+
+    def iter_tickets(self, since=None, until=None):
+        """
+        顺序扫描所有段；since/until ('YYYYMMDD') 按 ticket ID 日期过滤
+
+        段的 ID 日期范围与区间不相交时跳过整段；部分相交的段逐条过滤。
+        无日期的 ticket 与散文件 (TicketStore.iter_paths) 一致，始终返回。
+        """
+        for segment in self.segments():
+            first, last = segment.first_day, segment.last_day
+            if first and last:
+                if (since and last < since) or (until and first > until):
+                    continue
+                if (not since or first >= since) and (not until or last <= until):
+                    yield from segment
+                    continue
+            elif not since and not until:
+                yield from segment
+                continue
+            for ticket in segment:
+                day = _day_of(ticket.get('ticket_id') or '')
+                if day == 'undated' or ((not since or day >= since) and (not until or day <= until)):
+                    yield ticket
+
+    def __iter__(self):
+        return self.iter_tickets()
+
+    def compact(self, store, older_than_days=30, dry_run=False):
+        """
+        将 completed_at 早于阈值的 ticket 压缩为一个新段并删除原文件
+
+        只遍历阈值日期之前的分片目录 (ticket_id 日期 ≤ 完成日期)。
+
+        Returns:
+            (archived_count, index_path)
+        """
+        cutoff = datetime.now() - timedelta(days=older_than_days)
+        until = cutoff.strftime('%Y%m%d')
+
+        picked = []
+        for path, ticket in store.iter_tickets('completed', until=until):
+            task = ticket.get('task')
+            completed_at = (ticket.get('completed_at') or ticket.get('created_at')
+                            or (task.get('created_at') if isinstance(task, dict) else None))
+            if completed_at and completed_at < cutoff.isoformat():
+                picked.append((path, ticket))
+
+        if dry_run or not picked:
+            return len(picked), None
+
+        index_path = self.write_segment(t for _, t in picked)
+        # 段已提交后才删除原文件；中途崩溃最多产生重复，读者按 ticket_id 去重
+        for path, _ in picked:
+            path.unlink()
+            store._prune_empty(path.parent, store.state_dir('completed'))
+        return len(picked), index_path
+
+
+def _day_of(ticket_id):
+    match = SHARD_DATE_RE.search(ticket_id)
+    return ''.join(match.groups()) if match else 'undated'
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+FIS 3.2 生命周期守护进程客户端
+
+只依赖标准库：fis_lifecycle 作为脚本运行时，在导入生命周期模块的其余依赖之前
+先检查 socket 并转发 (守护进程未运行时再本地执行)，转发的命令不再付出冷启动导入开销。
+
+协议见 fis_daemon。
+"""
+
+import json
+import os
+import socket
+from pathlib import Path
+
+DAEMON_SOCKET = Path(os.environ.get("FIS_DAEMON_SOCKET")
+                     or Path.home() / ".openclaw" / "fis-hub" / ".fis3.1" / "lifecycled.sock")
+CONNECT_TIMEOUT = 0.5
+
+# 守护进程运行时 CLI 转发的命令
+FORWARDED_COMMANDS = {'create', 'create-batch', 'verify', 'complete', 'list', 'show', 'query', 'search', 'queue'}
+
+
+class DaemonClient:
+    """守护进程客户端 (每个实例一条长连接)"""
+
+    def __init__(self, path=DAEMON_SOCKET, timeout=None):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.sock.settimeout(CONNECT_TIMEOUT)
+            self.sock.connect(str(path))
+        except OSError:
+            self.sock.close()
+            raise
+        self.sock.settimeout(timeout)
+        self._file = self.sock.makefile("rwb")
+
+    def call(self, op, **args):
+        request = {"op": op, "args": args}
+        self._file.write(json.dumps(request, ensure_ascii=False).encode("utf-8") + b"\n")
+        self._file.flush()
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("daemon closed the connection")
+        return json.loads(line)
+
+    def close(self):
+        self._file.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def forward_cli(argv):
+    """
+    将 CLI 命令转发给守护进程并打印其输出
+
+    Returns:
+        True 表示已处理；False 表示守护进程不可用，调用方应本地执行
+    """
+    try:
+        client = DaemonClient()
+    except OSError:
+        return False
+
+    with client:
+        response = client.call("cli", argv=argv)
+        print(response.get("output", ""), end="")
+        if not response.get("ok"):
+            print(f"❌ Daemon error: {response.get('error')}")
+            return True
+        if response["result"].get("needs_confirmation"):
+            if input("   Force complete? (y/N): ").lower() == 'y':
+                response = client.call("cli", argv=argv + ["--force"])
+                print(response.get("output", ""), end="")
+    return True
+
+
+def forward_argv(argv):
+    """
+    按原始命令行决定是否转发 (不构建 argparse 解析器)
+
+    --no-daemon、-h/--help、非转发命令或 socket 不存在时返回 False，由调用方本地执行。
+    """
+    if '--no-daemon' in argv or '-h' in argv or '--help' in argv or not DAEMON_SOCKET.exists():
+        return False
+    command = next((a for a in argv if not a.startswith('-')), None)
+    if command not in FORWARDED_COMMANDS:
+        return False
+    if command == 'create-batch':
+        # 守护进程的工作目录不同：spec 路径转为绝对路径
+        argv = list(argv)
+        for i, arg in enumerate(argv):
+            if arg == '--spec' and i + 1 < len(argv):
+                argv[i + 1] = str(Path(argv[i + 1]).resolve())
+            elif arg.startswith('--spec='):
+                argv[i] = '--spec=' + str(Path(arg[len('--spec='):]).resolve())
+    return forward_cli(argv)
+
+
+def is_running(path=DAEMON_SOCKET):
+    try:
+        with DaemonClient(path) as client:
+            return client.call("ping").get("ok", False)
+    except OSError:
+        return False
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+FIS 3.2 生命周期守护进程 (可选)
+
+常驻进程，通过 Unix domain socket 提供 JSON 协议服务：
+- 工牌渲染器 (字体、版本号) 常驻内存，不再为每张工牌启动新解释器
+- active ticket 列表常驻内存，按分片目录 mtime 失效
+- 截止时间调度器 (fis_scheduler) 在后台线程运行，超时 / 逾期事件秒级触发
+- fis_lifecycle CLI 检测到 socket 后自动转发 create/verify/complete/list/show/query/search
+
+协议：每行一个 JSON 请求，返回一行 JSON 响应
+    → {"op": "list"}
+    ← {"ok": true, "result": [...]}
+    → {"op": "create", "args": {"agent_name": "w1", "task_desc": "..."}}
+    ← {"ok": true, "result": {"ticket_id": "...", "ticket": {...}}, "output": "..."}
+    → {"op": "query", "args": {"role": "reviewer", "overdue": true, "fields": ["ticket_id"]}}
+    ← {"ok": true, "result": {"total": 3, "results": [...]}}
+
+用法：
+    python3 fis_daemon.py start      # 后台启动
+    python3 fis_daemon.py serve      # 前台运行
+    python3 fis_daemon.py status
+    python3 fis_daemon.py stop
+"""
+
+import contextlib
+import io
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+from pathlib import Path
+
+# 客户端 (DaemonClient / forward_cli / is_running) 位于 fis_client，此处保留原有导出
+from fis_client import DAEMON_SOCKET, DaemonClient, forward_cli, is_running
+from fis_lifecycle import SHARED_HUB, TICKETS_DIR, SubAgentLifecycle, build_parser, run_command
+import fis_json
+from fis_journal import enabled as journal_enabled
+from fis_journal import shared_journal
+from fis_metrics import HubMetrics
+from fis_metrics import enabled as metrics_enabled
+from fis_scheduler import DeadlineScheduler
+from fis_storage import TicketStore, shared_cache
+
+DAEMON_LOG = SHARED_HUB / ".fis3.1" / "lifecycled.log"
+
+
+class LifecycleService:
+    """守护进程内的常驻状态：生命周期实例、工牌渲染器、active 缓存"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._lifecycles = {}
+        self._generator = None
+        self._active = None
+        self._active_sig = None
+        self.scheduler = DeadlineScheduler(TicketStore(TICKETS_DIR), lock=self._lock)
+        if metrics_enabled():
+            self.scheduler.add_listener(HubMetrics().on_expiry)
+        if journal_enabled():
+            self.scheduler.add_listener(shared_journal().on_expiry)
+        self.scheduler.add_listener(self._on_expiry)
+        self.started_at = time.time()
+        self.requests = 0
+        self.server = None
+
+    # ---------- 常驻资源 ----------
+
+    def lifecycle(self, parent="cybermao"):
+        if parent not in self._lifecycles:
+            lifecycle = SubAgentLifecycle(parent, badge_renderer=self.render_badge,
+                                          batch_renderer=self.render_badge_batch)
+            lifecycle.add_listener(self.scheduler.on_lifecycle_event)
+            self._lifecycles[parent] = lifecycle
+        return self._lifecycles[parent]
+
+    def _on_expiry(self, kind, action, ticket):
+        """超时失败释放名额：另起线程激活排队 ticket (调度线程此时持有 self._lock)"""
+        if action == 'fail':
+            threading.Thread(target=self._promote_queued, args=(ticket.get('parent') or "cybermao",),
+                             daemon=True).start()
+
+    def _promote_queued(self, parent):
+        with self._lock:
+            self.lifecycle(parent).promote_queued()
+
+    def render_badge(self, **kwargs):
+        """进程内渲染，复用已加载字体的 BadgeGenerator"""
+        from badge_generator_v7 import BadgeGenerator, generate_badge_with_task
+        if self._generator is None:
+            self._generator = BadgeGenerator()
+        return generate_badge_with_task(generator=self._generator, **kwargs)
+
+    def render_badge_batch(self, cards, collage_name=None, collage_dir=None):
+        """进程内批量渲染 + 拼接图"""
+        from badge_generator_v7 import BadgeGenerator, generate_badge_batch
+        if self._generator is None:
+            self._generator = BadgeGenerator()
+        return generate_badge_batch(cards, collage_name, generator=self._generator, collage_dir=collage_dir)
+
+    def start_scheduler(self):
+        """加载 active ticket 的到期事件并启动调度线程"""
+        with self._lock:
+            self.scheduler.refresh()
+        self.scheduler.start()
+    
+    def _active_signature(self, store):
+        """active 分片目录的 mtime 快照：文件增删/替换都会改变所在目录 mtime"""
+        base = store.state_dir("active")
+        if not base.exists():
+            return ()
+        sig = []
+        stack = [base]
+        while stack:
+            directory = stack.pop()
+            sig.append((str(directory), directory.stat().st_mtime_ns))
+            stack.extend(p for p in directory.iterdir() if p.is_dir())
+        return tuple(sorted(sig))
+
+    def active_tickets(self):
+        store = self.lifecycle().store
+        sig = self._active_signature(store)
+        if sig != self._active_sig:
+            self._active = [task for _, task in store.iter_tickets("active")]
+            self._active_sig = sig
+        return self._active
+
+    # ---------- 请求分发 ----------
+
+    def handle(self, request):
+        op = request.get("op")
+        args = request.get("args") or {}
+        self.requests += 1
+
+        if op == "ping":
+            return {"pid": os.getpid(), "uptime_s": round(time.time() - self.started_at, 1),
+                    "requests": self.requests, "pending_expiry": len(self.scheduler),
+                    "ticket_cache": shared_cache().stats()}
+        if op == "shutdown":
+            self.scheduler.stop()
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+            return {"stopping": True}
+
+        with self._lock:
+            if op == "list":
+                return [
+                    {"ticket_id": t.get("ticket_id"), "role": t.get("role"),
+                     "agent_id": t.get("agent_id"), "parent": t.get("parent"),
+                     "task": t.get("task")}
+                    for t in self.active_tickets()
+                ]
+            if op == "query":
+                total, rows = self.lifecycle().index.query(**args)
+                return {"total": total, "results": rows}
+            if op == "show":
+                return self.lifecycle().get_ticket(args["ticket_id"])
+            if op == "create":
+                lifecycle = self.lifecycle(args.pop("parent", "cybermao"))
+                ticket_id, ticket = lifecycle.create_task(**args)
+                return {"ticket_id": ticket_id, "ticket": ticket}
+            if op == "verify":
+                return self.lifecycle().verify_deliverables(args["ticket_id"])
+            if op == "complete":
+                return self.lifecycle().complete_task(
+                    args["ticket_id"], args.get("auto_collect", True), bool(args.get("force")))
+            if op == "cli":
+                return self._run_cli(args["argv"])
+
+        raise ValueError(f"Unknown op: {op}")
+
+    def _run_cli(self, argv):
+        args = build_parser().parse_args(argv)
+        result = run_command(self.lifecycle(), args, interactive=False)
+        response = {"result": result}
+        # complete 因交付物缺失被拒绝：让客户端在本地询问后带 --force 重试
+        if args.command == "complete" and result is False and not args.force:
+            response["needs_confirmation"] = self.lifecycle().store.locate("active", args.ticket_id) is not None
+        return response
+
+
+class _ThreadLocalStdout(io.TextIOBase):
+    """
+    按线程分流的 sys.stdout (serve 启动时安装一次)
+
+    请求线程在 capture() 内的输出写入各自的缓冲区，随响应返回；
+    调度线程、激活线程等其他线程的输出照常写入原 stdout (守护进程日志)。
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._local = threading.local()
+
+    @contextlib.contextmanager
+    def capture(self, buffer):
+        self._local.buffer = buffer
+        try:
+            yield buffer
+        finally:
+            self._local.buffer = None
+
+    def _target(self):
+        return getattr(self._local, "buffer", None) or self.stream
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        return self._target().write(text)
+
+    def flush(self):
+        self._target().flush()
+
+    @property
+    def encoding(self):
+        return self.stream.encoding
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        stdout = self.server.stdout
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            output = io.StringIO()
+            try:
+                request = fis_json.loads(line)
+                with stdout.capture(output):
+                    result = self.server.service.handle(request)
+                response = {"ok": True, "result": result}
+            except SystemExit:
+                response = {"ok": False, "error": "invalid arguments"}
+            except Exception as e:
+                response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            if output.getvalue():
+                response["output"] = output.getvalue()
+            self.wfile.write(fis_json.dumpb(response) + b"\n")
+            self.wfile.flush()
+
+
+class LifecycleServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, service):
+        self.service = service
+        self.stdout = sys.stdout if isinstance(sys.stdout, _ThreadLocalStdout) else _ThreadLocalStdout(sys.stdout)
+        sys.stdout = self.stdout
+        super().__init__(str(path), _Handler)
+
+
+def serve(path=DAEMON_SOCKET):
+    """前台运行守护进程"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.exists():
+        if is_running(path):
+            print(f"⚠️ Daemon already running: {path}")
+            return
+        path.unlink()  # 上次异常退出遗留的 socket
+
+    service = LifecycleService()
+    # socket 以 0o600 创建：bind 与 chmod 之间不留其他本地用户可连接的窗口 (此时尚无其他线程)
+    umask = os.umask(0o177)
+    try:
+        server = LifecycleServer(path, service)
+    finally:
+        os.umask(umask)
+    service.server = server
+    service.start_scheduler()
+
+    print(f"✅ FIS lifecycle daemon listening on {path} (pid {os.getpid()})")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        with contextlib.suppress(FileNotFoundError):
+            path.unlink()
+        sys.stdout = server.stdout.stream
+        print("👋 Daemon stopped")
+
+
+def main():
+    import argparse
+    import subprocess
+
+    parser = argparse.ArgumentParser(description="FIS 3.2 Lifecycle Daemon")
+    parser.add_argument("command", choices=["start", "serve", "stop", "status"])
+    parser.add_argument("--socket", default=str(DAEMON_SOCKET), help="Unix socket path")
+    args = parser.parse_args()
+    path = Path(args.socket)
+
+    if args.command == "serve":
+        serve(path)
+
+    elif args.command == "start":
+        if is_running(path):
+            print(f"⚠️ Daemon already running: {path}")
+            return
+        DAEMON_LOG.parent.mkdir(parents=True, exist_ok=True)
+        with open(DAEMON_LOG, "a") as log:
+            subprocess.Popen(
+                [sys.executable, str(Path(__file__).resolve()), "serve", "--socket", str(path)],
+                stdout=log, stderr=log, stdin=subprocess.DEVNULL, start_new_session=True,
+            )
+        for _ in range(50):
+            if is_running(path):
+                print(f"✅ Daemon started: {path}")
+                return
+            time.sleep(0.1)
+        print(f"❌ Daemon failed to start, see {DAEMON_LOG}")
+
+    elif args.command == "stop":
+        try:
+            with DaemonClient(path) as client:
+                client.call("shutdown")
+            print("✅ Daemon stopping")
+        except OSError:
+            print("⚠️ Daemon not running")
+
+    elif args.command == "status":
+        try:
+            with DaemonClient(path) as client:
+                info = client.call("ping")["result"]
+            print(f"✅ Running (pid {info['pid']}, uptime {info['uptime_s']}s, {info['requests']} requests, "
+                  f"{info['pending_expiry']} pending expiry events)")
+            cache = info.get('ticket_cache')
+            if cache:
+                print(f"   ticket cache: {cache['entries']}/{cache['max_entries']} entries, "
+                      f"{cache['hits']} hits / {cache['misses']} misses")
+        except OSError:
+            print("⚠️ Daemon not running")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+FIS 3.2 ID 分配器 - 单调递增、并发安全
+
+ULID 风格：毫秒时间戳 + 40-bit 随机数 (Crockford Base32)
+- 同一毫秒内随机部分递增 → 进程内严格单调、不重复
+- 跨进程依赖随机部分 + Ticket 独占创建 (TicketStore.create) 保证不覆盖
+
+Ticket ID 格式 (保持与旧格式兼容，仍可按日期分片)：
+    TASK_{PARENT}_{YYYYMMDD_HHMMSS}_{TOKEN}_{agent}
+    TOKEN = 3 位毫秒 + 8 位 Base32，例如 042K7Q9M2XA
+"""
+
+import hashlib
+import random
+import re
+import threading
+import time
+from datetime import date, datetime
+
+CROCKFORD = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+RANDOM_BITS = 40
+TOKEN_RE = re.compile(r'_\d{8}_\d{6}_(\d{3}[0-9A-HJKMNP-TV-Z]{8})_')
+STAMP_RE = re.compile(r'_(\d{8}_\d{6})_((\d{3})[0-9A-HJKMNP-TV-Z]{8})_')
+
+
+def _base32(value, length):
+    chars = []
+    for _ in range(length):
+        chars.append(CROCKFORD[value & 31])
+        value >>= 5
+    return ''.join(reversed(chars))
+
+
+class IdAllocator:
+    """线程安全的单调 ID 分配器"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rng = random.SystemRandom()
+        self._last_ms = -1
+        self._last_rand = 0
+
+    def _next(self):
+        with self._lock:
+            ms = time.time_ns() // 1_000_000
+            if ms <= self._last_ms:
+                # 同一毫秒 (或时钟回拨)：沿用上次时间，随机部分 +1
+                ms = self._last_ms
+                self._last_rand += 1
+                if self._last_rand >= 1 << RANDOM_BITS:
+                    # 单毫秒内耗尽 (实际不会发生) → 借用下一毫秒
+                    ms += 1
+                    self._last_rand = self._rng.getrandbits(RANDOM_BITS - 1)
+            else:
+                # 留出最高位作为递增余量
+                self._last_rand = self._rng.getrandbits(RANDOM_BITS - 1)
+            self._last_ms = ms
+            return ms, self._last_rand
+
+    def next_stamp(self):
+        """返回 (datetime, token)，token 在本进程内严格递增"""
+        ms, rand = self._next()
+        token = f"{ms % 1000:03d}{_base32(rand, RANDOM_BITS // 5)}"
+        return datetime.fromtimestamp(ms / 1000), token
+
+    def ulid(self):
+        """26 位标准 ULID 字符串 (48-bit 时间 + 80-bit 随机，低 40 位单调)"""
+        ms, rand = self._next()
+        high = self._rng.getrandbits(80 - RANDOM_BITS)
+        return _base32(ms, 10) + _base32((high << RANDOM_BITS) | rand, 16)
+
+
+_ALLOCATOR = IdAllocator()
+
+
+def next_stamp():
+    """模块级分配器：(datetime, token)"""
+    return _ALLOCATOR.next_stamp()
+
+
+def content_stamp(content, day=None):
+    """
+    由内容哈希派生 (datetime, token)：同一天 (day，默认今天) 内相同内容总是得到相同结果
+
+    用于确定性工牌在未关联 ticket 时的默认编号；datetime 为当天零点。
+    """
+    digest = int.from_bytes(hashlib.sha256(content.encode('utf-8')).digest()[:8], 'big')
+    token = f"{digest % 1000:03d}{_base32(digest >> 10, RANDOM_BITS // 5)}"
+    return datetime.combine(day or date.today(), datetime.min.time()), token
+
+
+def new_ulid():
+    return _ALLOCATOR.ulid()
+
+
+def new_ticket_id(parent, agent_name):
+    """
+    生成唯一 Ticket ID
+
+    Returns:
+        (ticket_id, datetime) - datetime 与 ID 中的时间戳一致，可直接作为 created_at
+    """
+    timestamp, token = next_stamp()
+    ticket_id = f"TASK_{parent.upper()}_{timestamp.strftime('%Y%m%d_%H%M%S')}_{token}_{agent_name}"
+    return ticket_id, timestamp
+
+
+def ticket_token(ticket_id):
+    """从 Ticket ID 中提取 token，旧格式 ID 返回 None"""
+    match = TOKEN_RE.search(ticket_id)
+    return match.group(1) if match else None
+
+
+def ticket_stamp(ticket_id):
+    """从 Ticket ID 还原 (datetime, token) - 与 new_ticket_id 分配时一致；旧格式 ID 返回 None"""
+    match = STAMP_RE.search(ticket_id)
+    if not match:
+        return None
+    timestamp = datetime.strptime(match.group(1), '%Y%m%d_%H%M%S')
+    return timestamp.replace(microsecond=int(match.group(3)) * 1000), match.group(2)
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+FIS 3.2 Ticket 查询索引 (SQLite)
+
+索引文件：fis-hub/.fis3.1/ticket_index.db (可删除，下次查询自动重建)
+
+- 每个 ticket 一行：常用过滤字段为独立列 (带索引)，完整 JSON 存于 data 列供投影
+- 增量同步：记录每个分片目录 / 归档段的 mtime，查询前只重读变化过的目录
+  (新建、完成、压缩都会改变所在目录 mtime)，其余目录只需一次 stat，不列目录
+- 刚修改过的目录 (RACY_WINDOW_NS 内) 不记录 mtime，下次查询再核对一次，
+  避免同一 mtime 精度内的连续写入被漏掉
+
+查询：
+    index.query(role="reviewer", parent="cybermao", overdue=True,
+                sort="deadline", limit=20, fields=["ticket_id", "task.deadline"])
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import fis_json
+from fis_storage import TICKET_STATES
+from fis_ticket import Ticket
+
+SCHEMA_VERSION = 2   # 2: data 列为归一化嵌套格式 (fis_ticket)
+RACY_WINDOW_NS = 2_000_000_000
+
+# 可过滤 / 排序的列
+COLUMNS = ('ticket_id', 'state', 'parent', 'agent_id', 'role', 'status',
+           'created_at', 'deadline', 'completed_at', 'description', 'badge_path')
+DEFAULT_FIELDS = ('ticket_id', 'state', 'role', 'agent_id', 'status', 'deadline', 'description')
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS tickets (
+    ticket_id    TEXT PRIMARY KEY,
+    state        TEXT NOT NULL,
+    parent       TEXT,
+    agent_id     TEXT,
+    role         TEXT,
+    status       TEXT,
+    created_at   TEXT,
+    deadline     TEXT,
+    completed_at TEXT,
+    description  TEXT,
+    badge_path   TEXT,
+    source       TEXT NOT NULL,
+    data         TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tickets_state_role ON tickets(state, role);
+CREATE INDEX IF NOT EXISTS idx_tickets_parent ON tickets(parent, state);
+CREATE INDEX IF NOT EXISTS idx_tickets_agent ON tickets(agent_id);
+CREATE INDEX IF NOT EXISTS idx_tickets_deadline ON tickets(deadline);
+CREATE INDEX IF NOT EXISTS idx_tickets_created ON tickets(created_at);
+CREATE INDEX IF NOT EXISTS idx_tickets_source ON tickets(source);
+CREATE TABLE IF NOT EXISTS sources (
+    path     TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL
+);
+PRAGMA user_version = {SCHEMA_VERSION};
+"""
+
+
+def ticket_row(state, ticket, source):
+    """ticket dict (任一格式) → 索引行；data 列存归一化后的嵌套格式"""
+    t = Ticket.from_dict(ticket, validate=False)
+    t.status = t.status or ('completed' if state == 'completed' else 'pending')
+    return (
+        t.ticket_id,
+        state,
+        t.parent,
+        t.agent_id,
+        t.role,
+        t.status,
+        t.created_at,
+        t.deadline,
+        t.completed_at,
+        t.description,
+        t.badge_path,
+        source,
+        t.to_json(),
+    )
+
+
+def project(ticket, field):
+    """投影字段：列名或 JSON 点路径 (task.deadline / output_requirements)"""
+    value = ticket
+    for key in field.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+class TicketIndex:
+    """Ticket 查询索引 (线程安全，可供守护进程多线程共享)"""
+
+    def __init__(self, db_path, store, archive=None):
+        """
+        Args:
+            store: TicketStore
+            archive: TicketArchive 或返回它的可调用对象 (按需加载)；None 表示不索引归档段
+        """
+        self.db_path = Path(db_path)
+        self.store = store
+        self._archive = archive
+        self._lock = threading.RLock()
+        self._conn = None
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                conn.executescript("DROP TABLE IF EXISTS tickets; DROP TABLE IF EXISTS sources;")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    # ---------- 同步 ----------
+
+    def _scan_dir(self, state, directory):
+        """读取目录内的 ticket，返回 (rows, 子目录)；scandir 的 d_type 判断不逐个 stat 文件"""
+        rows, subdirs = [], []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif entry.name.endswith('.json') and not entry.name.startswith('.'):
+                    try:
+                        rows.append(ticket_row(state, fis_json.read(entry.path), directory))
+                    except (OSError, ValueError):
+                        continue  # 写入中的文件，下次同步再读
+        return rows, subdirs
+
+    def _archive_segments(self):
+        archive = self._archive() if callable(self._archive) else self._archive
+        if archive is None or not archive.root.exists():
+            return []
+        return archive.segments()
+
+    def refresh(self):
+        """
+        增量同步：只重读 mtime 变化过的目录 / 新出现的归档段
+
+        Returns:
+            重新读取的来源 (目录或段) 数量
+        """
+        with self._lock:
+            conn = self.conn
+            known = dict(conn.execute("SELECT path, mtime_ns FROM sources"))
+            seen = set()
+            changed = 0
+            orphaned = False
+            now_ns = time.time_ns()
+
+            with conn:
+                # mtime 未变的目录，子目录集合也未变：直接沿用已知子目录，无需 scandir
+                children = {}
+                for key in known:
+                    children.setdefault(os.path.dirname(key), []).append(key)
+
+                for state in TICKET_STATES:
+                    stack = [str(self.store.state_dir(state))]
+                    while stack:
+                        key = stack.pop()
+                        try:
+                            mtime = os.stat(key).st_mtime_ns
+                        except FileNotFoundError:
+                            continue
+                        seen.add(key)
+                        if known.get(key) == mtime:
+                            stack.extend(children.get(key, ()))
+                            continue
+                        changed += 1
+                        try:
+                            rows, subdirs = self._scan_dir(state, key)
+                        except FileNotFoundError:
+                            seen.discard(key)
+                            continue
+                        stack.extend(subdirs)
+                        if self._replace_source(conn, key, rows, mtime, now_ns) and state == 'completed':
+                            orphaned = True
+
+                # 消失的目录 (压缩后被清理的空分片)
+                for key in set(known) - seen:
+                    if not key.endswith('.idx.json'):
+                        if self._drop_source(conn, key):
+                            orphaned = True
+
+                # 归档段不可变：只在新出现时读取一次；
+                # completed 散文件被删除 (压缩) 时重放全部段，补回此前因散文件优先而忽略的记录
+                archived = {str(seg.index_path): seg for seg in self._archive_segments()}
+                for key, segment in archived.items():
+                    seen.add(key)
+                    if key in known and not orphaned:
+                        continue
+                    changed += 1
+                    rows = [ticket_row('completed', t, key) for t in segment]
+                    # 散文件优先 (与 iter_completed 一致)：已存在的行不覆盖
+                    conn.executemany(f"INSERT OR IGNORE INTO tickets VALUES ({','.join('?' * 13)})", rows)
+                    conn.execute("INSERT OR REPLACE INTO sources VALUES (?, ?)", (key, 0))
+
+                for key in set(known) - seen:
+                    self._drop_source(conn, key)
+            return changed
+
+    def _drop_source(self, conn, key):
+        """删除来源及其行，返回删除的行数"""
+        removed = conn.execute("DELETE FROM tickets WHERE source = ?", (key,)).rowcount
+        conn.execute("DELETE FROM sources WHERE path = ?", (key,))
+        return removed
+
+    def _replace_source(self, conn, key, rows, mtime, now_ns):
+        """用目录当前内容替换该来源的行，返回是否有 ticket 从该目录消失"""
+        before = conn.execute("SELECT COUNT(*) FROM tickets WHERE source = ?", (key,)).fetchone()[0]
+        conn.execute("DELETE FROM tickets WHERE source = ?", (key,))
+        conn.executemany(f"INSERT OR REPLACE INTO tickets VALUES ({','.join('?' * 13)})", rows)
+        # 刚修改的目录记为 -1：同一 mtime 精度内可能还有写入，下次再核对
+        recorded = mtime if now_ns - mtime > RACY_WINDOW_NS else -1
+        conn.execute("INSERT OR REPLACE INTO sources VALUES (?, ?)", (key, recorded))
+        return before > len(rows)
+
+    def rebuild(self):
+        """丢弃索引并全量重建"""
+        with self._lock:
+            with self.conn:
+                self.conn.execute("DELETE FROM tickets")
+                self.conn.execute("DELETE FROM sources")
+            return self.refresh()
+
+    # ---------- 查询 ----------
+
+    def query(self, state=None, role=None, status=None, parent=None, agent=None,
+              deadline_before=None, deadline_after=None, created_since=None, created_until=None,
+              overdue=False, text=None, sort='created_at', descending=False,
+              limit=50, offset=0, fields=None, refresh=True):
+        """
+        过滤查询
+
+        Args:
+            state/role/status/parent/agent: 精确匹配，可传列表表示多选
+            deadline_before/after, created_since/until: ISO 时间或日期前缀 (字符串比较)
+            overdue: 仅 active 且 deadline 已过
+            text: 描述中包含的子串 (不区分大小写)
+            sort: 排序列 (COLUMNS 之一)
+            fields: 投影字段 (索引列名或 JSON 点路径)；None 返回完整 ticket
+
+        Returns:
+            (total, rows) - total 为分页前的匹配总数
+        """
+        if sort not in COLUMNS:
+            raise ValueError(f"Unknown sort field: {sort} (choose from {', '.join(COLUMNS)})")
+
+        where, params = [], []
+
+        def match(column, value):
+            if value is None:
+                return
+            values = [value] if isinstance(value, str) else list(value)
+            where.append(f"{column} IN ({','.join('?' * len(values))})")
+            params.extend(values)
+
+        match('state', state)
+        match('role', role)
+        match('status', status)
+        match('parent', parent)
+        match('agent_id', agent)
+
+        for column, op, value in (('deadline', '<', deadline_before), ('deadline', '>=', deadline_after),
+                                  ('created_at', '>=', created_since), ('created_at', '<', created_until)):
+            if value:
+                where.append(f"{column} {op} ?")
+                params.append(value)
+        if overdue:
+            where.append("state = 'active' AND deadline < ?")
+            params.append(datetime.now().isoformat())
+        if text:
+            where.append("instr(lower(description), ?) > 0")
+            params.append(text.lower())
+
+        clause = f"WHERE {' AND '.join(where)}" if where else ""
+        order = f"ORDER BY {sort} {'DESC' if descending else 'ASC'}, ticket_id"
+
+        with self._lock:
+            if refresh:
+                self.refresh()
+            total = self.conn.execute(f"SELECT COUNT(*) FROM tickets {clause}", params).fetchone()[0]
+            cursor = self.conn.execute(
+                f"SELECT {', '.join(COLUMNS)}, data FROM tickets {clause} {order} LIMIT ? OFFSET ?",
+                params + [limit if limit is not None else -1, offset],
+            )
+            rows = cursor.fetchall()
+
+        if not fields:
+            return total, [fis_json.loads(row[-1]) for row in rows]
+
+        projected = []
+        for row in rows:
+            columns = dict(zip(COLUMNS, row))
+            ticket = fis_json.loads(row[-1]) if any(f not in columns for f in fields) else None
+            projected.append({f: columns[f] if f in columns else project(ticket, f) for f in fields})
+        return total, projected
+
+    def counts(self, state, columns=('parent', 'role'), refresh=True):
+        """
+        按列分组计数，例如 active ticket 按 (parent, role) 的数量
+
+        Returns:
+            {(列值, ...): 数量}
+        """
+        if any(column not in COLUMNS for column in columns):
+            raise ValueError(f"Unknown column in {columns}")
+        group = ', '.join(columns)
+        with self._lock:
+            if refresh:
+                self.refresh()
+            rows = self.conn.execute(
+                f"SELECT {group}, COUNT(*) FROM tickets WHERE state = ? GROUP BY {group}", (state,)).fetchall()
+        return {tuple(row[:-1]): row[-1] for row in rows}
+
+
+def format_table(rows, fields, width=40):
+    """简单文本表格：每列宽度取内容最大值，超过 width 截断"""
+    def cell(value):
+        if value is None:
+            return '-'
+        text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+        return text if len(text) <= width else text[:width - 1] + '…'
+
+    cells = [[cell(row.get(f)) for f in fields] for row in rows]
+    widths = [max([len(f)] + [len(r[i]) for r in cells]) for i, f in enumerate(fields)]
+    lines = ['  '.join(f.ljust(w) for f, w in zip(fields, widths)),
+             '  '.join('-' * w for w in widths)]
+    lines.extend('  '.join(c.ljust(w) for c, w in zip(r, widths)) for r in cells)
+    return '\n'.join(lines)
@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+FIS 3.2 Ticket 事件日志 (只追加 journal)
+
+每次状态变化 (created / verified / badge / notified / completed / expired) 追加一行：
+    {"seq": 42, "ts": "2026-...", "event": "completed", "ticket_id": "...",
+     "state": "completed", "pid": 1234, "ticket": {...}, "detail": {...}}
+
+- 单文件 fis-hub/.fis3.1/journal.jsonl，多进程通过 flock 串行追加，seq 全局递增
+- created / completed / expired 记录携带完整 ticket 快照，可据此恢复 ticket 文件、重建指标
+- 记录在 ticket 写入成功后追加：journal 中出现的变化一定已经发生
+- 写入中崩溃留下的不完整最后一行，在下一次追加时 (持有 flock) 截掉
+- fsync 批量提交 (FIS_JOURNAL_FSYNC)：
+      batch   (默认) 每 FSYNC_BATCH 条或 FSYNC_INTERVAL 秒 fsync 一次，进程退出时补齐
+      always  每条 fsync
+      off     交给操作系统
+- 消费者按 seq 或字节偏移 tail：seq 有序，按 seq 定位用二分查找，无需额外索引
+
+用法：
+    python3 fis_journal.py tail --from-seq 100 [--follow]
+    python3 fis_journal.py replay-metrics        # 从 journal 重建 metrics.json
+    python3 fis_journal.py recover [--dry-run]   # 按最后快照补回缺失 / 未归档的 ticket 文件
+
+FIS_JOURNAL=0 关闭记录。
+"""
+
+import atexit
+import fcntl
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import fis_json
+
+JOURNAL_PATH = Path.home() / ".openclaw" / "fis-hub" / ".fis3.1" / "journal.jsonl"
+
+FSYNC_BATCH = 64
+FSYNC_INTERVAL = 0.05
+TAIL_CHUNK = 4096
+
+# 携带完整 ticket 快照的事件
+SNAPSHOT_EVENTS = {'created', 'activated', 'completed', 'expired'}
+
+
+_shared = None
+
+
+def enabled():
+    return os.environ.get('FIS_JOURNAL', '1') != '0'
+
+
+def shared_journal():
+    """进程内共享实例 (一个文件描述符、一个 fsync 批次)"""
+    global _shared
+    if _shared is None:
+        _shared = Journal()
+    return _shared
+
+
+class Journal:
+    """追加写 + 按 seq / 偏移读取"""
+
+    def __init__(self, path=JOURNAL_PATH, fsync=None):
+        self.path = Path(path)
+        self.fsync = fsync or os.environ.get('FIS_JOURNAL_FSYNC', 'batch')
+        if self.fsync not in ('batch', 'always', 'off'):
+            raise ValueError(f"Unknown FIS_JOURNAL_FSYNC mode: {self.fsync}")
+        self._lock = threading.Lock()
+        self._fd = None
+        self._last_seq = 0
+        self._last_end = -1          # 本进程最后写入后的文件大小；一致时无需重读尾部
+        self._pending = 0
+        self._pending_since = 0.0
+
+    # ---------- 写入 ----------
+
+    def _open(self):
+        if self._fd is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            atexit.register(self.close)
+        return self._fd
+
+    def _trim_torn_tail(self, fd, size):
+        """
+        文件不以换行结尾 (上次写入中崩溃) 时截掉不完整的最后一行，返回截断后的大小
+
+        须在持有 flock 时调用；否则新记录会接在残行后面，两行一起无法解析。
+        """
+        if size == 0:
+            return 0
+        with open(self.path, 'rb') as f:
+            f.seek(size - 1)
+            if f.read(1) == b'\n':
+                return size
+            start = size
+            while start > 0:
+                start = max(0, start - TAIL_CHUNK)
+                f.seek(start)
+                cut = f.read(size - start).rfind(b'\n')
+                if cut >= 0:
+                    size = start + cut + 1
+                    break
+            else:
+                size = 0
+        os.ftruncate(fd, size)
+        print(f"⚠️ Journal: truncated torn final line ({self.path.name} → {size} bytes)")
+        return size
+
+    def _tail_seq(self, size):
+        """读取文件最后一条记录的 seq"""
+        if size == 0:
+            return 0
+        with open(self.path, 'rb') as f:
+            start = max(0, size - TAIL_CHUNK)
+            while True:
+                f.seek(start)
+                chunk = f.read(size - start)
+                lines = chunk.rstrip(b'\n').split(b'\n')
+                if len(lines) > 1 or start == 0:
+                    try:
+                        return fis_json.loads(lines[-1])['seq']
+                    except (ValueError, KeyError):
+                        # 最后一行不完整 (写入中崩溃)：退回上一条
+                        return fis_json.loads(lines[-2])['seq'] if len(lines) > 1 else 0
+                start = max(0, start - TAIL_CHUNK)
+
+    def append(self, event, ticket_id, state=None, ticket=None, **detail):
+        """追加一条记录，返回 seq"""
+        record = {
+            'seq': 0,
+            'ts': datetime.now().isoformat(),
+            'event': event,
+            'ticket_id': ticket_id,
+            'state': state,
+            'pid': os.getpid(),
+        }
+        if ticket is not None:
+            record['ticket'] = ticket
+        if detail:
+            record['detail'] = detail
+
+        with self._lock:
+            fd = self._open()
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                size = os.fstat(fd).st_size
+                if size == self._last_end:
+                    seq = self._last_seq + 1
+                else:
+                    size = self._trim_torn_tail(fd, size)
+                    seq = self._tail_seq(size) + 1
+                record['seq'] = seq
+                line = fis_json.dumpb(record) + b'\n'
+                os.write(fd, line)
+                self._last_seq = seq
+                self._last_end = size + len(line)
+                self._after_write()
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        return seq
+
+    def _after_write(self):
+        if self.fsync == 'always':
+            os.fsync(self._fd)
+            return
+        if self.fsync == 'off':
+            return
+        now = time.monotonic()
+        if self._pending == 0:
+            self._pending_since = now
+            # 批次最长等待 FSYNC_INTERVAL：之后没有新写入也会提交
+            timer = threading.Timer(FSYNC_INTERVAL, self.flush)
+            timer.daemon = True
+            timer.start()
+        self._pending += 1
+        if self._pending >= FSYNC_BATCH or now - self._pending_since >= FSYNC_INTERVAL:
+            os.fsync(self._fd)
+            self._pending = 0
+
+    def flush(self):
+        """fsync 尚未提交的批次"""
+        with self._lock:
+            if self._fd is not None and self._pending:
+                os.fsync(self._fd)
+                self._pending = 0
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    # ---------- 生命周期监听 ----------
+
+    def on_lifecycle_event(self, event, ticket, **detail):
+        """SubAgentLifecycle 监听器"""
+        if event == 'completed':
+            state = 'completed'
+        elif event == 'rejected':
+            state = None            # 未写入 ticket 文件
+        elif ticket.get('status') == 'queued':
+            state = 'queued'
+        else:
+            state = 'active'
+        snapshot = ticket if event in SNAPSHOT_EVENTS else None
+        self.append(event, ticket.get('ticket_id'), state, snapshot, **detail)
+
+    def on_expiry(self, kind, action, ticket):
+        """DeadlineScheduler 监听器"""
+        state = 'completed' if action == 'fail' else 'active'
+        self.append('expired', ticket.get('ticket_id'), state, ticket, kind=kind, action=action)
+
+    # ---------- 读取 ----------
+
+    def offset_for_seq(self, seq):
+        """第一条 seq ≥ 给定值的记录的字节偏移 (二分查找)"""
+        if not self.path.exists():
+            return 0
+        with open(self.path, 'rb') as f:
+            size = f.seek(0, os.SEEK_END)
+            lo, hi = 0, size
+            # 不变式：lo 处为行首且之前的记录 seq < 目标
+            while hi - lo > TAIL_CHUNK:
+                mid = (lo + hi) // 2
+                f.seek(mid)
+                f.readline()                 # 对齐到下一行行首
+                line_start = f.tell()
+                line = f.readline()
+                if not line or line_start >= hi:
+                    hi = mid
+                    continue
+                try:
+                    current = fis_json.loads(line)['seq']
+                except (ValueError, KeyError):
+                    hi = mid
+                    continue
+                if current < seq:
+                    lo = f.tell()
+                else:
+                    hi = mid
+            f.seek(lo)
+            while True:
+                start = f.tell()
+                line = f.readline()
+                if not line:
+                    return start
+                try:
+                    if fis_json.loads(line)['seq'] >= seq:
+                        return start
+                except (ValueError, KeyError):
+                    return start
+
+    def read(self, from_seq=0, offset=None):
+        """
+        读取记录 (不含写到一半的最后一行)
+
+        Args:
+            from_seq: 从该 seq 开始
+            offset: 直接从字节偏移开始 (消费者保存的游标)，优先于 from_seq
+
+        Yields:
+            (record, next_offset)
+        """
+        if not self.path.exists():
+            return
+        if offset is None:
+            offset = self.offset_for_seq(from_seq) if from_seq else 0
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                offset += len(line)
+                try:
+                    record = fis_json.loads(line)
+                except ValueError:
+                    continue
+                if record.get('seq', 0) >= from_seq:
+                    yield record, offset
+
+    def follow(self, from_seq=0, offset=None, poll=0.2):
+        """持续 tail：读到末尾后每 poll 秒从上次偏移继续读"""
+        while True:
+            for record, offset in self.read(from_seq, offset):
+                yield record, offset
+            time.sleep(poll)
+
+    # ---------- 重建 / 恢复 ----------
+
+    def replay(self, listener, from_seq=0):
+        """按顺序把记录重放给生命周期监听器 listener(event, ticket, **detail)；返回最后的 seq"""
+        last = 0
+        for record, _ in self.read(from_seq):
+            ticket = record.get('ticket') or {'ticket_id': record.get('ticket_id')}
+            listener(record['event'], ticket, **(record.get('detail') or {}))
+            last = record['seq']
+        return last
+
+    def snapshots(self):
+        """每个 ticket 最后一次快照 → {ticket_id: (state, ticket)}"""
+        latest = {}
+        for record, _ in self.read():
+            if record.get('ticket') is not None:
+                latest[record['ticket_id']] = (record.get('state'), record['ticket'])
+        return latest
+
+    def recover(self, store, archive=None, dry_run=False):
+        """
+        按 journal 最后快照修复 ticket 文件：
+        - journal 已完成但文件仍在 active → 移入 completed
+        - journal 已激活但文件仍在 queued → 移入 active
+        - 文件缺失 (且不在归档段中) → 按快照重写
+
+        未经 journal 的外部完成 (文件已在 completed) 不回退。
+
+        Returns:
+            修复数量
+        """
+        plan = []
+        for ticket_id, (state, ticket) in self.snapshots().items():
+            if store.locate(state, ticket_id) is not None:
+                continue
+            if state == 'completed' and store.locate('active', ticket_id) is not None:
+                plan.append(('move', ticket_id, state, ticket, 'active'))
+            elif state == 'active' and store.locate('completed', ticket_id) is not None:
+                continue
+            elif state == 'active' and store.locate('queued', ticket_id) is not None:
+                plan.append(('move', ticket_id, state, ticket, 'queued'))
+            elif state == 'queued' and (store.locate('active', ticket_id) is not None
+                                        or store.locate('completed', ticket_id) is not None):
+                continue
+            else:
+                plan.append(('restore', ticket_id, state, ticket, None))
+
+        # 已压缩进归档段的 completed ticket 不是缺失
+        if archive is not None and any(p[0] == 'restore' and p[2] == 'completed' for p in plan):
+            archived = {t.get('ticket_id') for t in archive.iter_tickets()}
+            plan = [p for p in plan if not (p[0] == 'restore' and p[1] in archived)]
+
+        for action, ticket_id, state, ticket, source in plan:
+            print(f"   {action}: {ticket_id} → {state}")
+            if dry_run:
+                continue
+            if action == 'move':
+                store.move(ticket_id, source, state, ticket)
+            else:
+                store.write(state, ticket_id, ticket)
+        return len(plan)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="FIS 3.2 Ticket Journal")
+    subparsers = parser.add_subparsers(dest='command')
+    tail_parser = subparsers.add_parser('tail', help='Print records from a sequence number')
+    tail_parser.add_argument('--from-seq', type=int, default=0)
+    tail_parser.add_argument('--follow', '-f', action='store_true', help='Keep waiting for new records')
+    subparsers.add_parser('replay-metrics', help='Rebuild metrics.json from the journal')
+    recover_parser = subparsers.add_parser('recover', help='Restore ticket files from journal snapshots')
+    recover_parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+
+    journal = Journal()
+    if args.command == 'tail':
+        records = journal.follow(args.from_seq) if args.follow else journal.read(args.from_seq)
+        try:
+            for record, _ in records:
+                print(json.dumps(record, ensure_ascii=False))
+        except KeyboardInterrupt:
+            pass
+
+    elif args.command == 'replay-metrics':
+        from fis_metrics import HubMetrics
+        metrics = HubMetrics()
+        state = metrics.replay(journal)
+        print(f"✅ Metrics rebuilt from journal: {sum(state['created'].values())} ticket(s) → {metrics.path}")
+
+    elif args.command == 'recover':
+        from fis_archive import TicketArchive
+        from fis_lifecycle import TICKETS_DIR
+        from fis_storage import TicketStore
+        fixed = journal.recover(TicketStore(TICKETS_DIR), TicketArchive(TICKETS_DIR / "archive"), args.dry_run)
+        action = "Would fix" if args.dry_run else "Fixed"
+        print(f"✅ {action} {fixed} ticket file(s)")
+
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
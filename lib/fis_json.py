@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+FIS 3.2 JSON 编解码 - 可选快速后端
+
+ticket、索引、journal、指标的读写都经过这里：
+
+    FIS_JSON_BACKEND   auto (默认：已安装 orjson 则使用) | orjson | json
+    FIS_TICKET_FORMAT  pretty (默认，ticket 文件带缩进便于人工查看) | compact
+
+- orjson 为可选依赖 (pip install orjson)，缺失时使用标准库 json
+- 两个后端都输出 UTF-8 不转义中文，未知类型 (datetime 等) 按 str() 写出；字节并不完全相同：
+      NaN / Infinity   标准库写出 NaN / Infinity (非标准 JSON)，orjson 写出 null
+      浮点指数         标准库 1e+16 / 1e-07，orjson 1e16 / 1e-7 (解析结果相同)
+- orjson 无法解析标准库写出的 NaN / Infinity，此时读取回退到标准库，两个后端写出的文件可以互读
+- compact 为无空白的单行 JSON，用于只给程序读的文件 (metrics.json、journal、索引 data 列、归档段)
+- orjson 不支持的值 (超过 64 位的整数等) 自动回退到标准库
+"""
+
+import json
+import os
+
+# orjson module optional - fallback to stdlib json if not available
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKENDS = ('json', 'orjson')
+
+
+class StdlibCodec:
+    """标准库 json"""
+
+    name = 'json'
+
+    def dumps(self, obj, pretty=False):
+        if pretty:
+            return json.dumps(obj, indent=2, ensure_ascii=False, default=str)
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=str)
+
+    def dumpb(self, obj, pretty=False):
+        return self.dumps(obj, pretty).encode('utf-8')
+
+    def loads(self, data):
+        return json.loads(data)
+
+
+class OrjsonCodec:
+    """orjson (Rust 实现，编码 / 解码均快数倍)"""
+
+    name = 'orjson'
+
+    def __init__(self):
+        # datetime 交给 default=str，与标准库后端输出相同
+        self._options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        self._fallback = StdlibCodec()
+
+    def dumpb(self, obj, pretty=False):
+        try:
+            return orjson.dumps(obj, default=str,
+                                option=self._options | orjson.OPT_INDENT_2 if pretty else self._options)
+        except orjson.JSONEncodeError:
+            return self._fallback.dumpb(obj, pretty)
+
+    def dumps(self, obj, pretty=False):
+        return self.dumpb(obj, pretty).decode('utf-8')
+
+    def loads(self, data):
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # 标准库后端写出的 NaN / Infinity；真正损坏的数据仍由标准库抛出 ValueError
+            return self._fallback.loads(data)
+
+
+def get_codec(name=None):
+    """
+    按名称取编解码器 (默认读取 FIS_JSON_BACKEND)
+
+    Raises:
+        RuntimeError: 指定 orjson 但未安装
+    """
+    name = name or os.environ.get('FIS_JSON_BACKEND', 'auto')
+    if name == 'auto':
+        name = 'orjson' if orjson is not None else 'json'
+    if name == 'orjson':
+        if orjson is None:
+            raise RuntimeError("FIS_JSON_BACKEND=orjson requires: pip install orjson")
+        return OrjsonCodec()
+    if name == 'json':
+        return StdlibCodec()
+    raise ValueError(f"Unknown JSON backend: {name} (choose from auto, {', '.join(BACKENDS)})")
+
+
+def available_codecs():
+    """已安装的全部后端 (基准测试用)"""
+    return [StdlibCodec()] + ([OrjsonCodec()] if orjson is not None else [])
+
+
+def pretty_tickets():
+    """ticket 文件是否按缩进格式写出 (FIS_TICKET_FORMAT)"""
+    return os.environ.get('FIS_TICKET_FORMAT', 'pretty') != 'compact'
+
+
+CODEC = get_codec()
+
+
+def dumps(obj, pretty=False):
+    """→ str (默认 compact)"""
+    return CODEC.dumps(obj, pretty)
+
+
+def dumpb(obj, pretty=False):
+    """→ UTF-8 bytes (默认 compact)"""
+    return CODEC.dumpb(obj, pretty)
+
+
+def loads(data):
+    """str 或 bytes → 对象"""
+    return CODEC.loads(data)
+
+
+def read(path):
+    """读取并解析 JSON 文件 (按字节读取，不经过文本解码)"""
+    with open(path, 'rb') as f:
+        return CODEC.loads(f.read())
@@ -7,37 +7,335 @@ FIS 3.2.0 SubAgent 完整生命周期管理
 import json
 import os
 import sys
-import subprocess
-import shutil
-from datetime import datetime
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 from pathlib import Path
 
+from fis_client import forward_argv
+
+# 守护进程运行中：在导入其余依赖之前转发请求，避免每次冷启动
+if __name__ == "__main__" and forward_argv(sys.argv[1:]):
+    sys.exit(0)
+
+import fis_json
+from fis_ids import new_ticket_id, ticket_token
+from fis_storage import TicketStore
+from fis_ticket import Ticket
+from fis_trace import child_env, span
+
 # 路径配置
 WORKSPACE = Path.home() / ".openclaw" / "workspace"
 SHARED_HUB = Path.home() / ".openclaw" / "fis-hub"
 BADGE_GENERATOR = WORKSPACE / "skills" / "fis-architecture" / "lib" / "badge_generator_v7.py"
 TICKETS_DIR = SHARED_HUB / "tickets"
+# WhatsApp 允许发送的目录：待发送的工牌 / 拼接图直接渲染到这里，省去一次复制
+NOTIFY_DIR = WORKSPACE / "output"
 RESULTS_DIR = SHARED_HUB / "results"
+INDEX_DB = SHARED_HUB / ".fis3.1" / "ticket_index.db"
+
 
 class SubAgentLifecycle:
     """FIS 3.2.0 子代理生命周期管理器"""
     
-    def __init__(self, parent_agent="cybermao"):
+    def __init__(self, parent_agent="cybermao", badge_renderer=None, batch_renderer=None):
+        """
+        Args:
+            badge_renderer: 进程内工牌渲染函数 (守护进程使用，保持字体/渲染器常驻)；
+                            None 时通过子进程调用 badge_generator_v7
+            batch_renderer: 进程内批量渲染函数 (cards, collage_name, collage_dir) → (paths, collage_path)；
+                            None 时通过一个子进程批量渲染
+        """
         self.parent = parent_agent
         self.output_formats = ['md', 'json', 'txt', 'py', 'png', 'pdf']
+        self.badge_renderer = badge_renderer
+        self.batch_renderer = batch_renderer
+        self.store = TicketStore(TICKETS_DIR)
+        self.listeners = []
+        if os.environ.get("FIS_JOURNAL", "1") != "0":
+            self.add_listener(self._record_journal)
+        if os.environ.get("FIS_METRICS", "1") != "0":
+            self.add_listener(self._record_metrics)
+        self._archive = None
+        self._index = None
+        self._knowledge = None
+        self._retention = None
+        self._admission = None
+        if os.environ.get("FIS_RETENTION", "1") != "0":
+            self.add_listener(self._record_retention)
+    
+    @property
+    def archive(self):
+        """压缩归档段 - 按需加载，list/verify 等轻量命令不导入压缩库"""
+        if self._archive is None:
+            from fis_archive import TicketArchive
+            self._archive = TicketArchive(TICKETS_DIR / "archive")
+        return self._archive
+    
+    @property
+    def index(self):
+        """SQLite 查询索引 - 按需打开，查询前增量同步"""
+        if self._index is None:
+            from fis_index import TicketIndex
+            self._index = TicketIndex(INDEX_DB, self.store, lambda: self.archive)
+        return self._index
+    
+    @property
+    def knowledge(self):
+        """knowledge / results 全文索引 - 按需打开，检索前增量同步"""
+        if self._knowledge is None:
+            from fis_search import KnowledgeIndex
+            self._knowledge = KnowledgeIndex()
+        return self._knowledge
+    
+    @property
+    def retention(self):
+        """工牌文件 LRU 保留策略 (fis_retention)"""
+        if self._retention is None:
+            from fis_retention import BadgeRetention
+            self._retention = BadgeRetention()
+        return self._retention
+    
+    def add_listener(self, fn):
+        """
+        注册 ticket 状态变化回调 fn(event, ticket, **detail)
+        
+        event: created / badge / notified / verified / completed
+        """
+        self.listeners.append(fn)
+    
+    def _emit(self, event, ticket, **detail):
+        for listener in list(self.listeners):
+            try:
+                listener(event, ticket, **detail)
+            except Exception as e:
+                print(f"⚠️ Listener error ({event}): {e}")
+    
+    def _record_journal(self, event, ticket, **detail):
+        """追加到 hub 事件日志 (fis_journal)"""
+        from fis_journal import shared_journal
+        shared_journal().on_lifecycle_event(event, ticket, **detail)
+    
+    def _record_metrics(self, event, ticket, **detail):
+        """增量更新 hub 指标；首次启用时从现有 ticket 全量统计 (已包含本次变化)"""
+        from fis_metrics import HubMetrics
+        metrics = HubMetrics()
+        if event not in ("created", "activated", "rejected", "completed"):
+            return
+        if not metrics.path.exists():
+            metrics.rebuild(self.store, self.archive)
+            if event != "rejected":     # 被拒绝的 ticket 没有文件，全量统计不到
+                return
+        metrics.on_lifecycle_event(event, ticket)
+    
+    def _record_retention(self, event, ticket, **detail):
+        """登记新工牌 (刷新 LRU 时间)，超出限制时淘汰最久未用的工牌"""
+        if event == "badge" and detail.get("badge_path"):
+            self._retain(detail["badge_path"])
+    
+    def _retain(self, path):
+        if os.environ.get("FIS_RETENTION", "1") == "0" or not path or path == "None":
+            return
+        from fis_retention import active_badges
+        try:
+            if self.retention.record(path):
+                self.retention.sweep(lambda: active_badges(self))
+        except Exception as e:
+            print(f"⚠️ Badge retention error: {e}")
     
     def create_task(self, agent_name, task_desc, role="worker", 
-                   output_requirements=None, deadline_days=1):
+                   output_requirements=None, deadline_days=1, timeout_minutes=None):
         """
         创建完整任务包
         
         Args:
             output_requirements: ["技术报告.md", "代码.py", "结果图.png"]
+            deadline_days: 截止时间 (天，可为小数)
+            timeout_minutes: 无结果视为停滞的时长 (由 fis_scheduler 检查)
         """
-        timestamp = datetime.now()
-        ticket_id = f"TASK_{self.parent.upper()}_{timestamp.strftime('%Y%m%d_%H%M%S')}_{agent_name}"
+        with span("create_task", agent=agent_name, role=role) as root:
+            task_package = self._new_package(agent_name, task_desc, role, output_requirements,
+                                             deadline_days, timeout_minutes)
+            
+            # 准入检查 + 保存 Ticket (按日期分片，独占创建 - 并发突发时绝不覆盖已有 ticket)
+            with span("ticket.write"):
+                with self._admission_slot([task_package]) as (states, promoted):
+                    ticket_path = self._create_ticket_file(task_package, agent_name, states[0])
+            ticket_id = task_package["ticket_id"]
+            root.set(ticket_id=ticket_id)
+            self._activate_queued(promoted)
+            
+            # 已达并发上限：排队，名额释放后再生成工牌并通知
+            if states[0] == "queued":
+                self._emit("created", task_package)
+                self._emit("queued", task_package)
+                print(f"⏳ Task queued: {ticket_id} (concurrency limit reached)")
+                print(f"📁 Ticket: {ticket_path}")
+                return ticket_id, task_package
+            
+            # 生成工牌并记录到 ticket
+            badge_path = self._store_badge(task_package, ticket_path)
+            self._emit("created", task_package)
+            self._notify_badge(task_package, badge_path)
+        
+        print(f"✅ Task created: {ticket_id}")
+        print(f"📁 Ticket: {ticket_path}")
+        print(f"🎨 Badge: {badge_path}")
+        print(f"📋 Output requirements: {task_package['output_requirements']}")
+        
+        return ticket_id, task_package
+    
+    def _store_badge(self, task_package, ticket_path=None):
+        """生成工牌并写回 ticket 的 badge_path"""
+        with span("badge.generate"):
+            badge_path = self._generate_badge(task_package["agent_id"], task_package["role"],
+                                              task_package["task"]["description"],
+                                              task_package["output_requirements"], task_package["ticket_id"])
+        task_package["badge_path"] = str(badge_path)
+        with span("ticket.update"):
+            self.store.write("active", task_package["ticket_id"], task_package, path=ticket_path)
+        return badge_path
+    
+    def _notify_badge(self, task_package, badge_path):
+        self._emit("badge", task_package, badge_path=task_package["badge_path"])
+        # 自动发送工牌到 WhatsApp
+        with span("badge.notify"):
+            sent = self._send_badge_whatsapp(badge_path, task_package["agent_id"], task_package["ticket_id"])
+        self._emit("notified", task_package, channel="whatsapp", sent=bool(sent))
+    
+    @property
+    def admission(self):
+        """并发准入控制 (fis_admission) - 未设置上限时不加锁、不打开索引"""
+        if self._admission is None:
+            from fis_admission import AdmissionController
+            self._admission = AdmissionController(self.store, lambda: self.index)
+        return self._admission
+    
+    @contextmanager
+    def _admission_slot(self, packages):
+        """准入检查；拒绝时记录 rejected 事件 (同一次检查中激活的排队 ticket 仍照常通知)"""
+        from fis_admission import AdmissionError
+        try:
+            with self.admission.slot(packages) as (states, promoted):
+                yield states, promoted
+        except AdmissionError as e:
+            self._activate_queued(e.promoted)
+            for package in packages:
+                self._emit("rejected", package, reason=str(e), scope=e.scope,
+                           parent=package.get("parent"), role=package.get("role"))
+            raise
+    
+    def _activate_queued(self, tickets):
+        """已移入 active 的排队 ticket：生成工牌并通知，与直接创建时相同"""
+        for ticket in tickets:
+            with span("ticket.activate", ticket_id=ticket["ticket_id"]):
+                badge_path = self._store_badge(ticket)
+                self._emit("activated", ticket)
+                self._notify_badge(ticket, badge_path)
+            print(f"▶️ Queued task activated: {ticket['ticket_id']}")
+    
+    def promote_queued(self):
+        """有空闲名额时按公平顺序激活排队 ticket，返回激活的 ticket ID"""
+        promoted = self.admission.promote()
+        self._activate_queued(promoted)
+        return [ticket["ticket_id"] for ticket in promoted]
+    
+    def queue_status(self, output='table'):
+        """active / 排队数量 (按父代理、角色) 与并发上限"""
+        stats = self.admission.stats()
+        if output == 'json':
+            print(json.dumps(stats, indent=2, ensure_ascii=False))
+            return stats
+        limits = stats['limits']
+        print(f"\n🚦 Admission ({limits['mode']}): global {limits['max_active'] or '-'}, "
+              f"per parent {limits['per_parent']}, per role {limits['per_role']}")
+        for state in ('active', 'queued'):
+            counts = stats[state]
+            print(f"   {state:<7} {counts['total']:>5}   "
+                  + "  ".join(f"{k}={v}" for k, v in sorted(counts['by_parent'].items(), key=lambda kv: str(kv[0]))))
+        if stats['queued']['oldest_wait_s'] is not None:
+            print(f"   oldest queued for {stats['queued']['oldest_wait_s']:.0f}s")
+        return stats
+    
+    def create_tasks(self, specs, notify=True, collage_name=None, caption=None, max_workers=8):
+        """
+        批量创建任务 (fan-out)：并发写入全部 ticket → 一次批量渲染工牌与拼接图 → 一条合并通知
+        
+        Args:
+            specs: [{"agent_name", "task_desc", "role", "output_requirements",
+                     "deadline_days", "timeout_minutes"}, ...] (参数同 create_task)
+            notify: 是否发送拼接图
+            collage_name: 拼接图文件名 (默认 badge_multi_{timestamp}.png)
+            caption: 通知文字 (默认列出各 agent 与 ticket)
+        
+        Returns:
+            ([(ticket_id, task_package), ...], collage_path)
+        """
+        if not specs:
+            return [], None
+        from concurrent.futures import ThreadPoolExecutor
+        
+        with span("create_tasks", count=len(specs)):
+            packages = [self._new_package(**spec) for spec in specs]
+            
+            with ThreadPoolExecutor(min(max_workers, len(packages))) as pool:
+                with span("ticket.write", count=len(packages)):
+                    with self._admission_slot(packages) as (states, promoted):
+                        ticket_paths = list(pool.map(
+                            lambda pair: self._create_ticket_file(pair[0], pair[0]["agent_id"], pair[1]),
+                            zip(packages, states)))
+                # 排队的 ticket 等激活时再生成工牌
+                admitted = [(p, path) for p, path, state in zip(packages, ticket_paths, states) if state == "active"]
+                queued = [p for p, state in zip(packages, states) if state == "queued"]
+                
+                # 一个渲染进程 (字体只加载一次) 完成全部工牌 + 拼接图
+                cards = [{
+                    "agent_name": p["agent_id"],
+                    "role": p["role"],
+                    "task_desc": p["task"]["description"],
+                    "task_requirements": p["output_requirements"][:3],
+                    "ticket_id": p["ticket_id"],
+                } for p, _ in admitted]
+                badge_paths, collage_path = [], None
+                if cards:
+                    with span("badge.generate", count=len(cards)):
+                        badge_paths, collage_path = self._generate_badge_batch(cards, collage_name)
+                
+                for (package, _), badge_path in zip(admitted, badge_paths):
+                    package["badge_path"] = badge_path
+                with span("ticket.update", count=len(admitted)):
+                    list(pool.map(lambda pair: self.store.write("active", pair[0]["ticket_id"], pair[0], path=pair[1]),
+                                  admitted))
+            self._activate_queued(promoted)
+            
+            for package, _ in admitted:
+                self._emit("created", package)
+                self._emit("badge", package, badge_path=package["badge_path"])
+            for package in queued:
+                self._emit("created", package)
+                self._emit("queued", package)
+            
+            # 合并通知：一张拼接图、一次发送
+            sent = False
+            if notify and collage_path:
+                caption = caption or f"🎫 {len(admitted)} 个新任务工牌\\n" + "\\n".join(
+                    f"{p['agent_id']}: {p['ticket_id'][:40]}" for p, _ in admitted)
+                with span("badge.notify"):
+                    sent = self._send_media_whatsapp(Path(collage_path), Path(collage_path).name, caption)
+            for package, _ in admitted:
+                self._emit("notified", package, channel="whatsapp", sent=bool(sent), batch=len(admitted))
+        
+        print(f"✅ {len(packages)} tasks created" + (f" ({len(queued)} queued)" if queued else ""))
+        for package, ticket_path in zip(packages, ticket_paths):
+            print(f"   • {package['ticket_id']} [{package['role']}] → {ticket_path.parent}")
+        print(f"🎨 Collage: {collage_path}")
+        
+        return [(p["ticket_id"], p) for p in packages], collage_path
+    
+    def _new_package(self, agent_name, task_desc, role="worker", output_requirements=None,
+                     deadline_days=1, timeout_minutes=None):
+        """分配 ticket ID 并构建任务数据结构"""
+        ticket_id, timestamp = new_ticket_id(self.parent, agent_name)
         
-        # 构建任务数据结构
         task_package = {
             "ticket_id": ticket_id,
             "agent_id": agent_name,
@@ -46,7 +344,7 @@ class SubAgentLifecycle:
             "task": {
                 "description": task_desc,
                 "created_at": timestamp.isoformat(),
-                "deadline": (timestamp.replace(day=timestamp.day + deadline_days)).isoformat(),
+                "deadline": (timestamp + timedelta(days=deadline_days)).isoformat(),
                 "status": "pending"
             },
             "output_requirements": output_requirements or ["report.md"],
@@ -55,63 +353,114 @@ class SubAgentLifecycle:
             "badge_path": None,
             "completed_at": None
         }
-        
-        # 保存 Ticket
-        ticket_path = TICKETS_DIR / "active" / f"{ticket_id}.json"
-        ticket_path.write_text(json.dumps(task_package, indent=2, ensure_ascii=False))
-        
-        # 生成工牌
-        badge_path = self._generate_badge(agent_name, role, task_desc, 
-                                          task_package["output_requirements"])
-        
-        # 更新 ticket 记录工牌路径
-        task_package["badge_path"] = str(badge_path)
-        ticket_path.write_text(json.dumps(task_package, indent=2, ensure_ascii=False))
-        
-        # 自动发送工牌到 WhatsApp
-        self._send_badge_whatsapp(badge_path, agent_name, ticket_id)
-        
-        print(f"✅ Task created: {ticket_id}")
-        print(f"📁 Ticket: {ticket_path}")
-        print(f"🎨 Badge: {badge_path}")
-        print(f"📋 Output requirements: {task_package['output_requirements']}")
-        
-        return ticket_id, task_package
+        if timeout_minutes:
+            task_package["timeout_minutes"] = timeout_minutes
+        return task_package
     
-    def _generate_badge(self, agent_name, role, task_desc, requirements):
+    def _create_ticket_file(self, task_package, agent_name, state="active", attempts=5):
+        """写入新 ticket；ID 极端情况下冲突 (跨进程同毫秒) 时重新分配"""
+        for _ in range(attempts):
+            try:
+                return self.store.create(state, task_package["ticket_id"], task_package)
+            except FileExistsError:
+                ticket_id, _ = new_ticket_id(self.parent, agent_name)
+                task_package["ticket_id"] = ticket_id
+        raise FileExistsError(f"Could not allocate a unique ticket ID for {agent_name}")
+    
+    def _generate_badge(self, agent_name, role, task_desc, requirements, ticket_id=None):
         """生成工牌"""
+        if self.badge_renderer is not None:
+            try:
+                return self.badge_renderer(
+                    agent_name=agent_name,
+                    role=role,
+                    task_desc=task_desc,
+                    task_requirements=requirements[:3],
+                    output_dir=str(NOTIFY_DIR),
+                    ticket_id=ticket_id,
+                )
+            except Exception as e:
+                print(f"⚠️ Badge generation error: {e}")
+                return None
+        
         if not BADGE_GENERATOR.exists():
             print(f"⚠️ Badge generator not found")
             return None
         
+        import subprocess
+        
+        # 参数通过 stdin 传 JSON，避免拼接进脚本源码
         badge_script = f"""
-import sys
-sys.path.insert(0, '{BADGE_GENERATOR.parent}')
+import json, sys
+sys.path.insert(0, {str(BADGE_GENERATOR.parent)!r})
 from badge_generator_v7 import generate_badge_with_task
 
-req_list = {requirements}
-output = generate_badge_with_task(
-    agent_name='{agent_name}',
-    role='{role}',
-    task_desc='{task_desc[:50]}',
-    task_requirements=req_list[:3] if len(req_list) > 3 else req_list,
-    output_dir=None
-)
-print(output)
+request = json.load(sys.stdin)
+output = generate_badge_with_task(**request)
+print('FIS_BADGE_RESULT ' + json.dumps(output))
 """
         try:
             result = subprocess.run(
                 [sys.executable, "-c", badge_script],
-                capture_output=True, text=True, timeout=30
+                input=json.dumps({
+                    "agent_name": agent_name,
+                    "role": role,
+                    "task_desc": task_desc,
+                    "task_requirements": list(requirements)[:3],
+                    "output_dir": str(NOTIFY_DIR),
+                    "ticket_id": ticket_id,
+                }),
+                capture_output=True, text=True, timeout=30, env=child_env()
             )
-            # 解析输出路径
-            for line in result.stdout.split('\n'):
-                if 'Badge:' in line or '/output/badges/' in line:
-                    return line.strip()
-            return result.stdout.strip()
+            # 结果行带前缀 (之前可能有字体警告等输出)
+            for line in result.stdout.splitlines():
+                if line.startswith('FIS_BADGE_RESULT '):
+                    return json.loads(line[len('FIS_BADGE_RESULT '):])
+            print(f"⚠️ Badge generation error: {result.stderr.strip()[-200:]}")
         except Exception as e:
             print(f"⚠️ Badge generation error: {e}")
-            return None
+        return None
+    
+    def _generate_badge_batch(self, cards, collage_name=None):
+        """批量生成工牌 + 拼接图 (一次渲染，字体只加载一次)，返回 (badge_paths, collage_path)"""
+        if self.batch_renderer is not None:
+            try:
+                return self.batch_renderer(cards, collage_name, str(NOTIFY_DIR))
+            except Exception as e:
+                print(f"⚠️ Badge generation error: {e}")
+                return [None] * len(cards), None
+        
+        if not BADGE_GENERATOR.exists():
+            print(f"⚠️ Badge generator not found")
+            return [None] * len(cards), None
+        
+        import subprocess
+        
+        # 参数通过 stdin 传 JSON，避免拼接进脚本源码
+        batch_script = f"""
+import json, sys
+sys.path.insert(0, {str(BADGE_GENERATOR.parent)!r})
+from badge_generator_v7 import generate_badge_batch
+
+request = json.load(sys.stdin)
+paths, collage = generate_badge_batch(request['cards'], request['collage_name'],
+                                      collage_dir=request['collage_dir'])
+print('FIS_BATCH_RESULT ' + json.dumps({{'paths': paths, 'collage': collage}}))
+"""
+        try:
+            result = subprocess.run(
+                [sys.executable, "-c", batch_script],
+                input=json.dumps({"cards": cards, "collage_name": collage_name, "collage_dir": str(NOTIFY_DIR)}),
+                capture_output=True, text=True, timeout=30 + 5 * len(cards), env=child_env()
+            )
+            for line in result.stdout.splitlines():
+                if line.startswith('FIS_BATCH_RESULT '):
+                    data = json.loads(line[len('FIS_BATCH_RESULT '):])
+                    return data['paths'], data['collage']
+            print(f"⚠️ Badge generation error: {result.stderr.strip()[-200:]}")
+        except Exception as e:
+            print(f"⚠️ Badge generation error: {e}")
+        return [None] * len(cards), None
     
     def _send_badge_whatsapp(self, badge_path, agent_name, ticket_id):
         """自动发送工牌到 WhatsApp"""
@@ -142,21 +491,31 @@ print(output)
             else:
                 return
         
-        # WhatsApp 允许的发送目录
-        allowed_dir = WORKSPACE / "output"
-        allowed_dir.mkdir(parents=True, exist_ok=True)
-        
-        # 使用更短的文件名
-        dst = allowed_dir / f"badge_{ticket_id.split('_')[-1][:20]}.png"
-        try:
-            shutil.copy2(src, dst)
-            print(f"📤 Badge ready for WhatsApp: {dst.name}")
-        except Exception as e:
-            print(f"⚠️ Failed to copy badge: {e}")
-            return
-        
-        # 生成发送命令（供外部调用或自动执行）
+        # 使用更短的文件名 (带 ticket token，同一 agent 的多个工牌互不覆盖)
+        token = ticket_token(ticket_id)
+        short_name = f"{token}_{agent_name[:20]}" if token else ticket_id.split('_')[-1][:20]
         caption = f"🎫 新任务工牌\\nAgent: {agent_name}\\nTicket: {ticket_id[:40]}..."
+        return self._send_media_whatsapp(src, f"badge_{short_name}{src.suffix or '.png'}", caption)
+    
+    def _send_media_whatsapp(self, src, dst_name, caption):
+        """通过 openclaw CLI 发送图片 (不在允许目录时先复制过去)，返回是否发送成功"""
+        import shutil
+        import subprocess
+        
+        NOTIFY_DIR.mkdir(parents=True, exist_ok=True)
+        if src.parent.resolve() == NOTIFY_DIR.resolve():
+            # 已直接渲染到允许目录
+            dst = src
+        else:
+            dst = NOTIFY_DIR / dst_name
+            try:
+                with span("notify.copy"):
+                    shutil.copy2(src, dst)
+            except Exception as e:
+                print(f"⚠️ Failed to copy badge: {e}")
+                return False
+        self._retain(str(dst))
+        print(f"📤 Badge ready for WhatsApp: {dst.name}")
         
         # 尝试使用 openclaw CLI 发送
         try:
@@ -167,25 +526,27 @@ print(output)
                 "--media", str(dst),
                 "--message", caption
             ]
-            result = subprocess.run(send_cmd, capture_output=True, text=True, timeout=30)
+            with span("notify.send", channel="whatsapp"):
+                result = subprocess.run(send_cmd, capture_output=True, text=True, timeout=30)
             if result.returncode == 0:
                 print(f"✅ Badge sent to WhatsApp!")
+                return True
             else:
                 print(f"📱 WhatsApp send: openclaw message send --channel whatsapp --target +8618009073880 --media {dst} --message \"{caption}\"")
         except Exception as e:
             print(f"📱 To send: openclaw message send --channel whatsapp --target +8618009073880 --media {dst} --message \"{caption}\"")
+        return False
     
     def verify_deliverables(self, ticket_id):
         """
         验证交付物是否完整
         检查子代理工作区的 output/ 目录
         """
-        ticket_path = TICKETS_DIR / "active" / f"{ticket_id}.json"
-        if not ticket_path.exists():
+        task = self.store.read("active", ticket_id)
+        if task is None:
             print(f"❌ Ticket not found: {ticket_id}")
             return False
         
-        task = json.loads(ticket_path.read_text())
         agent_name = task["agent_id"]
         requirements = task.get("output_requirements", [])
         
@@ -225,31 +586,30 @@ print(output)
         if missing_files:
             print(f"   ❌ Missing: {missing_files}")
         
+        self._emit("verified", task, found=len(found_files), missing=missing_files)
         return len(missing_files) == 0, found_files, missing_files
     
-    def complete_task(self, ticket_id, auto_collect=True):
+    def complete_task(self, ticket_id, auto_collect=True, force=None):
         """
         完成任务：归档 Ticket + 收集交付物
         
         Args:
             auto_collect: 是否自动收集交付物到 results/
+            force: 交付物缺失时是否强制完成；None 表示交互式询问
         """
-        active_path = TICKETS_DIR / "active" / f"{ticket_id}.json"
-        completed_path = TICKETS_DIR / "completed" / f"{ticket_id}.json"
-        
-        if not active_path.exists():
+        task = self.store.read("active", ticket_id)
+        if task is None:
             print(f"❌ Ticket not found in active: {ticket_id}")
             return False
         
-        task = json.loads(active_path.read_text())
-        
         # 验证交付物
         is_complete, found_files, missing = self.verify_deliverables(ticket_id)
         
         if not is_complete:
             print(f"⚠️ Task {ticket_id} has missing deliverables!")
-            response = input("   Force complete? (y/N): ")
-            if response.lower() != 'y':
+            if force is None:
+                force = input("   Force complete? (y/N): ").lower() == 'y'
+            if not force:
                 return False
         
         # 收集交付物
@@ -266,9 +626,12 @@ print(output)
             "missing": missing
         }
         
-        # 移动到 completed
-        completed_path.write_text(json.dumps(task, indent=2, ensure_ascii=False))
-        active_path.unlink()
+        # 移动到 completed (分片目录，O(1))
+        completed_path = self.store.move(ticket_id, "active", "completed", task)
+        self._emit("completed", task)
+        
+        # 释放的名额交给排队 ticket
+        self.promote_queued()
         
         print(f"\n✅ Task completed: {ticket_id}")
         print(f"📁 Archived to: {completed_path}")
@@ -279,6 +642,8 @@ print(output)
     
     def _collect_deliverables(self, ticket_id, agent_name, files):
         """收集交付物到 results/ 目录"""
+        import shutil
+        
         # 创建结果目录
         result_dir = RESULTS_DIR / ticket_id
         result_dir.mkdir(parents=True, exist_ok=True)
@@ -297,27 +662,118 @@ print(output)
             "completed_at": datetime.now().isoformat(),
             "files": [Path(f).name for f in files]
         }
-        (result_dir / "INDEX.json").write_text(json.dumps(index, indent=2))
+        (result_dir / "INDEX.json").write_bytes(fis_json.dumpb(index, pretty=True))
         
         return result_dir
     
     def list_active(self):
         """列出活跃任务"""
-        active_dir = TICKETS_DIR / "active"
-        tickets = list(active_dir.glob("*.json"))
+        tickets = []
+        print(f"\n🔄 Active Tasks:")
+        for path, data in self.store.iter_tickets("active"):
+            tickets.append(path)
+            # 兼容 fis_subagent_tool 写出的平铺格式 (task 为字符串)
+            ticket = Ticket.from_dict(data, validate=False)
+            print(f"   • {ticket.ticket_id[:50]}... [{ticket.role}] {ticket.description[:30]}")
+        
+        print(f"   Total: {len(tickets)}")
+        return tickets
+    
+    def get_ticket(self, ticket_id):
+        """按 ID 读取 ticket：active → queued → completed → 压缩归档段"""
+        for state in ("active", "queued", "completed"):
+            task = self.store.read(state, ticket_id)
+            if task is not None:
+                return task
+        return self.archive.get(ticket_id)
+    
+    def iter_completed(self, since=None, until=None):
+        """遍历已完成 ticket：先读散文件，再顺序扫描归档段 (按 ticket_id 去重)"""
+        seen = set()
+        for _, task in self.store.iter_tickets("completed", since, until):
+            seen.add(task.get("ticket_id"))
+            yield task
+        for task in self.archive.iter_tickets(since, until):
+            if task.get("ticket_id") not in seen:
+                yield task
+    
+    def list_completed(self, since=None, until=None):
+        """列出已完成任务 (含归档段)"""
+        count = 0
+        print(f"\n📦 Completed Tasks:")
+        for task in self.iter_completed(since, until):
+            count += 1
+            print(f"   • {task['ticket_id'][:50]}... [{task.get('role', '?')}] {task.get('completed_at') or ''}")
+        print(f"   Total: {count}")
+        return count
+    
+    def query_tickets(self, fields=None, output="table", **filters):
+        """
+        按条件查询 ticket (active / completed / 归档段)
         
-        print(f"\n🔄 Active Tasks ({len(tickets)}):")
-        for t in tickets:
-            task = json.loads(t.read_text())
-            print(f"   • {task['ticket_id'][:50]}... [{task['role']}] {task['task']['description'][:30]}")
+        Args:
+            fields: 投影字段 (列名或 JSON 点路径)，表格输出默认 DEFAULT_FIELDS
+            output: "table" 或 "json"
+            **filters: 见 TicketIndex.query (role, parent, overdue, text, sort, limit ...)
         
-        return tickets
+        Returns:
+            (total, rows)
+        """
+        from fis_index import DEFAULT_FIELDS, format_table
+        
+        if output == "table" and not fields:
+            fields = list(DEFAULT_FIELDS)
+        try:
+            total, rows = self.index.query(fields=fields, **filters)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return 0, []
+        
+        if output == "json":
+            print(json.dumps({"total": total, "results": rows}, indent=2, ensure_ascii=False))
+        else:
+            offset = filters.get("offset", 0)
+            print(format_table(rows, fields))
+            if rows:
+                print(f"\n   Showing {offset + 1}-{offset + len(rows)} of {total}")
+            else:
+                print(f"\n   No matches (total: {total})")
+        return total, rows
+    
+    def search_knowledge(self, query, limit=10, root=None, output='table'):
+        """本地全文检索 knowledge 与 results 交付物 (BM25 排序)"""
+        results = self.knowledge.search(query, limit, root)
+        if output == 'json':
+            print(json.dumps(results, indent=2, ensure_ascii=False))
+        else:
+            from fis_search import print_results
+            print_results(results)
+        return results
+    
+    def compact_completed(self, older_than_days=30, dry_run=False):
+        """将旧的 completed ticket 压缩为归档段，减少 inode 数量"""
+        count, index_path = self.archive.compact(self.store, older_than_days, dry_run)
+        if dry_run:
+            print(f"✅ Would archive {count} ticket(s) older than {older_than_days} days")
+        elif index_path:
+            print(f"✅ Archived {count} ticket(s) into {index_path.name}")
+        else:
+            print(f"✅ Nothing to archive (threshold: {older_than_days} days)")
+        return count
+    
+    def migrate_layout(self, dry_run=False):
+        """将旧版平铺 tickets/{active,completed}/*.json 迁移到日期分片目录"""
+        moved = self.store.migrate(dry_run=dry_run)
+        action = "Would migrate" if dry_run else "Migrated"
+        print(f"✅ {action} {moved} ticket(s) to sharded layout")
+        return moved
 
 
-def main():
+def build_parser():
     import argparse
     
     parser = argparse.ArgumentParser(description="FIS 3.2.0 SubAgent Lifecycle")
+    parser.add_argument('--no-daemon', action='store_true', help='Run in-process even if the lifecycle daemon is running')
     subparsers = parser.add_subparsers(dest='command')
     
     # create 命令
@@ -326,7 +782,14 @@ def main():
     create_parser.add_argument('--task', required=True, help='Task description')
     create_parser.add_argument('--role', default='worker', choices=['worker', 'researcher', 'reviewer', 'formatter'])
     create_parser.add_argument('--outputs', nargs='+', default=['report.md'], help='Required output files')
-    create_parser.add_argument('--deadline', type=int, default=1, help='Deadline in days')
+    create_parser.add_argument('--deadline', type=float, default=1, help='Deadline in days')
+    create_parser.add_argument('--timeout', type=int, help='Timeout in minutes (stalled-agent detection)')
+    
+    # create-batch 命令
+    batch_parser = subparsers.add_parser('create-batch', help='Create many tasks at once (one badge render, one collage notification)')
+    batch_parser.add_argument('--spec', required=True, help='JSON file: list of {agent_name, task_desc, role, output_requirements, deadline_days, timeout_minutes}')
+    batch_parser.add_argument('--collage', help='Collage file name')
+    batch_parser.add_argument('--no-notify', action='store_true', help='Do not send the collage')
     
     # verify 命令
     verify_parser = subparsers.add_parser('verify', help='Verify deliverables')
@@ -336,34 +799,150 @@ def main():
     complete_parser = subparsers.add_parser('complete', help='Complete task')
     complete_parser.add_argument('--ticket-id', required=True, help='Ticket ID')
     complete_parser.add_argument('--no-collect', action='store_true', help='Skip collecting deliverables')
+    complete_parser.add_argument('--force', action='store_true', help='Complete even if deliverables are missing')
     
     # list 命令
-    subparsers.add_parser('list', help='List active tasks')
+    list_parser = subparsers.add_parser('list', help='List active tasks')
+    list_parser.add_argument('--completed', action='store_true', help='List completed tasks (including archive segments)')
+    list_parser.add_argument('--since', help='YYYYMMDD lower bound (completed only)')
+    list_parser.add_argument('--until', help='YYYYMMDD upper bound (completed only)')
     
-    args = parser.parse_args()
+    # query 命令
+    query_parser = subparsers.add_parser('query', help='Filter, sort and page tickets via the ticket index')
+    query_parser.add_argument('--state', action='append', choices=['active', 'queued', 'completed'], help='Ticket state (repeatable)')
+    query_parser.add_argument('--role', action='append', help='Role (repeatable)')
+    query_parser.add_argument('--status', action='append', help='Status (repeatable)')
+    query_parser.add_argument('--parent', action='append', help='Parent agent (repeatable)')
+    query_parser.add_argument('--agent', action='append', help='Agent ID (repeatable)')
+    query_parser.add_argument('--deadline-before', help='ISO date/time upper bound (exclusive)')
+    query_parser.add_argument('--deadline-after', help='ISO date/time lower bound (inclusive)')
+    query_parser.add_argument('--created-since', help='ISO date/time lower bound (inclusive)')
+    query_parser.add_argument('--created-until', help='ISO date/time upper bound (exclusive)')
+    query_parser.add_argument('--overdue', action='store_true', help='Active tickets past their deadline')
+    query_parser.add_argument('--text', help='Case-insensitive substring of the description')
+    query_parser.add_argument('--sort', default='created_at', help='Sort column (default: created_at)')
+    query_parser.add_argument('--desc', action='store_true', help='Sort descending')
+    query_parser.add_argument('--limit', type=int, default=50, help='Page size (default: 50)')
+    query_parser.add_argument('--offset', type=int, default=0, help='Rows to skip')
+    query_parser.add_argument('--fields', help='Comma-separated fields (columns or JSON paths such as task.deadline)')
+    query_parser.add_argument('--format', choices=['table', 'json'], default='table', help='Output format')
+    
+    # search 命令
+    search_parser = subparsers.add_parser('search', help='Full-text search over fis-hub knowledge and results')
+    search_parser.add_argument('query', help='Query text (words or Chinese phrases)')
+    search_parser.add_argument('--root', choices=['knowledge', 'results'], help='Only search one root')
+    search_parser.add_argument('--limit', type=int, default=10, help='Max results (default: 10)')
+    search_parser.add_argument('--format', choices=['table', 'json'], default='table', help='Output format')
     
-    lifecycle = SubAgentLifecycle()
+    # queue 命令
+    queue_parser = subparsers.add_parser('queue', help='Show admission limits and queued tickets')
+    queue_parser.add_argument('--promote', action='store_true', help='Activate queued tickets that fit now')
+    queue_parser.add_argument('--format', choices=['table', 'json'], default='table', help='Output format')
     
+    # show 命令
+    show_parser = subparsers.add_parser('show', help='Show a ticket (active, completed or archived)')
+    show_parser.add_argument('--ticket-id', required=True, help='Ticket ID')
+    
+    # compact 命令
+    compact_parser = subparsers.add_parser('compact', help='Compact old completed tickets into archive segments')
+    compact_parser.add_argument('--older-than', type=int, default=30, help='Age threshold in days')
+    compact_parser.add_argument('--dry-run', action='store_true', help='Only count candidates')
+    
+    # migrate 命令
+    migrate_parser = subparsers.add_parser('migrate', help='Migrate flat ticket dirs to sharded layout')
+    migrate_parser.add_argument('--dry-run', action='store_true', help='Only print planned moves')
+    
+    return parser
+
+
+def run_command(lifecycle, args, interactive=True):
+    """执行一条 CLI 命令 (本进程或守护进程内)，返回命令结果"""
+    from fis_admission import AdmissionError
+    try:
+        return _run_command(lifecycle, args, interactive)
+    except AdmissionError as e:
+        print(f"❌ {e}")
+        return None
+
+
+def _run_command(lifecycle, args, interactive):
     if args.command == 'create':
         ticket_id, task = lifecycle.create_task(
-            args.agent, args.task, args.role, args.outputs, args.deadline
+            args.agent, args.task, args.role, args.outputs, args.deadline, args.timeout
         )
+        if task.get("status") == "queued":
+            print(f"\n⏳ Spawn after activation (fis_lifecycle queue shows the backlog)")
+            return ticket_id
         print(f"\n🚀 Ready to spawn:")
         print(f"   sessions_spawn(task='{args.task}', label='{args.agent}')")
         print(f"\n   After completion, run:")
         print(f"   fis_lifecycle complete --ticket-id {ticket_id}")
+        return ticket_id
+    
+    elif args.command == 'create-batch':
+        specs = json.loads(Path(args.spec).read_text(encoding='utf-8'))
+        created, _ = lifecycle.create_tasks(specs, not args.no_notify, args.collage)
+        return [ticket_id for ticket_id, _ in created]
     
     elif args.command == 'verify':
-        lifecycle.verify_deliverables(args.ticket_id)
+        return lifecycle.verify_deliverables(args.ticket_id)
     
     elif args.command == 'complete':
-        lifecycle.complete_task(args.ticket_id, not args.no_collect)
+        force = True if args.force else (None if interactive else False)
+        return lifecycle.complete_task(args.ticket_id, not args.no_collect, force)
     
     elif args.command == 'list':
-        lifecycle.list_active()
+        if args.completed:
+            return lifecycle.list_completed(args.since, args.until)
+        return [str(p) for p in lifecycle.list_active()]
     
-    else:
+    elif args.command == 'query':
+        total, rows = lifecycle.query_tickets(
+            fields=args.fields.split(',') if args.fields else None,
+            output=args.format,
+            state=args.state, role=args.role, status=args.status,
+            parent=args.parent, agent=args.agent,
+            deadline_before=args.deadline_before, deadline_after=args.deadline_after,
+            created_since=args.created_since, created_until=args.created_until,
+            overdue=args.overdue, text=args.text,
+            sort=args.sort, descending=args.desc, limit=args.limit, offset=args.offset,
+        )
+        return {"total": total, "results": rows}
+    
+    elif args.command == 'search':
+        return lifecycle.search_knowledge(args.query, args.limit, args.root, args.format)
+    
+    elif args.command == 'queue':
+        if args.promote:
+            promoted = lifecycle.promote_queued()
+            print(f"▶️ Activated {len(promoted)} queued ticket(s)")
+        return lifecycle.queue_status(args.format)
+    
+    elif args.command == 'show':
+        task = lifecycle.get_ticket(args.ticket_id)
+        if task is None:
+            print(f"❌ Ticket not found: {args.ticket_id}")
+        else:
+            print(json.dumps(task, indent=2, ensure_ascii=False))
+        return task
+    
+    elif args.command == 'compact':
+        return lifecycle.compact_completed(args.older_than, args.dry_run)
+    
+    elif args.command == 'migrate':
+        return lifecycle.migrate_layout(args.dry_run)
+
+
+def main():
+    parser = build_parser()
+    args = parser.parse_args()
+    
+    if args.command is None:
         parser.print_help()
+        return
+    
+    # 守护进程转发见模块顶部 (forward_argv)：到这里说明需要本地执行
+    run_command(SubAgentLifecycle(), args)
 
 
 if __name__ == "__main__":
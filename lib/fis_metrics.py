@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+"""
+FIS 3.2 Hub 指标 - 吞吐、完成耗时、积压
+
+指标由 ticket 状态变化增量更新 (生命周期 created / completed 事件、调度器到期事件)，
+不扫描 ticket JSON。状态保存在 fis-hub/.fis3.1/metrics.json，多进程通过文件锁串行更新。
+首次使用 (或 rebuild) 时从现有 ticket 全量统计一次。
+
+导出 (Prometheus 文本格式)：
+    python3 fis_metrics.py show                     # 人类可读摘要
+    python3 fis_metrics.py export -o fis.prom       # 写文件 (node_exporter textfile collector)
+    python3 fis_metrics.py serve --port 9464        # http://127.0.0.1:9464/metrics
+    python3 fis_metrics.py rebuild                  # 从 ticket 重新统计
+
+也可从事件日志重建：python3 fis_journal.py replay-metrics
+
+FIS_METRICS=0 关闭记录。
+"""
+
+import fcntl
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import fis_json
+
+METRICS_PATH = Path.home() / ".openclaw" / "fis-hub" / ".fis3.1" / "metrics.json"
+
+# 完成耗时直方图上界 (秒)：1 分钟 … 7 天
+DURATION_BUCKETS = (60, 300, 900, 1800, 3600, 7200, 14400, 28800, 86400, 172800, 604800)
+HOURLY_RETENTION = 48
+
+
+def enabled():
+    return os.environ.get('FIS_METRICS', '1') != '0'
+
+
+def _parse_time(value):
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _task_field(ticket, key):
+    task = ticket.get('task')
+    if isinstance(task, dict) and task.get(key):
+        return task[key]
+    return ticket.get(key)
+
+
+def _empty_state():
+    return {
+        'created': {},          # '["parent","role"]' → count (标签元组按 JSON 数组编码为键)
+        'completed': {},        # '["parent","role","outcome"]' → count
+        'expired': {},          # '["kind","action"]' → count
+        'backlog': {},          # parent → active count
+        'queued': {},           # parent → 排队等待准入的数量
+        'rejected': {},         # '["parent","role"]' → 准入拒绝次数
+        'missing': {},          # role → 缺失交付物累计数
+        'duration': {},         # role → {"buckets": [...], "sum": s, "count": n}
+        'hourly': {},           # "YYYY-MM-DDTHH" → {"created": n, "completed": n}
+        'updated_at': None,
+    }
+
+
+class HubMetrics:
+    """持久化的 hub 指标 (每次更新：加锁读 → 修改 → 原子写)"""
+
+    def __init__(self, path=METRICS_PATH):
+        self.path = Path(path)
+
+    # ---------- 持久化 ----------
+
+    def load(self):
+        try:
+            state = fis_json.read(self.path)
+        except (OSError, ValueError):
+            return _empty_state()
+        return {**_empty_state(), **state}
+
+    @contextmanager
+    def _update(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path.with_suffix('.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            state = self.load()
+            yield state
+            state['updated_at'] = datetime.now().isoformat()
+            tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+            tmp.write_bytes(fis_json.dumpb(state))
+            os.replace(tmp, self.path)
+
+    # ---------- 状态变化 ----------
+
+    def on_lifecycle_event(self, event, ticket, **detail):
+        """SubAgentLifecycle 监听器 (只关心 created / activated / rejected / completed)"""
+        if event not in ('created', 'activated', 'rejected', 'completed'):
+            return
+        with self._update() as state:
+            if event == 'created':
+                self._record_created(state, ticket)
+            elif event == 'activated':
+                self._record_activated(state, ticket)
+            elif event == 'rejected':
+                self._record_rejected(state, ticket.get('parent'), ticket.get('role'))
+            else:
+                self._record_completed(state, ticket, _outcome(ticket))
+
+    def on_expiry(self, kind, action, ticket):
+        """DeadlineScheduler 监听器：fail 动作同时计为一次完成 (outcome=failed)"""
+        with self._update() as state:
+            _inc(state['expired'], _key(kind, action))
+            if action == 'fail':
+                self._record_completed(state, ticket, 'failed')
+
+    def _record_created(self, state, ticket):
+        parent, role = ticket.get('parent') or 'unknown', ticket.get('role') or 'unknown'
+        _inc(state['created'], _key(parent, role))
+        _inc(state['queued' if ticket.get('status') == 'queued' else 'backlog'], parent)
+        self._hour(state, _task_field(ticket, 'created_at'), 'created')
+
+    def _record_activated(self, state, ticket):
+        parent = ticket.get('parent') or 'unknown'
+        if state['queued'].get(parent, 0) > 0:
+            state['queued'][parent] -= 1
+        _inc(state['backlog'], parent)
+
+    def _record_rejected(self, state, parent, role):
+        _inc(state['rejected'], _key(parent or 'unknown', role or 'unknown'))
+
+    def _record_completed(self, state, ticket, outcome):
+        parent, role = ticket.get('parent') or 'unknown', ticket.get('role') or 'unknown'
+        _inc(state['completed'], _key(parent, role, outcome))
+        if state['backlog'].get(parent, 0) > 0:
+            state['backlog'][parent] -= 1
+
+        missing = (ticket.get('verification') or {}).get('missing') or []
+        if missing:
+            _inc(state['missing'], role, len(missing))
+
+        created = _parse_time(_task_field(ticket, 'created_at'))
+        completed = _parse_time(ticket.get('completed_at'))
+        if created and completed:
+            seconds = max(0.0, (completed - created).total_seconds())
+            hist = state['duration'].setdefault(
+                role, {'buckets': [0] * len(DURATION_BUCKETS), 'sum': 0.0, 'count': 0})
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if seconds <= bound:
+                    hist['buckets'][i] += 1
+            hist['sum'] += seconds
+            hist['count'] += 1
+        self._hour(state, ticket.get('completed_at'), 'completed')
+
+    def _hour(self, state, timestamp, field):
+        when = _parse_time(timestamp) or datetime.now()
+        key = when.strftime('%Y-%m-%dT%H')
+        _inc(state['hourly'].setdefault(key, {}), field)
+        cutoff = (datetime.now() - timedelta(hours=HOURLY_RETENTION)).strftime('%Y-%m-%dT%H')
+        for old in [k for k in state['hourly'] if k < cutoff]:
+            del state['hourly'][old]
+
+    def rebuild(self, store, archive=None):
+        """从现有 ticket 全量统计 (首次启用或计数漂移时)"""
+        with self._update() as state:
+            state.clear()
+            state.update(_empty_state())
+            for _, ticket in store.iter_tickets('active'):
+                self._record_created(state, ticket)
+            for _, ticket in store.iter_tickets('queued'):
+                self._record_created(state, ticket)
+            completed = [t for _, t in store.iter_tickets('completed')]
+            if archive is not None:
+                seen = {t.get('ticket_id') for t in completed}
+                completed.extend(t for t in archive.iter_tickets() if t.get('ticket_id') not in seen)
+            for ticket in completed:
+                # 先按新建计数 (积压 +1)，再按完成计数 (积压 -1)
+                self._record_created(state, ticket)
+                self._record_completed(state, ticket, _outcome(ticket))
+            return state
+
+    def replay(self, journal, from_seq=0):
+        """从 journal 快照记录重建 (一次加锁写入)"""
+        with self._update() as state:
+            state.clear()
+            state.update(_empty_state())
+            for record, _ in journal.read(from_seq):
+                ticket = record.get('ticket')
+                event = record['event']
+                if event == 'rejected':
+                    # 拒绝的 ticket 没有快照，父代理与角色记录在 detail 中
+                    detail = record.get('detail') or {}
+                    self._record_rejected(state, detail.get('parent'), detail.get('role'))
+                    continue
+                if ticket is None:
+                    continue
+                if event == 'created':
+                    self._record_created(state, ticket)
+                elif event == 'activated':
+                    self._record_activated(state, ticket)
+                elif event == 'completed':
+                    self._record_completed(state, ticket, _outcome(ticket))
+                elif event == 'expired':
+                    detail = record.get('detail') or {}
+                    _inc(state['expired'], _key(detail.get('kind'), detail.get('action')))
+                    if detail.get('action') == 'fail':
+                        self._record_completed(state, ticket, 'failed')
+            return state
+
+    # ---------- 导出 ----------
+
+    def render(self, state=None):
+        """Prometheus 文本格式"""
+        state = state or self.load()
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        family('fis_tickets_created_total', 'counter', 'Tickets created')
+        for key, value in sorted(state['created'].items()):
+            parent, role = _labels(key, 2)
+            lines.append(f'fis_tickets_created_total{{parent="{_esc(parent)}",role="{_esc(role)}"}} {value}')
+
+        family('fis_tickets_completed_total', 'counter', 'Tickets completed by outcome (complete, forced, failed)')
+        for key, value in sorted(state['completed'].items()):
+            parent, role, outcome = _labels(key, 3)
+            lines.append(f'fis_tickets_completed_total{{parent="{_esc(parent)}",role="{_esc(role)}",'
+                         f'outcome="{_esc(outcome)}"}} {value}')
+
+        family('fis_tickets_active', 'gauge', 'Active tickets (backlog) per parent')
+        for parent, value in sorted(state['backlog'].items()):
+            lines.append(f'fis_tickets_active{{parent="{_esc(parent)}"}} {value}')
+
+        family('fis_tickets_queued', 'gauge', 'Tickets waiting for admission per parent')
+        for parent, value in sorted(state['queued'].items()):
+            lines.append(f'fis_tickets_queued{{parent="{_esc(parent)}"}} {value}')
+
+        family('fis_admission_rejected_total', 'counter', 'Ticket creations rejected by admission limits')
+        for key, value in sorted(state['rejected'].items()):
+            parent, role = _labels(key, 2)
+            lines.append(f'fis_admission_rejected_total{{parent="{_esc(parent)}",role="{_esc(role)}"}} {value}')
+
+        family('fis_deliverables_missing_total', 'counter', 'Deliverables missing at completion')
+        for role, value in sorted(state['missing'].items()):
+            lines.append(f'fis_deliverables_missing_total{{role="{_esc(role)}"}} {value}')
+
+        family('fis_expiry_events_total', 'counter', 'Timeout / deadline expiry events fired')
+        for key, value in sorted(state['expired'].items()):
+            kind, action = _labels(key, 2)
+            lines.append(f'fis_expiry_events_total{{kind="{_esc(kind)}",action="{_esc(action)}"}} {value}')
+
+        family('fis_ticket_duration_seconds', 'histogram', 'Time from creation to completion')
+        for role, hist in sorted(state['duration'].items()):
+            label = f'role="{_esc(role)}"'
+            for bound, count in zip(DURATION_BUCKETS, hist['buckets']):
+                lines.append(f'fis_ticket_duration_seconds_bucket{{{label},le="{bound}"}} {count}')
+            lines.append(f'fis_ticket_duration_seconds_bucket{{{label},le="+Inf"}} {hist["count"]}')
+            lines.append(f'fis_ticket_duration_seconds_sum{{{label}}} {hist["sum"]:.3f}')
+            lines.append(f'fis_ticket_duration_seconds_count{{{label}}} {hist["count"]}')
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path):
+        """原子写入 .prom 文件 (node_exporter textfile collector)"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.tmp")
+        tmp.write_text(self.render())
+        os.replace(tmp, path)
+        return path
+
+    def summary(self, state=None):
+        """人类可读摘要：近 24 小时每小时吞吐、各角色耗时分位数、积压"""
+        state = state or self.load()
+        lines = [f"\n📊 FIS Hub Metrics (updated {state.get('updated_at') or 'never'})"]
+
+        lines.append("\n   Throughput (last 24h, per hour):")
+        now = datetime.now()
+        for h in range(23, -1, -1):
+            key = (now - timedelta(hours=h)).strftime('%Y-%m-%dT%H')
+            counts = state['hourly'].get(key)
+            if counts:
+                lines.append(f"   {key}:00  created {counts.get('created', 0):>5}  completed {counts.get('completed', 0):>5}")
+
+        lines.append("\n   Time to complete by role (p50 / p90 / p99, from histogram):")
+        for role, hist in sorted(state['duration'].items()):
+            p50, p90, p99 = (_fmt_duration(_quantile(hist, q)) for q in (0.5, 0.9, 0.99))
+            lines.append(f"   • {role:<12} n={hist['count']:<6} {p50:>8} / {p90:>8} / {p99:>8}")
+
+        lines.append("\n   Backlog by parent:")
+        for parent, value in sorted(state['backlog'].items(), key=lambda kv: -kv[1]):
+            lines.append(f"   • {parent:<20} {value}")
+
+        missing = sum(state['missing'].values())
+        outcomes = [(_labels(k, 3)[2], v) for k, v in state['completed'].items()]
+        forced = sum(v for outcome, v in outcomes if outcome == 'forced')
+        failed = sum(v for outcome, v in outcomes if outcome == 'failed')
+        lines.append(f"\n   Missing deliverables: {missing} (forced completions: {forced}, failed: {failed})")
+        return '\n'.join(lines)
+
+
+def _outcome(ticket):
+    """完成结果：complete (交付物齐全) / forced (缺失但强制完成) / failed (调度器判定失败)"""
+    if ticket.get('status') == 'failed':
+        return 'failed'
+    verification = ticket.get('verification') or {}
+    return 'complete' if verification.get('all_deliverables_present', True) else 'forced'
+
+
+def _key(*labels):
+    """标签元组 → 计数键 (JSON 数组字符串；标签值中的任何字符都不会与分隔符混淆)"""
+    return fis_json.dumps([str(label) for label in labels])
+
+
+def _labels(key, count):
+    """计数键 → 标签列表；兼容旧版 "a|b|c" 键 (多出的 | 归入第一个标签)"""
+    if key.startswith('['):
+        return fis_json.loads(key)
+    return key.rsplit('|', count - 1)
+
+
+def _inc(mapping, key, amount=1):
+    mapping[key] = mapping.get(key, 0) + amount
+
+
+def _esc(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _quantile(hist, q):
+    """直方图分位数：取第一个累计计数达到 q 的桶上界 (超过最大桶返回 None)"""
+    target = hist['count'] * q
+    for bound, count in zip(DURATION_BUCKETS, hist['buckets']):
+        if count >= target and count > 0:
+            return bound
+    return None
+
+
+def _fmt_duration(seconds):
+    if seconds is None:
+        return f">{DURATION_BUCKETS[-1] // 86400}d"
+    if seconds < 3600:
+        return f"≤{seconds // 60}m"
+    if seconds < 86400:
+        return f"≤{seconds // 3600}h"
+    return f"≤{seconds // 86400}d"
+
+
+def serve(metrics, host='127.0.0.1', port=9464):
+    """本地 HTTP 导出：GET /metrics (每次请求读取最新状态)"""
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = metrics.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer((host, port), Handler)
+    print(f"✅ Metrics on http://{host}:{port}/metrics (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("👋 Metrics server stopped")
+    finally:
+        server.server_close()
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="FIS 3.2 Hub Metrics")
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.add_parser('show', help='Print a human-readable summary')
+    export_parser = subparsers.add_parser('export', help='Print or write Prometheus text format')
+    export_parser.add_argument('-o', '--output', help='Write to file (atomic) instead of stdout')
+    serve_parser = subparsers.add_parser('serve', help='Serve /metrics on localhost')
+    serve_parser.add_argument('--port', type=int, default=9464)
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    subparsers.add_parser('rebuild', help='Recount from existing tickets')
+    args = parser.parse_args()
+
+    metrics = HubMetrics()
+    if args.command in ('show', 'export', 'serve') and not metrics.path.exists():
+        args.command, pending = 'rebuild', args.command
+    else:
+        pending = None
+
+    if args.command == 'rebuild':
+        from fis_archive import TicketArchive
+        from fis_lifecycle import TICKETS_DIR
+        from fis_storage import TicketStore
+        state = metrics.rebuild(TicketStore(TICKETS_DIR), TicketArchive(TICKETS_DIR / "archive"))
+        print(f"✅ Metrics rebuilt: {sum(state['created'].values())} ticket(s)")
+        args.command = pending
+
+    if args.command == 'show':
+        print(metrics.summary())
+    elif args.command == 'export':
+        if args.output:
+            print(f"✅ Metrics written: {metrics.write_textfile(args.output)}")
+        else:
+            print(metrics.render(), end='')
+    elif args.command == 'serve':
+        serve(metrics, args.host, args.port)
+    elif args.command is None:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+FIS 3.2 SubAgent 注册表 (SQLite)
+
+旧版 .fis3.1/subagent_registry.json 是一个带 subagents 数组的整体文档：
+任何更新都要重写整个文件，任何读取都要解析全部记录。这里改为：
+
+- fis-hub/.fis3.1/subagent_registry.db，每个 subagent 一行 (employee_id 主键)
+  常用过滤字段 (parent / role / status) 为独立列，完整卡片 JSON 存于 data 列
+- put / update / remove 只改一行；get 按 employee_id 主键查找
+- iter() 分批游标读取，内存占用与注册表大小无关
+- 首次打开时若存在旧版 JSON 且库为空，自动导入一次；export_json() 仍可生成旧格式文件
+  (subagents 以外的顶层字段原样保留)
+
+用法：
+    python3 fis_registry.py list [--status active] [--role worker] [--json]
+    python3 fis_registry.py show CYBERMAO-SA-2026-0001
+    python3 fis_registry.py import [--file subagent_registry.json]
+    python3 fis_registry.py export [--output subagent_registry.json]
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from fis_config import get_shared_hub_path
+
+SCHEMA_VERSION = 1
+COLUMNS = ('employee_id', 'parent', 'role', 'status', 'updated_at')
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS subagents (
+    employee_id TEXT PRIMARY KEY,
+    parent      TEXT,
+    role        TEXT,
+    status      TEXT,
+    updated_at  TEXT,
+    data        TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_subagents_status_role ON subagents(status, role);
+CREATE INDEX IF NOT EXISTS idx_subagents_parent ON subagents(parent);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+PRAGMA user_version = {SCHEMA_VERSION};
+"""
+
+
+def registry_paths():
+    """(SQLite 注册表, 旧版 JSON 注册表)"""
+    base = get_shared_hub_path() / ".fis3.1"
+    return base / "subagent_registry.db", base / "subagent_registry.json"
+
+
+def _row(card):
+    return (card['employee_id'], card.get('parent'), card.get('role'), card.get('status'),
+            card.get('updated_at'), json.dumps(card, ensure_ascii=False))
+
+
+class SubagentRegistry:
+    """SubAgent 注册表 (线程安全)"""
+
+    def __init__(self, db_path=None, legacy_path=None):
+        """
+        Args:
+            db_path: SQLite 文件 (默认 fis-hub/.fis3.1/subagent_registry.db)
+            legacy_path: 旧版 JSON，库为空时自动导入 (默认同目录 subagent_registry.json)
+        """
+        default_db, default_legacy = registry_paths()
+        self.db_path = Path(db_path or default_db)
+        self.legacy_path = Path(legacy_path or default_legacy)
+        self._lock = threading.RLock()
+        self._conn = None
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                conn.executescript("DROP TABLE IF EXISTS subagents; DROP TABLE IF EXISTS meta;")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+            if self.legacy_path.exists() and not conn.execute("SELECT 1 FROM subagents LIMIT 1").fetchone():
+                count = self.import_json(self.legacy_path)
+                if count:
+                    print(f"📦 Imported {count} subagent(s) from {self.legacy_path.name}")
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    # ---------- 单条记录 ----------
+
+    def get(self, employee_id):
+        """按 employee_id 查找，不存在返回 None"""
+        with self._lock:
+            row = self.conn.execute("SELECT data FROM subagents WHERE employee_id = ?", (employee_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, card):
+        """新增或整体替换一张卡片 (需含 employee_id)"""
+        if not card.get('employee_id'):
+            raise ValueError("subagent card requires an employee_id")
+        card = dict(card, updated_at=card.get('updated_at') or datetime.now().isoformat())
+        with self._lock, self.conn as conn:
+            conn.execute("INSERT OR REPLACE INTO subagents (employee_id, parent, role, status, updated_at, data) "
+                         "VALUES (?, ?, ?, ?, ?, ?)", _row(card))
+        return card
+
+    def update(self, employee_id, **fields):
+        """
+        合并更新顶层字段，例如 update(eid, status="completed")
+
+        Returns:
+            更新后的卡片；不存在时返回 None
+        """
+        with self._lock, self.conn as conn:
+            row = conn.execute("SELECT data FROM subagents WHERE employee_id = ?", (employee_id,)).fetchone()
+            if row is None:
+                return None
+            card = json.loads(row[0])
+            card.update(fields, employee_id=employee_id, updated_at=datetime.now().isoformat())
+            conn.execute("UPDATE subagents SET parent = ?, role = ?, status = ?, updated_at = ?, data = ? "
+                         "WHERE employee_id = ?", _row(card)[1:] + (employee_id,))
+        return card
+
+    def remove(self, employee_id):
+        with self._lock, self.conn as conn:
+            return conn.execute("DELETE FROM subagents WHERE employee_id = ?", (employee_id,)).rowcount > 0
+
+    # ---------- 批量读取 ----------
+
+    def _where(self, status=None, role=None, parent=None):
+        where, params = [], []
+        for column, value in (('status', status), ('role', role), ('parent', parent)):
+            if value is None:
+                continue
+            values = [value] if isinstance(value, str) else list(value)
+            where.append(f"{column} IN ({','.join('?' * len(values))})")
+            params.extend(values)
+        return (f"WHERE {' AND '.join(where)}" if where else ""), params
+
+    def count(self, status=None, role=None, parent=None):
+        clause, params = self._where(status, role, parent)
+        with self._lock:
+            return self.conn.execute(f"SELECT count(*) FROM subagents {clause}", params).fetchone()[0]
+
+    def iter(self, status=None, role=None, parent=None, batch=500):
+        """
+        按 employee_id 顺序逐条产出卡片 (分批读取，不一次性加载全部)
+
+        按主键分页，遍历期间其他线程 / 进程仍可写入
+        """
+        clause, params = self._where(status, role, parent)
+        clause = f"{clause} {'AND' if clause else 'WHERE'} employee_id > ?"
+        last = ''
+        while True:
+            with self._lock:
+                rows = self.conn.execute(
+                    f"SELECT employee_id, data FROM subagents {clause} ORDER BY employee_id LIMIT ?",
+                    params + [last, batch]).fetchall()
+            for _, data in rows:
+                yield json.loads(data)
+            if len(rows) < batch:
+                return
+            last = rows[-1][0]
+
+    # ---------- 旧版 JSON ----------
+
+    def import_json(self, path=None):
+        """导入旧版 {"subagents": [...]}，返回导入数量 (已有记录按 employee_id 覆盖)"""
+        path = Path(path or self.legacy_path)
+        try:
+            with open(path, encoding='utf-8') as f:
+                document = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️ Could not read legacy registry {path}: {e}")
+            return 0
+        cards = [card for card in document.get('subagents', []) if card.get('employee_id')]
+        with self._lock, self.conn as conn:
+            conn.executemany("INSERT OR REPLACE INTO subagents (employee_id, parent, role, status, updated_at, data) "
+                             "VALUES (?, ?, ?, ?, ?, ?)", (_row(card) for card in cards))
+            conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                             [(key, json.dumps(value, ensure_ascii=False))
+                              for key, value in document.items() if key != 'subagents'])
+        return len(cards)
+
+    def export_json(self, path=None):
+        """
+        导出旧版格式 (逐条写出，不在内存中拼接整个文档；先写临时文件再原子替换)
+
+        Returns:
+            (路径, 导出数量)
+        """
+        path = Path(path or self.legacy_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            meta = self.conn.execute("SELECT key, value FROM meta ORDER BY key").fetchall()
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        count = 0
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write('{\n')
+            for key, value in meta:
+                f.write(f'  {json.dumps(key)}: {value},\n')
+            f.write('  "subagents": [')
+            for card in self.iter():
+                f.write(',\n    ' if count else '\n    ')
+                f.write(json.dumps(card, ensure_ascii=False))
+                count += 1
+            f.write('\n  ]\n}\n' if count else ']\n}\n')
+        os.replace(tmp, path)
+        return path, count
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="FIS 3.2 SubAgent Registry")
+    subparsers = parser.add_subparsers(dest='command')
+    list_parser = subparsers.add_parser('list', help='List subagents')
+    list_parser.add_argument('--status', action='append', help='Status (repeatable)')
+    list_parser.add_argument('--role', action='append', help='Role (repeatable)')
+    list_parser.add_argument('--parent', action='append', help='Parent agent (repeatable)')
+    list_parser.add_argument('--json', action='store_true', help='One JSON card per line')
+    show_parser = subparsers.add_parser('show', help='Show one subagent card')
+    show_parser.add_argument('employee_id')
+    import_parser = subparsers.add_parser('import', help='Import a legacy subagent_registry.json')
+    import_parser.add_argument('--file', help='Legacy JSON (default: .fis3.1/subagent_registry.json)')
+    export_parser = subparsers.add_parser('export', help='Write the legacy subagent_registry.json format')
+    export_parser.add_argument('--output', help='Output file (default: .fis3.1/subagent_registry.json)')
+    args = parser.parse_args()
+
+    registry = SubagentRegistry()
+    if args.command == 'list':
+        shown = 0
+        for card in registry.iter(args.status, args.role, args.parent):
+            if args.json:
+                print(json.dumps(card, ensure_ascii=False))
+            else:
+                print(f"{card['employee_id']:<28} {card.get('role') or '-':<11} {card.get('status') or '-':<10} "
+                      f"{card.get('name', '')}")
+            shown += 1
+        if not args.json:
+            print(f"\n   {shown} subagent(s)")
+
+    elif args.command == 'show':
+        card = registry.get(args.employee_id)
+        if card is None:
+            print(f"❌ Subagent not found: {args.employee_id}")
+        else:
+            print(json.dumps(card, indent=2, ensure_ascii=False))
+
+    elif args.command == 'import':
+        count = registry.import_json(args.file)
+        print(f"✅ Imported {count} subagent(s)")
+
+    elif args.command == 'export':
+        path, count = registry.export_json(args.output)
+        print(f"✅ Exported {count} subagent(s) to {path}")
+
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+FIS 3.2 工牌文件保留策略 - 按大小 / 数量 / 时间限制的 LRU 淘汰
+
+每次 create_badge 都会写一个新文件，通知时可能再复制一份到 workspace/output，
+长期运行的主机上目录会积累数十万张 PNG，拖慢每次列目录和 glob。这里：
+
+- 台账 fis-hub/.fis3.1/retention.db 记录每个工牌文件 (路径, 大小, 最近使用时间)
+  以及每个目录的文件数 / 总字节，新增文件时增量更新，清理时不需要列目录
+- 超出 FIS_BADGE_MAX_MB / FIS_BADGE_MAX_FILES，或超过 FIS_BADGE_MAX_AGE_DAYS 未使用的文件，
+  按最近使用时间从旧到新删除
+- 仍被 active ticket 引用 (badge_path) 的工牌、以及 GRACE_SECONDS 内刚用过的文件永不删除
+- 台账外新增的文件 (手动生成、其他进程) 由定期对账扫描 (RESCAN_INTERVAL) 补录，
+  mtime 作为最近使用时间；只管理 BADGE_PATTERNS 匹配的文件，目录里的其他输出不受影响
+
+用法：
+    python3 fis_retention.py stats
+    python3 fis_retention.py sweep [--dry-run] [--rescan]
+"""
+
+import fnmatch
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+SHARED_HUB = Path.home() / ".openclaw" / "fis-hub"
+RETENTION_DB = SHARED_HUB / ".fis3.1" / "retention.db"
+BADGE_DIRS = [
+    Path.home() / ".openclaw" / "output" / "badges",
+    Path.home() / ".openclaw" / "workspace" / "output" / "badges",
+    Path.home() / ".openclaw" / "workspace" / "output",      # 消息通道允许的目录 (通知暂存)
+]
+BADGE_PATTERNS = ('badge_*', '*_badges.*')
+
+SCHEMA_VERSION = 1
+GRACE_SECONDS = 600
+RESCAN_INTERVAL = 6 * 3600
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS files (
+    path    TEXT PRIMARY KEY,
+    dir     TEXT NOT NULL,
+    size    INTEGER NOT NULL,
+    used_ns INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_files_lru ON files(dir, used_ns);
+CREATE TABLE IF NOT EXISTS dirs (
+    dir        TEXT PRIMARY KEY,
+    files      INTEGER NOT NULL DEFAULT 0,
+    bytes      INTEGER NOT NULL DEFAULT 0,
+    scanned_ns INTEGER NOT NULL DEFAULT 0
+);
+PRAGMA user_version = {SCHEMA_VERSION};
+"""
+
+
+def retention_limits():
+    """(max_bytes, max_files, max_age_seconds)；0 表示不限制"""
+    max_mb = float(os.environ.get('FIS_BADGE_MAX_MB', '512'))
+    max_files = int(os.environ.get('FIS_BADGE_MAX_FILES', '2000'))
+    max_age_days = float(os.environ.get('FIS_BADGE_MAX_AGE_DAYS', '30'))
+    return int(max_mb * 1024 * 1024), max_files, int(max_age_days * 86400)
+
+
+def configured_dirs():
+    """受管目录 (FIS_RETENTION_DIRS 以 os.pathsep 分隔，可覆盖默认列表)"""
+    raw = os.environ.get('FIS_RETENTION_DIRS')
+    dirs = [Path(p).expanduser() for p in raw.split(os.pathsep) if p] if raw else BADGE_DIRS
+    return [str(d.resolve()) for d in dirs]
+
+
+def is_badge_file(name):
+    return not name.startswith('.') and any(fnmatch.fnmatch(name, pattern) for pattern in BADGE_PATTERNS)
+
+
+class BadgeRetention:
+    """工牌文件台账 + LRU 清理 (线程安全，可供守护进程多线程共享)"""
+
+    def __init__(self, db_path=RETENTION_DB, dirs=None, max_bytes=None, max_files=None, max_age=None):
+        """
+        Args:
+            dirs: 受管目录列表 (默认 configured_dirs())
+            max_bytes / max_files / max_age: 每个目录的上限 (秒)；None 取环境变量，0 表示不限制
+        """
+        env_bytes, env_files, env_age = retention_limits()
+        self.db_path = Path(db_path)
+        self.dirs = [str(Path(d).resolve()) for d in dirs] if dirs else configured_dirs()
+        self.max_bytes = env_bytes if max_bytes is None else max_bytes
+        self.max_files = env_files if max_files is None else max_files
+        self.max_age = env_age if max_age is None else max_age
+        self._lock = threading.RLock()
+        self._conn = None
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                conn.executescript("DROP TABLE IF EXISTS files; DROP TABLE IF EXISTS dirs;")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _managed_dir(self, path):
+        directory = str(Path(path).resolve().parent)
+        return directory if directory in self.dirs else None
+
+    # ---------- 台账 ----------
+
+    def record(self, path, used_ns=None):
+        """
+        登记新写入 / 再次使用的工牌 (刷新 LRU 时间)
+
+        Returns:
+            是否登记 (不在受管目录、文件不存在时为 False)
+        """
+        directory = self._managed_dir(path)
+        if directory is None:
+            return False
+        try:
+            size = os.stat(path).st_size
+        except OSError:
+            return False
+        path = str(Path(path).resolve())
+        with self._lock, self.conn as conn:
+            conn.execute("INSERT OR IGNORE INTO dirs (dir) VALUES (?)", (directory,))
+            old = conn.execute("SELECT size FROM files WHERE path = ?", (path,)).fetchone()
+            conn.execute("INSERT OR REPLACE INTO files (path, dir, size, used_ns) VALUES (?, ?, ?, ?)",
+                         (path, directory, size, used_ns or time.time_ns()))
+            conn.execute("UPDATE dirs SET files = files + ?, bytes = bytes + ? WHERE dir = ?",
+                         (0 if old else 1, size - (old[0] if old else 0), directory))
+        return True
+
+    def rescan(self, directory):
+        """对账：列一次目录，补录台账外的文件，删除已不存在的记录"""
+        on_disk = {}
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if is_badge_file(entry.name) and entry.is_file(follow_symlinks=False):
+                        stat = entry.stat()
+                        on_disk[os.path.join(directory, entry.name)] = (stat.st_size, stat.st_mtime_ns)
+        except FileNotFoundError:
+            pass
+
+        with self._lock, self.conn as conn:
+            known = dict(conn.execute("SELECT path, size FROM files WHERE dir = ?", (directory,)))
+            gone = [(path,) for path in known if path not in on_disk]
+            conn.executemany("DELETE FROM files WHERE path = ?", gone)
+            conn.executemany("INSERT INTO files (path, dir, size, used_ns) VALUES (?, ?, ?, ?)",
+                             [(path, directory, size, mtime) for path, (size, mtime) in on_disk.items()
+                              if path not in known])
+            conn.executemany("UPDATE files SET size = ? WHERE path = ?",
+                             [(on_disk[path][0], path) for path, size in known.items()
+                              if path in on_disk and on_disk[path][0] != size])
+            conn.execute("INSERT OR REPLACE INTO dirs (dir, files, bytes, scanned_ns) VALUES (?, ?, ?, ?)",
+                         (directory, len(on_disk), sum(size for size, _ in on_disk.values()), time.time_ns()))
+        return len(on_disk)
+
+    # ---------- 清理 ----------
+
+    def _over_limits(self, files, size, oldest_ns, now_ns):
+        return ((self.max_files and files > self.max_files) or
+                (self.max_bytes and size > self.max_bytes) or
+                (self.max_age and oldest_ns is not None and oldest_ns < now_ns - self.max_age * 10**9))
+
+    def sweep(self, protected=None, rescan=False, dry_run=False):
+        """
+        按 LRU 删除超出限制的工牌
+
+        Args:
+            protected: 不可删除的路径集合，或返回它的可调用对象 (只在确实需要删除时才调用)
+            rescan: 强制对账扫描 (否则按 RESCAN_INTERVAL)
+            dry_run: 只统计不删除
+
+        Returns:
+            {目录: (删除数, 释放字节)}，只包含有删除的目录
+        """
+        now_ns = time.time_ns()
+        grace_ns = now_ns - GRACE_SECONDS * 10**9
+        age_ns = now_ns - self.max_age * 10**9 if self.max_age else None
+        report = {}
+        with self._lock:
+            conn = self.conn
+            for directory in self.dirs:
+                row = conn.execute("SELECT files, bytes, scanned_ns FROM dirs WHERE dir = ?", (directory,)).fetchone()
+                if rescan or row is None or now_ns - row[2] > RESCAN_INTERVAL * 10**9:
+                    if not os.path.isdir(directory):
+                        continue
+                    self.rescan(directory)
+                    row = conn.execute("SELECT files, bytes, scanned_ns FROM dirs WHERE dir = ?",
+                                       (directory,)).fetchone()
+                files, size, _ = row
+                oldest = conn.execute("SELECT min(used_ns) FROM files WHERE dir = ?", (directory,)).fetchone()[0]
+                if not self._over_limits(files, size, oldest, now_ns):
+                    continue
+
+                if callable(protected):
+                    protected = protected()
+                keep = {str(Path(p).resolve()) for p in protected or ()}
+                victims = []
+                for path, file_size, used_ns in conn.execute(
+                        "SELECT path, size, used_ns FROM files WHERE dir = ? ORDER BY used_ns", (directory,)):
+                    if used_ns >= grace_ns:
+                        break
+                    expired = age_ns is not None and used_ns < age_ns
+                    if not expired and not self._over_limits(files, size, None, now_ns):
+                        break
+                    if path in keep:
+                        continue
+                    victims.append((path, file_size))
+                    files -= 1
+                    size -= file_size
+
+                if not victims:
+                    continue
+                report[directory] = (len(victims), sum(s for _, s in victims))
+                if dry_run:
+                    continue
+                removed = []
+                for path, file_size in victims:
+                    try:
+                        os.unlink(path)
+                    except FileNotFoundError:
+                        pass
+                    except OSError as e:
+                        print(f"⚠️ Could not remove {path}: {e}")
+                        continue
+                    removed.append((path, file_size))
+                with conn:
+                    conn.executemany("DELETE FROM files WHERE path = ?", [(p,) for p, _ in removed])
+                    conn.execute("UPDATE dirs SET files = files - ?, bytes = bytes - ? WHERE dir = ?",
+                                 (len(removed), sum(s for _, s in removed), directory))
+                report[directory] = (len(removed), sum(s for _, s in removed))
+        return report
+
+    def stats(self):
+        with self._lock:
+            rows = self.conn.execute("SELECT dir, files, bytes, scanned_ns FROM dirs ORDER BY dir").fetchall()
+        return {
+            'limits': {'max_bytes': self.max_bytes, 'max_files': self.max_files, 'max_age_seconds': self.max_age},
+            'dirs': {d: {'files': f, 'bytes': b, 'scanned_at': s // 10**9} for d, f, b, s in rows},
+        }
+
+
+def active_badges(lifecycle):
+    """active ticket 引用的工牌路径 (通过 ticket 索引，不逐个读取 ticket)"""
+    _, rows = lifecycle.index.query(state='active', fields=['badge_path'], limit=None)
+    return {row['badge_path'] for row in rows if row['badge_path'] and row['badge_path'] != 'None'}
+
+
+def main():
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="FIS 3.2 Badge Retention")
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.add_parser('stats', help='Files and bytes per managed directory')
+    sweep_parser = subparsers.add_parser('sweep', help='Evict least recently used badges over the limits')
+    sweep_parser.add_argument('--dry-run', action='store_true', help='Only report what would be removed')
+    sweep_parser.add_argument('--rescan', action='store_true', help='List directories again before sweeping')
+    args = parser.parse_args()
+
+    retention = BadgeRetention()
+    if args.command == 'stats':
+        print(json.dumps(retention.stats(), indent=2))
+
+    elif args.command == 'sweep':
+        from fis_lifecycle import SubAgentLifecycle
+        lifecycle = SubAgentLifecycle()
+        report = retention.sweep(lambda: active_badges(lifecycle), args.rescan, args.dry_run)
+        action = "Would remove" if args.dry_run else "Removed"
+        for directory, (count, freed) in report.items():
+            print(f"✅ {action} {count} badge(s), {freed / 1024 / 1024:.1f} MB from {directory}")
+        if not report:
+            print("✅ All badge directories within limits")
+
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
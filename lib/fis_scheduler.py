@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+"""
+FIS 3.2 截止时间 / 超时调度器
+
+active ticket 的到期事件放在最小堆中 (按到期时间)：
+    - timeout:  created_at + timeout_minutes   (子代理停滞)
+    - deadline: task.deadline                  (任务逾期)
+
+- 新建 / 完成 ticket 时由生命周期事件同步：入堆 O(log n)，取消为惰性删除 O(1)
+- 绕过生命周期的外部修改由 refresh() 增量发现：只列出 mtime 变化过的分片目录
+- 到期只弹出堆顶，不再全量扫描 ticket
+- 已触发的事件记录在 ticket["expired"] 中，重启后不会重复触发
+
+到期动作 (FIS_TIMEOUT_ACTION / FIS_DEADLINE_ACTION，默认 mark)：
+    mark      标记状态 (timeout / overdue)，ticket 保持 active
+    escalate  标记 + 通知 (FIS_ESCALATE_TARGET 设置时经 openclaw message send 发送)
+    fail      标记为 failed 并移入 completed，释放的名额随即激活排队 ticket
+
+用法：
+    python3 fis_scheduler.py check          # 触发所有已到期事件后退出
+    python3 fis_scheduler.py run            # 前台常驻 (守护进程内自动运行)
+    python3 fis_scheduler.py upcoming       # 列出即将到期的事件
+"""
+
+import heapq
+import itertools
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from fis_storage import TicketStore
+
+TICKETS_DIR = Path.home() / ".openclaw" / "fis-hub" / "tickets"
+
+EXPIRY_KINDS = ('timeout', 'deadline')
+EXPIRY_ACTIONS = ('mark', 'escalate', 'fail')
+EXPIRED_STATUS = {'timeout': 'timeout', 'deadline': 'overdue'}
+
+# 外部进程 (未经守护进程) 创建 / 完成 ticket 时，按 active 目录变化重新同步的间隔
+RESYNC_INTERVAL = 5.0
+RACY_WINDOW_NS = 2_000_000_000
+
+
+def _parse_time(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def expiry_times(ticket):
+    """ticket → [(到期 datetime, kind)]，跳过已触发的事件"""
+    task = ticket.get('task')
+    task = task if isinstance(task, dict) else {}
+    fired = ticket.get('expired') or {}
+    events = []
+
+    timeout = ticket.get('timeout_minutes') or task.get('timeout_minutes')
+    # 排队过的 ticket 从激活时开始计时
+    created = _parse_time(ticket.get('activated_at') or task.get('created_at') or ticket.get('created_at'))
+    if timeout and created and 'timeout' not in fired:
+        events.append((created + timedelta(minutes=float(timeout)), 'timeout'))
+
+    deadline = _parse_time(task.get('deadline') or ticket.get('deadline'))
+    if deadline and 'deadline' not in fired:
+        events.append((deadline, 'deadline'))
+    return events
+
+
+def _default_actions():
+    return {
+        kind: os.environ.get(f'FIS_{kind.upper()}_ACTION', 'mark')
+        for kind in EXPIRY_KINDS
+    }
+
+
+class DeadlineScheduler:
+    """active ticket 到期事件最小堆"""
+
+    def __init__(self, store, actions=None, lock=None):
+        """
+        Args:
+            store: TicketStore
+            actions: {kind: 'mark' | 'escalate' | 'fail'}，默认取环境变量
+            lock: 与 ticket 写入方共享的锁 (守护进程传入请求锁)
+        """
+        self.store = store
+        self.actions = {**_default_actions(), **(actions or {})}
+        for kind, action in self.actions.items():
+            if action not in EXPIRY_ACTIONS:
+                raise ValueError(f"Unknown expiry action for {kind}: {action}")
+        self.lock = lock or threading.RLock()
+        self.listeners = []
+        self.batch_listeners = []
+        self._heap = []                  # [(due_ts, seq, ticket_id, kind)]
+        self._live = {}                  # (ticket_id, kind) → seq；不在其中的堆项已取消
+        self._seq = itertools.count()
+        self._dirs = {}                  # active 目录 → (mtime_ns, ticket_ids, 子目录)
+        self._wakeup = threading.Condition(threading.Lock())
+        self._stopped = False
+
+    def __len__(self):
+        return len(self._live)
+
+    def add_listener(self, fn):
+        """到期回调 fn(kind, action, ticket)"""
+        self.listeners.append(fn)
+
+    def add_batch_listener(self, fn):
+        """每批到期事件触发后 (已释放 self.lock) 回调 fn(fired)，fired 同 fire_due 返回值"""
+        self.batch_listeners.append(fn)
+
+    # ---------- 堆维护 ----------
+
+    def schedule(self, ticket):
+        """ticket 入堆 (新建或截止时间变更时调用) - O(log n)"""
+        ticket_id = ticket.get('ticket_id')
+        if not ticket_id:
+            return
+        self.cancel(ticket_id)
+        events = expiry_times(ticket)
+        for due, kind in events:
+            seq = next(self._seq)
+            self._live[(ticket_id, kind)] = seq
+            heapq.heappush(self._heap, (due.timestamp(), seq, ticket_id, kind))
+        # 唤醒调度线程重新计算等待时间 (新事件可能早于当前等待目标)
+        if events:
+            with self._wakeup:
+                self._wakeup.notify()
+
+    def cancel(self, ticket_id):
+        """取消 ticket 的全部事件 (惰性删除，弹出时跳过)"""
+        for kind in EXPIRY_KINDS:
+            self._live.pop((ticket_id, kind), None)
+
+    def load(self, tickets):
+        """从 ticket 列表重建堆 - O(n) (不经过 active 目录时使用)"""
+        self._heap = []
+        self._live = {}
+        for ticket in tickets:
+            ticket_id = ticket.get('ticket_id')
+            for due, kind in expiry_times(ticket):
+                seq = next(self._seq)
+                self._live[(ticket_id, kind)] = seq
+                self._heap.append((due.timestamp(), seq, ticket_id, kind))
+        heapq.heapify(self._heap)
+        with self._wakeup:
+            self._wakeup.notify()
+
+    def refresh(self):
+        """
+        增量同步 active 目录，发现绕过生命周期事件的外部新建 / 完成
+
+        只列出 mtime 变化过的分片目录并比较其中的 ticket 文件名：
+        新出现的读取后入堆，消失的取消。未变化的目录只需一次 stat。
+
+        Returns:
+            (新增数, 移除数)
+        """
+        now_ns = time.time_ns()
+        dirs = {}
+        added = removed = 0
+        stack = [str(self.store.state_dir('active'))]
+        while stack:
+            directory = stack.pop()
+            try:
+                mtime = os.stat(directory).st_mtime_ns
+            except FileNotFoundError:
+                continue
+            old = self._dirs.get(directory)
+            if old and old[0] == mtime:
+                dirs[directory] = old
+                stack.extend(old[2])
+                continue
+
+            ids, subdirs = set(), []
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                        elif entry.name.endswith('.json') and not entry.name.startswith('.'):
+                            ids.add(entry.name[:-5])
+            except FileNotFoundError:
+                continue
+            stack.extend(subdirs)
+            # 刚修改的目录不记录 mtime (同一精度内可能还有写入)，下次再列一次
+            recorded = mtime if now_ns - mtime > RACY_WINDOW_NS else None
+            dirs[directory] = (recorded, ids, subdirs)
+
+            known = old[1] if old else set()
+            for ticket_id in ids - known:
+                if any((ticket_id, kind) in self._live for kind in EXPIRY_KINDS):
+                    continue  # 已由生命周期事件入堆
+                ticket = self.store.read('active', ticket_id)
+                if ticket is not None:
+                    self.schedule(ticket)
+                    added += 1
+            for ticket_id in known - ids:
+                self.cancel(ticket_id)
+                removed += 1
+
+        for directory in set(self._dirs) - set(dirs):
+            for ticket_id in self._dirs[directory][1]:
+                self.cancel(ticket_id)
+                removed += 1
+        self._dirs = dirs
+        return added, removed
+
+    def on_lifecycle_event(self, event, ticket, **detail):
+        """SubAgentLifecycle 监听器：created / activated → 入堆；completed / failed → 取消 (排队 ticket 不计时)"""
+        if event == 'activated' or (event == 'created' and ticket.get('status') != 'queued'):
+            self.schedule(ticket)
+        elif event in ('completed', 'failed'):
+            self.cancel(ticket.get('ticket_id'))
+
+    def _peek(self):
+        """丢弃已取消的堆顶，返回有效堆顶或 None"""
+        while self._heap:
+            due, seq, ticket_id, kind = self._heap[0]
+            if self._live.get((ticket_id, kind)) == seq:
+                return self._heap[0]
+            heapq.heappop(self._heap)
+        return None
+
+    def next_due(self):
+        """最近的到期时间戳 (无事件时 None)"""
+        with self.lock:
+            top = self._peek()
+        return top[0] if top else None
+
+    def upcoming(self, limit=20):
+        """即将到期的事件 [(datetime, kind, ticket_id)]"""
+        with self.lock:
+            live = [e for e in self._heap if self._live.get((e[2], e[3])) == e[1]]
+        return [(datetime.fromtimestamp(due), kind, ticket_id)
+                for due, _, ticket_id, kind in heapq.nsmallest(limit, live)]
+
+    # ---------- 触发 ----------
+
+    def fire_due(self, now=None):
+        """
+        触发所有已到期事件
+
+        Returns:
+            [(kind, action, ticket_id)]
+        """
+        now = time.time() if now is None else now
+        fired = []
+        with self.lock:
+            while True:
+                top = self._peek()
+                if top is None or top[0] > now:
+                    break
+                _, _, ticket_id, kind = heapq.heappop(self._heap)
+                self._live.pop((ticket_id, kind), None)
+                action = self._expire(ticket_id, kind)
+                if action:
+                    fired.append((kind, action, ticket_id))
+        if fired:
+            for listener in list(self.batch_listeners):
+                try:
+                    listener(fired)
+                except Exception as e:
+                    print(f"⚠️ Expiry listener error: {e}")
+        return fired
+
+    def _expire(self, ticket_id, kind):
+        # 以磁盘为准：可能已被其他进程完成
+        ticket = self.store.read('active', ticket_id)
+        if ticket is None:
+            return None
+
+        action = self.actions.get(kind, 'mark')
+        now = datetime.now().isoformat()
+        status = EXPIRED_STATUS[kind]
+        ticket.setdefault('expired', {})[kind] = now
+        ticket['status'] = status
+        if isinstance(ticket.get('task'), dict):
+            ticket['task']['status'] = status
+
+        if action == 'fail':
+            ticket['status'] = 'failed'
+            ticket['completed_at'] = now
+            ticket['verification'] = {
+                'all_deliverables_present': False,
+                'missing': ticket.get('output_requirements', []),
+                'reason': kind,
+            }
+            self.cancel(ticket_id)
+            self.store.move(ticket_id, 'active', 'completed', ticket)
+            print(f"❌ Ticket {ticket_id} failed ({kind})")
+        else:
+            self.store.write('active', ticket_id, ticket)
+            print(f"⚠️ Ticket {ticket_id} {status}")
+            if action == 'escalate':
+                self._escalate(ticket, kind)
+
+        for listener in list(self.listeners):
+            try:
+                listener(kind, action, ticket)
+            except Exception as e:
+                print(f"⚠️ Expiry listener error: {e}")
+        return action
+
+    def _escalate(self, ticket, kind):
+        """通知父代理 (FIS_ESCALATE_TARGET 未设置时只打印命令)"""
+        message = (f"⏰ FIS {EXPIRED_STATUS[kind]}\\nAgent: {ticket.get('agent_id')}\\n"
+                   f"Ticket: {ticket.get('ticket_id')}\\nParent: {ticket.get('parent')}")
+        target = os.environ.get('FIS_ESCALATE_TARGET')
+        channel = os.environ.get('FIS_ESCALATE_CHANNEL', 'whatsapp')
+        if not target:
+            print(f"📱 To escalate: openclaw message send --channel {channel} --target <target> --message \"{message}\"")
+            return
+        import subprocess
+        try:
+            subprocess.run(["openclaw", "message", "send", "--channel", channel,
+                            "--target", target, "--message", message],
+                           capture_output=True, text=True, timeout=30)
+        except Exception as e:
+            print(f"⚠️ Escalation failed: {e}")
+
+    # ---------- 常驻线程 ----------
+
+    def run(self, resync_interval=RESYNC_INTERVAL):
+        """阻塞运行：睡到下一个到期时间 (或被新事件唤醒)，每 resync_interval 秒增量同步一次"""
+        next_refresh = 0.0
+        while not self._stopped:
+            if time.time() >= next_refresh:
+                with self.lock:
+                    self.refresh()
+                next_refresh = time.time() + resync_interval
+            self.fire_due()
+            due = self.next_due()
+            wake = next_refresh if due is None else min(next_refresh, due)
+            with self._wakeup:
+                if not self._stopped:
+                    self._wakeup.wait(max(0.0, wake - time.time()))
+
+    def start(self, **kwargs):
+        """后台线程运行"""
+        thread = threading.Thread(target=self.run, kwargs=kwargs, name="fis-scheduler", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stopped = True
+        with self._wakeup:
+            self._wakeup.notify()
+
+
+class QueuePromoter:
+    """
+    独立运行 (无守护进程) 时的排队激活：fail 动作把 ticket 移入 completed、释放名额，
+    每批到期事件之后激活排队 ticket (与 complete_task 相同)
+    """
+
+    def __init__(self, scheduler):
+        self._parents = set()
+        scheduler.add_listener(self.on_expiry)
+        scheduler.add_batch_listener(self.promote)
+
+    def on_expiry(self, kind, action, ticket):
+        if action == 'fail':
+            self._parents.add(ticket.get('parent') or 'cybermao')
+
+    def promote(self, fired):
+        if not self._parents:
+            return []
+        from fis_lifecycle import SubAgentLifecycle
+
+        parents, self._parents = sorted(self._parents), set()
+        # 名额全局共享：由第一个父代理的生命周期激活即可 (工牌 / 通知按 ticket 自身信息生成)
+        return SubAgentLifecycle(parents[0]).promote_queued()
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="FIS 3.2 Deadline Scheduler")
+    parser.add_argument('command', choices=['check', 'run', 'upcoming'])
+    parser.add_argument('--timeout-action', choices=EXPIRY_ACTIONS, help='Action when timeout_minutes elapses')
+    parser.add_argument('--deadline-action', choices=EXPIRY_ACTIONS, help='Action when the deadline passes')
+    parser.add_argument('--limit', type=int, default=20, help='Events to show (upcoming)')
+    args = parser.parse_args()
+
+    actions = {k: v for k, v in (('timeout', args.timeout_action), ('deadline', args.deadline_action)) if v}
+    scheduler = DeadlineScheduler(TicketStore(TICKETS_DIR), actions)
+    if os.environ.get('FIS_METRICS', '1') != '0':
+        from fis_metrics import HubMetrics
+        scheduler.add_listener(HubMetrics().on_expiry)
+    if os.environ.get('FIS_JOURNAL', '1') != '0':
+        from fis_journal import shared_journal
+        scheduler.add_listener(shared_journal().on_expiry)
+    QueuePromoter(scheduler)
+    scheduler.refresh()
+
+    if args.command == 'check':
+        fired = scheduler.fire_due()
+        print(f"✅ {len(fired)} expiry event(s) fired, {len(scheduler)} pending")
+    elif args.command == 'upcoming':
+        print(f"\n⏰ Upcoming expiry events:")
+        for due, kind, ticket_id in scheduler.upcoming(args.limit):
+            print(f"   • {due.isoformat(timespec='seconds')}  {kind:<8} {ticket_id}")
+        print(f"   Total: {len(scheduler)}")
+    elif args.command == 'run':
+        print(f"✅ Scheduler running ({len(scheduler)} pending events, Ctrl+C to stop)")
+        try:
+            scheduler.run()
+        except KeyboardInterrupt:
+            print("👋 Scheduler stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+FIS 3.2 本地全文检索 - fis-hub/knowledge 与 results 交付物
+
+离线 / 内网机器上没有 QMD 时的内置检索 (也可在测试中代替 QMD)：
+
+- 倒排索引存于 fis-hub/.fis3.1/search_index.db (SQLite，可删除，下次检索自动重建)
+  terms(term) + postings(term_id, doc_id, tf) WITHOUT ROWID，不保存正文副本
+- 分词：拉丁字母 / 数字按词 (小写)，中日韩文字按相邻二字 (bigram)，单字片段保留单字
+- BM25 排序 (k1=1.2, b=0.75)，摘要在命中文档的原文中截取
+- 增量同步：逐文件比对 (mtime, size)，变化后再比对内容 sha1，内容未变只更新 mtime；
+  刚修改过的文件 (RACY_WINDOW_NS 内) 下次检索再核对一次
+
+用法：
+    python3 fis_search.py search "无人机 路径规划" [--root knowledge] [--limit 10] [--json]
+    python3 fis_search.py index [--rebuild]
+    python3 fis_search.py stats
+"""
+
+import hashlib
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+SHARED_HUB = Path.home() / ".openclaw" / "fis-hub"
+SEARCH_DB = SHARED_HUB / ".fis3.1" / "search_index.db"
+DEFAULT_ROOTS = {
+    'knowledge': SHARED_HUB / "knowledge",
+    'results': SHARED_HUB / "results",
+}
+
+SCHEMA_VERSION = 1
+RACY_WINDOW_NS = 2_000_000_000
+TEXT_SUFFIXES = {'.md', '.markdown', '.txt', '.rst', '.json', '.jsonl', '.yaml', '.yml', '.csv', '.tsv',
+                 '.py', '.sh', '.js', '.ts', '.html', '.htm', '.xml', '.tex', '.log', '.ini', '.toml'}
+MAX_FILE_BYTES = 4 * 1024 * 1024
+BM25_K1 = 1.2
+BM25_B = 0.75
+SNIPPET_CHARS = 120
+
+_CJK = r'\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff'
+_TOKEN_RE = re.compile(rf'[{_CJK}]+|[^\W{_CJK}]+')
+_CJK_RE = re.compile(rf'[{_CJK}]')
+_HEADING_RE = re.compile(r'^\s*#{1,6}\s+(.+?)\s*$', re.MULTILINE)
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS docs (
+    doc_id   INTEGER PRIMARY KEY,
+    path     TEXT UNIQUE NOT NULL,
+    root     TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size     INTEGER NOT NULL,
+    sha1     TEXT NOT NULL,
+    length   INTEGER NOT NULL,
+    title    TEXT
+);
+CREATE TABLE IF NOT EXISTS terms (
+    term_id INTEGER PRIMARY KEY,
+    term    TEXT UNIQUE NOT NULL
+);
+CREATE TABLE IF NOT EXISTS postings (
+    term_id INTEGER NOT NULL,
+    doc_id  INTEGER NOT NULL,
+    tf      INTEGER NOT NULL,
+    PRIMARY KEY (term_id, doc_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_postings_doc ON postings(doc_id);
+PRAGMA user_version = {SCHEMA_VERSION};
+"""
+
+
+def tokenize(text):
+    """小写词 + CJK bigram"""
+    tokens = []
+    for run in _TOKEN_RE.findall(text.lower()):
+        if _CJK_RE.match(run):
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def _title(path, text):
+    match = _HEADING_RE.search(text[:4096])
+    return match.group(1)[:200] if match else path.name
+
+
+def snippet(text, terms, width=SNIPPET_CHARS):
+    """截取第一个命中词附近的原文 (单行)"""
+    lowered = text.lower()
+    hits = [pos for pos in (lowered.find(term) for term in terms) if pos >= 0]
+    start = max(0, min(hits) - width // 3) if hits else 0
+    piece = ' '.join(text[start:start + width].split())
+    return ('…' if start > 0 else '') + piece + ('…' if start + width < len(text) else '')
+
+
+class KnowledgeIndex:
+    """本地全文索引 (线程安全，可供守护进程多线程共享)"""
+
+    def __init__(self, db_path=SEARCH_DB, roots=None):
+        """
+        Args:
+            roots: {名称: 目录}，默认 knowledge / results
+        """
+        self.db_path = Path(db_path)
+        self.roots = {name: Path(path) for name, path in (roots or DEFAULT_ROOTS).items()}
+        self._lock = threading.RLock()
+        self._conn = None
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                conn.executescript("DROP TABLE IF EXISTS postings; DROP TABLE IF EXISTS terms; "
+                                   "DROP TABLE IF EXISTS docs;")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    # ---------- 同步 ----------
+
+    def _walk(self, root):
+        """递归列出可索引文件 → [(path, stat)]；跳过隐藏文件 / 目录"""
+        stack = [str(root)]
+        while stack:
+            try:
+                entries = list(os.scandir(stack.pop()))
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif os.path.splitext(entry.name)[1].lower() in TEXT_SUFFIXES:
+                    try:
+                        yield entry.path, entry.stat()
+                    except FileNotFoundError:
+                        continue
+
+    def refresh(self):
+        """
+        增量同步
+
+        Returns:
+            (新增 / 重建的文档数, 删除的文档数)
+        """
+        with self._lock:
+            conn = self.conn
+            known = {path: (doc_id, mtime, size, sha1) for doc_id, path, mtime, size, sha1
+                     in conn.execute("SELECT doc_id, path, mtime_ns, size, sha1 FROM docs")}
+            seen = set()
+            indexed = 0
+            now_ns = time.time_ns()
+            with conn:
+                for name, root in self.roots.items():
+                    for path, stat in self._walk(root):
+                        seen.add(path)
+                        old = known.get(path)
+                        if old and old[1] == stat.st_mtime_ns and old[2] == stat.st_size:
+                            continue
+                        if stat.st_size > MAX_FILE_BYTES:
+                            continue
+                        try:
+                            data = Path(path).read_bytes()
+                        except OSError:
+                            continue
+                        sha1 = hashlib.sha1(data).hexdigest()
+                        # 刚写入的文件：mtime 记为 -1，下次再核对
+                        mtime = -1 if now_ns - stat.st_mtime_ns < RACY_WINDOW_NS else stat.st_mtime_ns
+                        if old and old[3] == sha1:
+                            conn.execute("UPDATE docs SET mtime_ns = ?, size = ? WHERE doc_id = ?",
+                                         (mtime, stat.st_size, old[0]))
+                            continue
+                        self._index_doc(conn, name, path, data.decode('utf-8', 'replace'),
+                                        mtime, stat.st_size, sha1, old[0] if old else None)
+                        indexed += 1
+
+                removed = [known[path][0] for path in set(known) - seen]
+                for doc_id in removed:
+                    conn.execute("DELETE FROM postings WHERE doc_id = ?", (doc_id,))
+                    conn.execute("DELETE FROM docs WHERE doc_id = ?", (doc_id,))
+            return indexed, len(removed)
+
+    def _index_doc(self, conn, root_name, path, text, mtime, size, sha1, doc_id=None):
+        tokens = tokenize(text)
+        counts = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+
+        row = (path, root_name, mtime, size, sha1, len(tokens), _title(Path(path), text))
+        if doc_id is None:
+            doc_id = conn.execute("INSERT INTO docs (path, root, mtime_ns, size, sha1, length, title) "
+                                  "VALUES (?, ?, ?, ?, ?, ?, ?)", row).lastrowid
+        else:
+            conn.execute("UPDATE docs SET path = ?, root = ?, mtime_ns = ?, size = ?, sha1 = ?, length = ?, "
+                         "title = ? WHERE doc_id = ?", row + (doc_id,))
+            conn.execute("DELETE FROM postings WHERE doc_id = ?", (doc_id,))
+
+        conn.executemany("INSERT OR IGNORE INTO terms (term) VALUES (?)", ((t,) for t in counts))
+        term_ids = self._term_ids(conn, list(counts))
+        conn.executemany("INSERT INTO postings (term_id, doc_id, tf) VALUES (?, ?, ?)",
+                         ((term_ids[t], doc_id, n) for t, n in counts.items()))
+
+    def _term_ids(self, conn, terms):
+        ids = {}
+        for i in range(0, len(terms), 500):
+            chunk = terms[i:i + 500]
+            marks = ','.join('?' * len(chunk))
+            ids.update(conn.execute(f"SELECT term, term_id FROM terms WHERE term IN ({marks})", chunk))
+        return ids
+
+    def rebuild(self):
+        """清空后全量重建"""
+        with self._lock:
+            with self.conn as conn:
+                conn.execute("DELETE FROM postings")
+                conn.execute("DELETE FROM terms")
+                conn.execute("DELETE FROM docs")
+            return self.refresh()
+
+    # ---------- 检索 ----------
+
+    def search(self, query, limit=10, root=None, refresh=True):
+        """
+        BM25 检索
+
+        Args:
+            root: 只检索某个根目录 (knowledge / results)
+            refresh: 检索前增量同步
+
+        Returns:
+            [{"path", "root", "title", "score", "snippet"}, ...] 按得分降序
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        with self._lock:
+            if refresh:
+                self.refresh()
+            conn = self.conn
+            where, params = ("WHERE root = ?", [root]) if root else ("", [])
+            total_docs, total_length = conn.execute(
+                f"SELECT count(*), coalesce(sum(length), 0) FROM docs {where}", params).fetchone()
+            if not total_docs:
+                return []
+            avg_length = total_length / total_docs
+
+            term_ids = self._term_ids(conn, terms)
+            if not term_ids:
+                return []
+            marks = ','.join('?' * len(term_ids))
+            rows = conn.execute(
+                f"SELECT p.term_id, p.doc_id, p.tf, d.length FROM postings p JOIN docs d USING (doc_id) "
+                f"WHERE p.term_id IN ({marks}) {'AND d.root = ?' if root else ''}",
+                list(term_ids.values()) + params).fetchall()
+
+            df = {}
+            for term_id, *_ in rows:
+                df[term_id] = df.get(term_id, 0) + 1
+            scores = {}
+            for term_id, doc_id, tf, length in rows:
+                idf = math.log(1 + (total_docs - df[term_id] + 0.5) / (df[term_id] + 0.5))
+                norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1) / norm
+            top = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+            if not top:
+                return []
+
+            marks = ','.join('?' * len(top))
+            docs = {doc_id: (path, root_name, title) for doc_id, path, root_name, title in conn.execute(
+                f"SELECT doc_id, path, root, title FROM docs WHERE doc_id IN ({marks})", [d for d, _ in top])}
+
+        results = []
+        for doc_id, score in top:
+            path, root_name, title = docs[doc_id]
+            try:
+                text = Path(path).read_text(encoding='utf-8', errors='replace')
+            except OSError:
+                text = ''
+            results.append({
+                'path': path,
+                'root': root_name,
+                'title': title,
+                'score': round(score, 4),
+                'snippet': snippet(text, terms),
+            })
+        return results
+
+    def stats(self):
+        with self._lock:
+            conn = self.conn
+            docs, tokens = conn.execute("SELECT count(*), coalesce(sum(length), 0) FROM docs").fetchone()
+            terms = conn.execute("SELECT count(*) FROM terms").fetchone()[0]
+            postings = conn.execute("SELECT count(*) FROM postings").fetchone()[0]
+        size = self.db_path.stat().st_size if self.db_path.exists() else 0
+        return {'docs': docs, 'tokens': tokens, 'terms': terms, 'postings': postings, 'db_bytes': size}
+
+
+def print_results(results):
+    if not results:
+        print("   No matches")
+        return
+    for i, hit in enumerate(results, 1):
+        print(f"{i:>3}. [{hit['root']}] {hit['title']}  ({hit['score']:.2f})")
+        print(f"     {hit['path']}")
+        print(f"     {hit['snippet']}")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="FIS 3.2 Local Search (knowledge + results)")
+    subparsers = parser.add_subparsers(dest='command')
+    search_parser = subparsers.add_parser('search', help='Ranked full-text search')
+    search_parser.add_argument('query', help='Query text (words or Chinese phrases)')
+    search_parser.add_argument('--root', choices=sorted(DEFAULT_ROOTS), help='Only search one root')
+    search_parser.add_argument('--limit', type=int, default=10)
+    search_parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    index_parser = subparsers.add_parser('index', help='Update the index now')
+    index_parser.add_argument('--rebuild', action='store_true', help='Drop and rebuild from scratch')
+    subparsers.add_parser('stats', help='Index size')
+    args = parser.parse_args()
+
+    index = KnowledgeIndex()
+    if args.command == 'search':
+        start = time.perf_counter()
+        results = index.search(args.query, args.limit, args.root)
+        if args.json:
+            print(json.dumps(results, indent=2, ensure_ascii=False))
+        else:
+            print_results(results)
+            print(f"\n   {len(results)} result(s) in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    elif args.command == 'index':
+        indexed, removed = index.rebuild() if args.rebuild else index.refresh()
+        print(f"✅ Indexed {indexed} document(s), removed {removed}")
+
+    elif args.command == 'stats':
+        print(json.dumps(index.stats(), indent=2))
+
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
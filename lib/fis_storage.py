@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+FIS 3.2 Ticket 存储 - 分片目录布局
+
+布局：
+    tickets/{state}/YYYY/MM/DD/[bucket/]TICKET_ID.json
+
+- 日期分片取自 ticket_id 中的 YYYYMMDD_HHMMSS 段，按 ID 即可直接定位，无需扫描
+- 可选哈希子桶 (FIS_HUB_BUCKETS=N)，单日 ticket 极多时继续拆分目录
+- 兼容旧版平铺目录 (tickets/active/*.json)：读取时透明回退，migrate() 一次性迁移
+- 进程内共享的已解析 ticket 缓存 (TicketCache)，文件未变化时只做一次 stat
+"""
+
+import os
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+
+import fis_json
+
+# queued: 超出并发上限等待激活的 ticket (见 fis_admission)
+TICKET_STATES = ('active', 'completed', 'queued')
+
+# ticket_id 中的时间戳段: ..._20260220_002600_...
+SHARD_DATE_RE = re.compile(r'_(\d{4})(\d{2})(\d{2})_\d{6}')
+UNDATED_SHARD = 'undated'
+
+DEFAULT_CACHE_ENTRIES = 4096
+
+
+def _write_file(path, payload, mode='wb'):
+    """写入文件并返回其 (inode, mtime_ns, size)：在 rename / link 之前取签名，不会读到别人随后写入的文件"""
+    with open(path, mode) as f:
+        f.write(payload)
+        f.flush()
+        st = os.fstat(f.fileno())
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def _tmp_path(path):
+    """同目录临时文件名：pid + 线程 ID，守护进程 / create_tasks 多线程写同一 ticket 时互不覆盖"""
+    return path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+def _detach(ticket):
+    """复制 ticket 的顶层与一层嵌套容器 (task / 列表)，调用方修改返回值不会污染缓存"""
+    if not isinstance(ticket, dict):
+        return ticket
+    return {k: v.copy() if isinstance(v, (dict, list)) else v for k, v in ticket.items()}
+
+
+class TicketCache:
+    """
+    已解析 ticket 的 LRU 缓存 (线程安全)
+
+    以 (path) 为键，记录 (inode, mtime_ns, size)：三者一致才命中，否则重新读取解析。
+    所有写入都是临时文件 + rename / link，每次写入都会换新 inode，同一时钟粒度内的改写也能发现。
+    本存储自身的写入直接更新缓存 (签名取自 rename 前的临时文件，内容为写入字节的解码结果)，
+    紧接着的读取 (verify → complete) 不再解析。
+    """
+
+    def __init__(self, max_entries=DEFAULT_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()      # path → (ino, mtime_ns, size, ticket)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, path):
+        """读取 ticket (文件未变化时返回缓存副本)；文件不存在时抛出 OSError"""
+        key = str(path)
+        st = os.stat(key)
+        sig = (st.st_ino, st.st_mtime_ns, st.st_size)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[:3] == sig:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return _detach(entry[3])
+            self.misses += 1
+        ticket = fis_json.read(key)
+        self._store(key, sig, ticket)
+        return _detach(ticket)
+
+    def put(self, path, sig, payload):
+        """
+        刚写入的文件：记录写入的字节解码后的内容
+
+        sig 须在 rename / link 之前由写入方对临时文件 fstat 取得 (inode 与 mtime 随文件一起移动)；
+        缓存的是 payload 的解码结果而非调用方的 dict，datetime 等非 JSON 值与从磁盘读取时一致。
+        """
+        if self.max_entries > 0:
+            self._store(str(path), sig, fis_json.loads(payload))
+
+    def _store(self, key, sig, ticket):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (*sig, ticket)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, path):
+        with self._lock:
+            self._entries.pop(str(path), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {'entries': len(self._entries), 'max_entries': self.max_entries,
+                    'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': round(self.hits / total, 3) if total else None}
+
+
+_shared_cache = None
+
+
+def shared_cache():
+    """进程内共享缓存 (守护进程中所有 TicketStore 共用)；FIS_TICKET_CACHE=0 关闭"""
+    global _shared_cache
+    if _shared_cache is None:
+        entries = os.environ.get('FIS_TICKET_CACHE', '')
+        _shared_cache = TicketCache(int(entries) if entries else DEFAULT_CACHE_ENTRIES)
+    return _shared_cache
+
+
+class TicketStore:
+    """分片 Ticket 存储 (兼容旧版平铺布局)"""
+
+    def __init__(self, tickets_dir, buckets=None, pretty=None, cache=None):
+        """
+        Args:
+            pretty: ticket 文件是否带缩进 (默认 FIS_TICKET_FORMAT，pretty)
+            cache: TicketCache (默认进程内共享缓存)
+        """
+        self.root = Path(tickets_dir)
+        if buckets is None:
+            buckets = int(os.environ.get('FIS_HUB_BUCKETS', '0') or 0)
+        self.buckets = buckets
+        self.pretty = fis_json.pretty_tickets() if pretty is None else pretty
+        self.cache = cache or shared_cache()
+
+    # ---------- 路径解析 ----------
+
+    def state_dir(self, state):
+        return self.root / state
+
+    def shard_parts(self, ticket_id):
+        """ticket_id → 分片目录片段 (YYYY, MM, DD[, bucket])"""
+        match = SHARD_DATE_RE.search(ticket_id)
+        parts = list(match.groups()) if match else [UNDATED_SHARD]
+        if self.buckets > 0:
+            parts.append(f"{zlib.crc32(ticket_id.encode('utf-8')) % self.buckets:02x}")
+        return parts
+
+    def path_for(self, state, ticket_id):
+        """新写入使用的分片路径"""
+        return self.state_dir(state).joinpath(*self.shard_parts(ticket_id), f"{ticket_id}.json")
+
+    def locate(self, state, ticket_id):
+        """
+        查找已存在的 ticket 文件
+
+        顺序：分片路径 → 同日未分桶路径 / 其他子桶 (桶数变更过) → 旧版平铺路径
+        """
+        path = self.path_for(state, ticket_id)
+        if path.exists():
+            return path
+
+        if self.buckets > 0:
+            day_dir = path.parent.parent
+            unbucketed = day_dir / f"{ticket_id}.json"
+            if unbucketed.exists():
+                return unbucketed
+        else:
+            day_dir = path.parent
+        if day_dir.exists():
+            for candidate in day_dir.glob(f"*/{ticket_id}.json"):
+                return candidate
+
+        legacy = self.state_dir(state) / f"{ticket_id}.json"
+        if legacy.exists():
+            return legacy
+        return None
+
+    # ---------- 读写 ----------
+
+    def read(self, state, ticket_id):
+        """读取 ticket，不存在返回 None"""
+        path = self.locate(state, ticket_id)
+        if path is None:
+            return None
+        try:
+            return self.cache.load(path)
+        except FileNotFoundError:
+            return None     # 刚被其他进程移走
+
+    def write(self, state, ticket_id, data, path=None):
+        """原子写入 ticket (临时文件 + rename)，返回写入路径"""
+        if path is None:
+            path = self.locate(state, ticket_id) or self.path_for(state, ticket_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        payload = fis_json.dumpb(data, self.pretty)
+        tmp = _tmp_path(path)
+        sig = _write_file(tmp, payload)
+        os.replace(tmp, path)
+        self.cache.put(path, sig, payload)
+        return path
+
+    def create(self, state, ticket_id, data):
+        """独占创建 ticket：目标已存在时抛出 FileExistsError，绝不覆盖"""
+        path = self.path_for(state, ticket_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        payload = fis_json.dumpb(data, self.pretty)
+        tmp = _tmp_path(path)
+        sig = _write_file(tmp, payload)
+        try:
+            # link 原子且独占：读者永远看不到写了一半的文件
+            os.link(tmp, path)
+        except FileExistsError:
+            raise
+        except OSError:
+            # 不支持硬链接的文件系统：退回 O_EXCL 创建
+            sig = _write_file(path, payload, 'xb')
+        finally:
+            tmp.unlink()
+        self.cache.put(path, sig, payload)
+        return path
+
+    def move(self, ticket_id, src_state, dst_state, data):
+        """归档：写入目标状态分片后删除源文件 - O(1)，与 hub 规模无关"""
+        src = self.locate(src_state, ticket_id)
+        dst = self.write(dst_state, ticket_id, data, path=self.path_for(dst_state, ticket_id))
+        if src is not None and src != dst:
+            src.unlink()
+            self.cache.discard(src)
+            self._prune_empty(src.parent, self.state_dir(src_state))
+        return dst
+
+    def _prune_empty(self, directory, stop):
+        """删除空的分片目录，避免 active/ 下堆积空日期目录"""
+        while directory != stop and stop in directory.parents:
+            try:
+                directory.rmdir()
+            except OSError:
+                break
+            directory = directory.parent
+
+    # ---------- 遍历 ----------
+
+    def iter_paths(self, state, since=None, until=None):
+        """
+        遍历某状态下的 ticket 文件
+
+        Args:
+            since / until: 'YYYYMMDD' 字符串，按日期分片裁剪目录，只访问范围内的分片
+        """
+        base = self.state_dir(state)
+        if not base.exists():
+            return
+
+        # 旧版平铺文件 + 无日期分片
+        yield from sorted(base.glob("*.json"))
+        undated = base / UNDATED_SHARD
+        if undated.exists():
+            yield from sorted(undated.rglob("*.json"))
+
+        for year in sorted(p for p in base.iterdir() if p.is_dir() and p.name.isdigit()):
+            if not _in_range(year.name, since, until, 4):
+                continue
+            for month in sorted(p for p in year.iterdir() if p.is_dir()):
+                if not _in_range(year.name + month.name, since, until, 6):
+                    continue
+                for day in sorted(p for p in month.iterdir() if p.is_dir()):
+                    if not _in_range(year.name + month.name + day.name, since, until, 8):
+                        continue
+                    yield from sorted(day.rglob("*.json"))
+
+    def iter_tickets(self, state, since=None, until=None):
+        """遍历 (path, ticket_dict)"""
+        for path in self.iter_paths(state, since, until):
+            try:
+                yield path, self.cache.load(path)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Skipping unreadable ticket {path.name}: {e}")
+
+    # ---------- 迁移 ----------
+
+    def migrate(self, states=TICKET_STATES, dry_run=False):
+        """将旧版平铺 ticket 迁移到分片目录，返回迁移数量"""
+        moved = 0
+        for state in states:
+            base = self.state_dir(state)
+            if not base.exists():
+                continue
+            for legacy in sorted(base.glob("*.json")):
+                target = self.path_for(state, legacy.stem)
+                if dry_run:
+                    print(f"   {legacy.name} → {target.relative_to(self.root)}")
+                else:
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    os.replace(legacy, target)
+                moved += 1
+        return moved
+
+
+def _in_range(prefix, since, until, width):
+    """日期前缀是否与 [since, until] 区间相交"""
+    if since and prefix < since[:width]:
+        return False
+    if until and prefix > until[:width]:
+        return False
+    return True
@@ -11,31 +11,34 @@ import subprocess
 from datetime import datetime
 from pathlib import Path
 
+from fis_ids import new_ticket_id
+from fis_storage import TicketStore
+from fis_ticket import Ticket
+
 # 路径配置
 WORKSPACE = Path.home() / ".openclaw" / "workspace"
 SHARED_HUB = Path.home() / ".openclaw" / "fis-hub"
 BADGE_GENERATOR = WORKSPACE / "skills" / "fis-architecture" / "lib" / "badge_generator_v7.py"
 TICKETS_DIR = SHARED_HUB / "tickets"
+STORE = TicketStore(TICKETS_DIR)
 
 def create_ticket(agent_id, task_name, role="worker", parent="cybermao"):
     """创建任务工牌（Ticket 文件）"""
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    ticket_id = f"TASK_{parent.upper()}_{timestamp}_{agent_id}_{task_name[:20]}"
+    ticket_id, timestamp = new_ticket_id(parent, f"{agent_id}_{task_name[:20]}")
     
-    ticket_data = {
-        "ticket_id": ticket_id,
-        "agent_id": agent_id,
-        "parent": parent,
-        "role": role,
-        "task": task_name,
-        "status": "pending",
-        "created_at": datetime.now().isoformat(),
-        "completed_at": None
-    }
+    # 与 SubAgentLifecycle 相同的嵌套格式 (task 为字典)
+    ticket_data = Ticket(
+        ticket_id=ticket_id,
+        agent_id=agent_id,
+        parent=parent,
+        role=role,
+        description=task_name,
+        status="pending",
+        created_at=timestamp.isoformat(),
+    ).to_dict()
     
-    # 保存到 active
-    ticket_path = TICKETS_DIR / "active" / f"{ticket_id}.json"
-    ticket_path.write_text(json.dumps(ticket_data, indent=2, ensure_ascii=False))
+    # 保存到 active (日期分片)
+    ticket_path = STORE.create("active", ticket_id, ticket_data)
     
     return ticket_id, ticket_path
 
@@ -78,21 +81,17 @@ print(f"✅ Badge: {{output}}")
 
 def complete_ticket(ticket_id):
     """完成任务并归档"""
-    active_path = TICKETS_DIR / "active" / f"{ticket_id}.json"
-    completed_path = TICKETS_DIR / "completed" / f"{ticket_id}.json"
-    
-    if not active_path.exists():
+    # 读取并更新状态
+    ticket = STORE.read("active", ticket_id)
+    if ticket is None:
         print(f"⚠️ Ticket not found in active: {ticket_id}")
         return False
     
-    # 读取并更新状态
-    ticket = json.loads(active_path.read_text())
     ticket["status"] = "completed"
     ticket["completed_at"] = datetime.now().isoformat()
     
     # 移动到 completed
-    completed_path.write_text(json.dumps(ticket, indent=2, ensure_ascii=False))
-    active_path.unlink()
+    STORE.move(ticket_id, "active", "completed", ticket)
     
     print(f"✅ Ticket archived: {ticket_id}")
     return True
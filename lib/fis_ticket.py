@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+FIS 3.2 Ticket 模型 - 统一两种历史 ticket 格式
+
+hub 中同时存在两种写法：
+
+    SubAgentLifecycle.create_task   {"task": {"description", "created_at", "deadline", "status"}, ...}
+    fis_subagent_tool.create_ticket {"task": "描述", "status": "pending", "created_at": ..., ...}
+
+Ticket 在加载时一次性归一化 (字段取值规则与 ticket 索引一致：顶层 status 优先于 task.status)，
+之后按属性访问，不再逐处判断 task 是字符串还是字典：
+
+- slots 数据类，大 hub 批量加载时内存与属性访问开销都更小
+- 字段校验表在导入时编译为一个函数，每张 ticket 只做一次类型检查
+- 未知字段原样保留 (extra / task_extra)，to_dict() 写回统一的嵌套格式，不丢数据
+- to_json() 输出紧凑 JSON (无缩进)
+
+用法：
+    python3 fis_ticket.py check             # 校验 hub 中全部 ticket
+    python3 fis_ticket.py check --fix       # 同时把旧版平铺格式改写为嵌套格式
+"""
+
+from dataclasses import dataclass, field
+
+import fis_json
+
+# 嵌套 task 中的已知字段 (其余进入 task_extra)
+TASK_FIELDS = ('description', 'created_at', 'deadline', 'status')
+# 顶层已知字段 (其余进入 extra)
+TOP_FIELDS = ('ticket_id', 'agent_id', 'parent', 'role', 'task', 'status', 'created_at', 'deadline',
+              'timeout_minutes', 'output_requirements', 'deliverables', 'workspace', 'badge_path',
+              'completed_at')
+
+_OPTIONAL_STR = (str, type(None))
+
+# (字段, 允许的类型, 是否必填) - 在导入时编译为 _validate
+TICKET_SCHEMA = (
+    ('ticket_id', (str,), True),
+    ('agent_id', _OPTIONAL_STR, False),
+    ('parent', _OPTIONAL_STR, False),
+    ('role', _OPTIONAL_STR, False),
+    ('task', (str, dict, type(None)), False),
+    ('status', _OPTIONAL_STR, False),
+    ('created_at', _OPTIONAL_STR, False),
+    ('deadline', _OPTIONAL_STR, False),
+    ('timeout_minutes', (int, float, str, type(None)), False),
+    ('output_requirements', (list, type(None)), False),
+    ('deliverables', (list, type(None)), False),
+    ('workspace', _OPTIONAL_STR, False),
+    ('badge_path', _OPTIONAL_STR, False),
+    ('completed_at', _OPTIONAL_STR, False),
+)
+
+
+def compile_validator(schema):
+    """校验表 → 校验函数 (返回错误列表，空列表表示有效)"""
+    required = tuple(name for name, _, needed in schema if needed)
+    checks = tuple((name, types, ' | '.join(t.__name__ for t in types)) for name, types, _ in schema)
+
+    def validate(data):
+        if not isinstance(data, dict):
+            return [f"ticket must be an object, got {type(data).__name__}"]
+        errors = [f"missing {name}" for name in required if not data.get(name)]
+        for name, types, expected in checks:
+            if name in data and not isinstance(data[name], types):
+                errors.append(f"{name}: expected {expected}, got {type(data[name]).__name__}")
+        return errors
+
+    return validate
+
+
+_validate = compile_validator(TICKET_SCHEMA)
+
+
+@dataclass(slots=True)
+class Ticket:
+    """归一化后的 ticket"""
+
+    ticket_id: str
+    agent_id: str = ''
+    parent: str = None
+    role: str = 'worker'
+    description: str = ''
+    status: str = None
+    created_at: str = None
+    deadline: str = None
+    timeout_minutes: float = None
+    output_requirements: list = field(default_factory=list)
+    deliverables: list = field(default_factory=list)
+    workspace: str = None
+    badge_path: str = None
+    completed_at: str = None
+    extra: dict = field(default_factory=dict)          # 其他顶层字段 (verification / expired / queued_at ...)
+    task_extra: dict = field(default_factory=dict)     # 嵌套 task 中的其他字段
+
+    @classmethod
+    def from_dict(cls, data, validate=True):
+        """
+        加载任一格式的 ticket dict
+
+        Raises:
+            ValueError: validate=True 且字段缺失或类型不符
+        """
+        if validate:
+            errors = _validate(data)
+            if errors:
+                raise ValueError(f"Invalid ticket {data.get('ticket_id') if isinstance(data, dict) else ''}: "
+                                 + '; '.join(errors))
+        task = data.get('task')
+        if isinstance(task, dict):
+            task_extra = {k: v for k, v in task.items() if k not in TASK_FIELDS}
+        else:
+            task, task_extra = {'description': task}, {}
+        return cls(
+            ticket_id=data.get('ticket_id') or '',
+            agent_id=data.get('agent_id') or '',
+            parent=data.get('parent'),
+            role=data.get('role') or 'worker',
+            description=task.get('description') or '',
+            status=data.get('status') or task.get('status'),
+            created_at=task.get('created_at') or data.get('created_at'),
+            deadline=task.get('deadline') or data.get('deadline'),
+            timeout_minutes=data.get('timeout_minutes'),
+            output_requirements=list(data.get('output_requirements') or []),
+            deliverables=list(data.get('deliverables') or []),
+            workspace=data.get('workspace'),
+            badge_path=data.get('badge_path'),
+            completed_at=data.get('completed_at'),
+            extra={k: v for k, v in data.items() if k not in TOP_FIELDS},
+            task_extra=task_extra,
+        )
+
+    @classmethod
+    def from_json(cls, text, validate=True):
+        return cls.from_dict(fis_json.loads(text), validate)
+
+    def to_dict(self):
+        """统一的嵌套格式 (SubAgentLifecycle 写出的结构)，未知字段原样保留"""
+        status = self.status or 'pending'
+        data = {
+            'ticket_id': self.ticket_id,
+            'agent_id': self.agent_id,
+            'parent': self.parent,
+            'role': self.role,
+            'task': {
+                'description': self.description,
+                'created_at': self.created_at,
+                'deadline': self.deadline,
+                'status': status,
+                **self.task_extra,
+            },
+            'status': status,
+            'output_requirements': self.output_requirements,
+            'deliverables': self.deliverables,
+            'workspace': self.workspace,
+            'badge_path': self.badge_path,
+            'completed_at': self.completed_at,
+        }
+        if self.timeout_minutes:
+            data['timeout_minutes'] = self.timeout_minutes
+        data.update(self.extra)
+        return data
+
+    def to_json(self):
+        """紧凑 JSON (无缩进、不转义中文)"""
+        return fis_json.dumps(self.to_dict())
+
+
+def validate_ticket(data):
+    """返回错误列表 (空列表表示有效)"""
+    return _validate(data)
+
+
+def normalize(data):
+    """任一格式的 ticket dict → 嵌套格式 dict"""
+    return Ticket.from_dict(data).to_dict()
+
+
+def is_flat(data):
+    """旧版平铺格式 (task 为字符串) 的 ticket"""
+    return not isinstance(data.get('task'), dict)
+
+
+def load_tickets(store, state, since=None, until=None):
+    """批量加载 Ticket (跳过无法读取或校验失败的文件)"""
+    for path, data in store.iter_tickets(state, since, until):
+        try:
+            yield Ticket.from_dict(data)
+        except ValueError as e:
+            print(f"⚠️ Skipping invalid ticket {path.name}: {e}")
+
+
+def check_hub(store, states=None, fix=False):
+    """
+    校验 hub 中的 ticket；fix=True 时把旧版平铺格式改写为嵌套格式
+
+    Returns:
+        {"checked": n, "invalid": n, "flat": n, "fixed": n}
+    """
+    from fis_storage import TICKET_STATES
+
+    report = {'checked': 0, 'invalid': 0, 'flat': 0, 'fixed': 0}
+    for state in states or TICKET_STATES:
+        for path, data in store.iter_tickets(state):
+            report['checked'] += 1
+            errors = _validate(data)
+            if errors:
+                report['invalid'] += 1
+                print(f"❌ {path.name}: {'; '.join(errors)}")
+                continue
+            if not is_flat(data):
+                continue
+            report['flat'] += 1
+            if fix:
+                store.write(state, data['ticket_id'], normalize(data), path=path)
+                report['fixed'] += 1
+    return report
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="FIS 3.2 Ticket Model")
+    subparsers = parser.add_subparsers(dest='command')
+    check_parser = subparsers.add_parser('check', help='Validate tickets in the hub')
+    check_parser.add_argument('--state', action='append', help='Ticket state (repeatable, default: all)')
+    check_parser.add_argument('--fix', action='store_true', help='Rewrite legacy flat tickets in the nested format')
+    args = parser.parse_args()
+
+    if args.command == 'check':
+        from fis_lifecycle import TICKETS_DIR
+        from fis_storage import TicketStore
+        report = check_hub(TicketStore(TICKETS_DIR), args.state, args.fix)
+        print(f"✅ Checked {report['checked']} ticket(s): {report['invalid']} invalid, "
+              f"{report['flat']} legacy flat" + (f", {report['fixed']} rewritten" if args.fix else ""))
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+FIS 3.2 轻量级阶段计时 (trace spans)
+
+启用方式 (默认关闭)：
+    FIS_TRACE=1                      写入 ~/.openclaw/fis-hub/.fis3.1/trace.jsonl
+    FIS_TRACE=/path/to/trace.jsonl   写入指定文件
+    add_hook(fn)                     进程内回调，fn(record: dict)
+
+未启用时 span() 直接返回共享的空上下文，开销仅为一次判断。
+
+每个 span 一行 JSON：
+    {"trace": "...", "span": "...", "parent": "...", "name": "badge.save",
+     "start": 1771500000.123, "ms": 12.4, "pid": 1234, "attrs": {...}}
+
+子进程 (工牌渲染) 通过环境变量 FIS_TRACE_PARENT 继承 trace，可在同一文件中串联。
+
+统计：python3 fis_trace.py summary [trace.jsonl]
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+DEFAULT_TRACE_PATH = Path.home() / ".openclaw" / "fis-hub" / ".fis3.1" / "trace.jsonl"
+
+
+def _resolve_path(value):
+    if not value or value == '0':
+        return None
+    if value == '1':
+        return DEFAULT_TRACE_PATH
+    return Path(value).expanduser()
+
+
+_trace_path = _resolve_path(os.environ.get('FIS_TRACE'))
+_hooks = []
+_lock = threading.Lock()
+_local = threading.local()
+_fh = None
+
+
+def enabled():
+    return _trace_path is not None or bool(_hooks)
+
+
+def add_hook(fn):
+    """注册进程内 span 回调 (也会启用 tracing)"""
+    _hooks.append(fn)
+
+
+def remove_hook(fn):
+    if fn in _hooks:
+        _hooks.remove(fn)
+
+
+def set_trace_path(path):
+    """运行时切换输出文件，None 关闭文件输出"""
+    global _trace_path, _fh
+    with _lock:
+        if _fh is not None:
+            _fh.close()
+            _fh = None
+        _trace_path = Path(path) if path else None
+
+
+def _emit(record):
+    global _fh
+    if _trace_path is not None:
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+        with _lock:
+            if _fh is None:
+                _trace_path.parent.mkdir(parents=True, exist_ok=True)
+                _fh = open(_trace_path, 'a', buffering=1, encoding='utf-8')
+            _fh.write(line)
+    for hook in list(_hooks):
+        try:
+            hook(record)
+        except Exception:
+            pass
+
+
+def _stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        # 继承父进程传入的 trace 上下文
+        inherited = os.environ.get('FIS_TRACE_PARENT', '')
+        trace_id, _, span_id = inherited.partition(':')
+        stack = _local.stack = [(trace_id, span_id)] if trace_id else []
+    return stack
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    __slots__ = ('name', 'attrs', 'trace_id', 'span_id', 'parent_id', '_start', '_wall')
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        """在 span 结束前追加属性 (例如生成后的 ticket_id)"""
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        stack = _stack()
+        if stack:
+            self.trace_id, self.parent_id = stack[-1]
+        else:
+            self.trace_id, self.parent_id = os.urandom(8).hex(), None
+        self.span_id = os.urandom(4).hex()
+        stack.append((self.trace_id, self.span_id))
+        self._wall = time.time()
+        self._start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter_ns() - self._start
+        _stack().pop()
+        record = {
+            'trace': self.trace_id,
+            'span': self.span_id,
+            'parent': self.parent_id,
+            'name': self.name,
+            'start': round(self._wall, 6),
+            'ms': round(elapsed / 1e6, 3),
+            'pid': os.getpid(),
+        }
+        if self.attrs:
+            record['attrs'] = self.attrs
+        if exc_type is not None:
+            record['error'] = exc_type.__name__
+        _emit(record)
+        return False
+
+
+def span(name, **attrs):
+    """计时上下文：with span("ticket.write", ticket_id=...): ..."""
+    if _trace_path is None and not _hooks:
+        return _NOOP
+    return Span(name, attrs)
+
+
+def child_env():
+    """子进程环境变量：携带当前 trace 上下文；未启用时返回 None (继承默认环境)"""
+    if not enabled():
+        return None
+    env = dict(os.environ)
+    stack = _stack()
+    if stack:
+        env['FIS_TRACE_PARENT'] = f"{stack[-1][0]}:{stack[-1][1]}"
+    if _trace_path is not None:
+        env['FIS_TRACE'] = str(_trace_path)
+    return env
+
+
+def summarize(path):
+    """按 span 名称汇总 count / p50 / p95 / p99 / max (毫秒)"""
+    samples = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            samples.setdefault(record['name'], []).append(record['ms'])
+
+    summary = {}
+    for name, values in samples.items():
+        values.sort()
+        pick = lambda q: values[min(len(values) - 1, int(len(values) * q))]
+        summary[name] = {
+            'count': len(values),
+            'p50': pick(0.50),
+            'p95': pick(0.95),
+            'p99': pick(0.99),
+            'max': values[-1],
+        }
+    return summary
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="FIS 3.2 Trace Tools")
+    subparsers = parser.add_subparsers(dest='command')
+    summary_parser = subparsers.add_parser('summary', help='Per-stage latency percentiles')
+    summary_parser.add_argument('path', nargs='?', default=str(DEFAULT_TRACE_PATH))
+    args = parser.parse_args()
+
+    if args.command == 'summary':
+        stats = summarize(args.path)
+        print(f"{'span':<24} {'count':>7} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}  (ms)")
+        for name, s in sorted(stats.items(), key=lambda kv: -kv[1]['p99']):
+            print(f"{name:<24} {s['count']:>7} {s['p50']:>9.2f} {s['p95']:>9.2f} {s['p99']:>9.2f} {s['max']:>9.2f}")
+    else:
+        parser.print_help()
@@ -5,12 +5,12 @@ FIS 3.2.0 多 Worker + Reviewer 工作流示例
 """
 
 import json
-import subprocess
 import sys
+from datetime import datetime
 from pathlib import Path
 
-# 添加 lifecycle 模块路径
-sys.path.insert(0, str(Path.home() / ".openclaw" / "workspace" / "skills" / "fis-architecture" / "lib"))
+# lifecycle 与本文件同在 lib/ 下 (不依赖安装位置)
+sys.path.insert(0, str(Path(__file__).resolve().parent))
 from fis_lifecycle import SubAgentLifecycle
 
 def multi_worker_workflow():
@@ -56,14 +56,23 @@ def multi_worker_workflow():
         }
     ]
     
-    for config in worker_configs:
-        ticket_id, task = lifecycle.create_task(
-            agent_name=config["agent_name"],
-            task_desc=config["task_desc"],
-            role=config["role"],
-            output_requirements=config["outputs"],
-            deadline_days=1
-        )
+    # 一次 fan-out：并发写入 ticket、一个渲染进程生成全部工牌与拼接图、一条合并通知
+    print("\n🎨 Phase 1.5: 生成多工牌拼接图并发送")
+    created, multi_badge_path = lifecycle.create_tasks(
+        [
+            {
+                "agent_name": config["agent_name"],
+                "task_desc": config["task_desc"],
+                "role": config["role"],
+                "output_requirements": config["outputs"],
+                "deadline_days": 1,
+            }
+            for config in worker_configs
+        ],
+        collage_name="multi_worker_badges.png",
+        caption=f"🎫 多 Worker 任务工牌 ({len(worker_configs)}个)\n任务: 并行研究 MCP/QMD/Session\n点击放大查看各Worker任务详情",
+    )
+    for config, (ticket_id, task) in zip(worker_configs, created):
         workers.append({
             "name": config["agent_name"],
             "ticket": ticket_id,
@@ -74,50 +83,8 @@ def multi_worker_workflow():
         })
     
     print(f"\n✅ 已创建 {len(workers)} 个 Worker 任务")
-    
-    # ========== Phase 1.5: 生成拼接工牌并发送 ==========
-    print("\n🎨 Phase 1.5: 生成多工牌拼接图")
-    
-    # 导入拼接功能
-    sys.path.insert(0, str(Path.home() / ".openclaw" / "workspace" / "skills" / "fis-architecture" / "lib"))
-    from badge_generator_v7 import generate_multi_badge
-    
-    cards_data = [
-        {
-            "agent_name": w["name"],
-            "role": w["role"],
-            "task_desc": w["task_desc"],
-            "task_requirements": w["outputs"]
-        }
-        for w in workers
-    ]
-    
-    multi_badge_path = generate_multi_badge(cards_data, "multi_worker_badges.png")
     print(f"✅ 拼接工牌: {multi_badge_path}")
     
-    # 发送到 WhatsApp
-    print("\n📱 发送拼接工牌到 WhatsApp...")
-    allowed_dir = Path.home() / ".openclaw" / "workspace" / "output"
-    allowed_dir.mkdir(parents=True, exist_ok=True)
-    
-    import shutil
-    dst = allowed_dir / "multi_worker_badges.png"
-    shutil.copy2(multi_badge_path, dst)
-    
-    # 使用 openclaw CLI 发送
-    send_cmd = [
-        "openclaw", "message", "send",
-        "--channel", "whatsapp",
-        "--target", "+8618009073880",
-        "--media", str(dst),
-        "--message", f"🎫 多 Worker 任务工牌 ({len(workers)}个)\n任务: 并行研究 MCP/QMD/Session\n点击放大查看各Worker任务详情"
-    ]
-    try:
-        subprocess.run(send_cmd, capture_output=True, text=True, timeout=30)
-        print("✅ 拼接工牌已发送!")
-    except Exception as e:
-        print(f"📱 发送命令: {' '.join(send_cmd)}")
-    
     # ========== Phase 2: 并行启动 Workers ==========
     print("\n🔄 Phase 2: 并行启动 Workers")
     
@@ -194,5 +161,4 @@ def multi_worker_workflow():
 
 
 if __name__ == "__main__":
-    from datetime import datetime
     workflow = multi_worker_workflow()
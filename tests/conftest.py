@@ -0,0 +1,6 @@
+"""lib/ 下的模块按平铺方式导入 (与脚本运行时一致)"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "lib"))
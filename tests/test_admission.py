@@ -0,0 +1,115 @@
+"""准入控制：上限、排队、公平激活"""
+
+import itertools
+
+import pytest
+
+from fis_admission import (ActiveCounts, AdmissionController, AdmissionError, AdmissionLimits,
+                           fair_order, parse_limits)
+from fis_index import TicketIndex
+from fis_storage import TicketCache, TicketStore
+
+_seq = itertools.count()
+
+
+def package(parent, role="worker"):
+    n = next(_seq)
+    ticket_id = f"TASK_{parent.upper()}_20260220_0026{n % 60:02d}_{n:03d}K7Q9M2XA_a{n}"
+    return {"ticket_id": ticket_id, "parent": parent, "role": role, "status": "pending",
+            "task": {"description": "t", "created_at": f"2026-02-20T00:26:{n % 60:02d}", "status": "pending"}}
+
+
+@pytest.fixture
+def hub(tmp_path):
+    store = TicketStore(tmp_path / "tickets", cache=TicketCache())
+    index = TicketIndex(tmp_path / "index.db", store)
+
+    def controller(**limits):
+        return AdmissionController(store, index, AdmissionLimits(**limits), lock_path=tmp_path / "admission.lock")
+
+    def submit(admission, *packages):
+        with admission.slot(list(packages)) as (states, promoted):
+            for p, state in zip(packages, states):
+                store.create(state, p["ticket_id"], p)
+        return states, promoted
+
+    return store, index, controller, submit
+
+
+def test_parse_limits():
+    assert parse_limits("4") == ({}, 4)
+    assert parse_limits("worker=6, *=2") == ({"worker": 6}, 2)
+    assert parse_limits("") == ({}, 0)
+
+
+def test_unlimited_admits_everything(hub):
+    _, _, controller, submit = hub
+    states, promoted = submit(controller(), *[package("a") for _ in range(5)])
+    assert states == ["active"] * 5 and promoted == []
+
+
+def test_queue_then_promote_after_completion(hub):
+    store, index, controller, submit = hub
+    admission = controller(max_active=2)
+    first = [package("a") for _ in range(3)]
+    states, _ = submit(admission, *first)
+    assert states == ["active", "active", "queued"]
+    assert store.read("queued", first[2]["ticket_id"])["status"] == "queued"
+
+    assert admission.promote() == []           # 仍然满额
+    store.move(first[0]["ticket_id"], "active", "completed", {**first[0], "status": "completed"})
+    promoted = admission.promote()
+    assert [t["ticket_id"] for t in promoted] == [first[2]["ticket_id"]]
+    assert store.read("active", first[2]["ticket_id"])["status"] == "pending"
+    assert admission.stats()["queued"]["total"] == 0
+
+
+def test_new_tickets_do_not_jump_the_queue(hub):
+    store, _, controller, submit = hub
+    admission = controller(max_active=1)
+    waiting = package("a")
+    submit(admission, package("a"), waiting)
+    active_id = next(p.stem for p in store.iter_paths("active"))
+    store.move(active_id, "active", "completed", {"ticket_id": active_id, "status": "completed"})
+
+    newcomer = package("b")
+    states, promoted = submit(admission, newcomer)
+    assert [t["ticket_id"] for t in promoted] == [waiting["ticket_id"]]
+    assert states == ["queued"]
+
+
+def test_reject_mode_writes_nothing(hub):
+    store, _, controller, submit = hub
+    admission = controller(per_role={"reviewer": 1}, mode="reject")
+    submit(admission, package("a", "reviewer"))
+    with pytest.raises(AdmissionError) as err:
+        submit(admission, package("a", "worker"), package("a", "reviewer"))
+    assert err.value.scope == "role reviewer"
+    assert len(list(store.iter_paths("active"))) == 1
+
+
+def test_fair_order_prefers_least_active_parent():
+    limits = AdmissionLimits(max_active=4)
+    counts = ActiveCounts({("a", "worker"): 2})
+    queued = [dict(package("a"), queued_at=f"2026-02-20T00:00:0{i}") for i in range(3)]
+    queued += [dict(package("b"), queued_at=f"2026-02-20T00:00:1{i}") for i in range(2)]
+
+    chosen = fair_order(queued, counts, limits)
+    assert [t["parent"] for t in chosen] == ["b", "b"]
+    assert counts.total == 4
+
+
+def test_fair_order_role_limit_does_not_block_other_roles():
+    limits = AdmissionLimits(per_role={"reviewer": 1})
+    counts = ActiveCounts({("a", "reviewer"): 1})
+    reviewer = dict(package("a", "reviewer"), queued_at="2026-02-20T00:00:00")
+    worker = dict(package("a", "worker"), queued_at="2026-02-20T00:00:01")
+
+    assert fair_order([reviewer, worker], counts, limits) == [worker]
+
+
+def test_fair_order_fifo_within_parent():
+    limits = AdmissionLimits(per_parent=2)
+    queued = [dict(package("a"), queued_at=f"2026-02-20T00:00:0{i}") for i in (3, 1, 2)]
+    chosen = fair_order(queued, ActiveCounts(), limits)
+    assert [t["queued_at"][-1] for t in chosen] == ["1", "2"]
@@ -0,0 +1,52 @@
+"""TicketArchive 段写入 / 查找 / 日期过滤"""
+
+from fis_archive import TicketArchive
+
+
+def ticket(parent, day, n):
+    return {"ticket_id": f"{parent}-SA-2026-{n:04d}_{day}_000000_{n:04x}", "status": "completed"}
+
+
+def test_lookup_across_blocks(tmp_path):
+    archive = TicketArchive(tmp_path, codec="gzip", block_size=4)
+    tickets = [ticket("A", "20260110", n) for n in range(10)]
+    archive.write_segment(tickets)
+
+    assert archive.get(tickets[7]["ticket_id"]) == tickets[7]
+    assert archive.get("missing") is None
+    assert sorted(t["ticket_id"] for t in archive) == sorted(t["ticket_id"] for t in tickets)
+
+
+def test_date_filter_inside_overlapping_segment(tmp_path):
+    archive = TicketArchive(tmp_path, codec="gzip")
+    # ID 排序以父代理为主：首尾 ID 的日期不是段的日期范围
+    early, late, undated = ticket("A", "20260201", 1), ticket("B", "20260110", 2), {"ticket_id": "legacy"}
+    archive.write_segment([early, late, undated])
+
+    ids = lambda **kw: sorted(t["ticket_id"] for t in archive.iter_tickets(**kw))
+    assert ids(since="20260115") == sorted([early["ticket_id"], "legacy"])
+    assert ids(until="20260115") == sorted([late["ticket_id"], "legacy"])
+    assert ids(since="20260101", until="20260301") == sorted([early["ticket_id"], late["ticket_id"], "legacy"])
+    assert len(ids()) == 3
+
+
+def test_segment_outside_range_is_skipped(tmp_path):
+    archive = TicketArchive(tmp_path, codec="gzip")
+    archive.write_segment([ticket("A", "20260105", 1), ticket("A", "20260106", 2)])
+    assert list(archive.iter_tickets(since="20260201")) == []
+    assert len(list(archive.iter_tickets(until="20260105"))) == 1
+
+
+def test_compact_moves_old_completed_tickets(tmp_path):
+    from fis_storage import TicketCache, TicketStore
+
+    store = TicketStore(tmp_path / "tickets", cache=TicketCache())
+    old = {**ticket("A", "20200105", 1), "completed_at": "2020-01-05T10:00:00"}
+    store.create("completed", old["ticket_id"], old)
+    archive = TicketArchive(tmp_path / "archive", codec="gzip")
+
+    assert archive.compact(store, older_than_days=30, dry_run=True)[0] == 1
+    count, index_path = archive.compact(store, older_than_days=30)
+    assert count == 1 and index_path.exists()
+    assert store.locate("completed", old["ticket_id"]) is None
+    assert archive.get(old["ticket_id"]) == old
@@ -0,0 +1,73 @@
+"""TicketIndex 增量同步与查询"""
+
+import os
+
+from fis_archive import TicketArchive
+from fis_index import TicketIndex
+from fis_storage import TicketCache, TicketStore
+
+
+def ticket(n, role="worker", parent="p", day="20260220", deadline="2026-03-01T00:00:00"):
+    ticket_id = f"TASK_{parent.upper()}_{day}_0026{n:02d}_{n:03d}K7Q9M2XA_a{n}"
+    return {"ticket_id": ticket_id, "parent": parent, "role": role, "agent_id": f"a{n}", "status": "pending",
+            "task": {"description": f"task {n}", "created_at": f"2026-02-20T00:26:{n:02d}",
+                     "deadline": deadline, "status": "pending"}}
+
+
+def make(tmp_path):
+    store = TicketStore(tmp_path / "tickets", cache=TicketCache())
+    archive = TicketArchive(tmp_path / "tickets" / "archive", codec="gzip")
+    return store, archive, TicketIndex(tmp_path / "index.db", store, archive)
+
+
+def test_filters_sort_and_projection(tmp_path):
+    store, _, index = make(tmp_path)
+    for n, role in enumerate(["worker", "reviewer", "worker"]):
+        store.create("active", ticket(n, role)["ticket_id"], ticket(n, role))
+
+    total, rows = index.query(role="worker", sort="created_at", descending=True,
+                              fields=["agent_id", "task.description"])
+    assert total == 2
+    assert rows == [{"agent_id": "a2", "task.description": "task 2"},
+                    {"agent_id": "a0", "task.description": "task 0"}]
+    assert index.counts("active", ("role",)) == {("worker",): 2, ("reviewer",): 1}
+    assert index.query(text="TASK 1", fields=["agent_id"])[1] == [{"agent_id": "a1"}]
+
+
+def test_same_mtime_write_inside_racy_window_is_seen(tmp_path):
+    store, _, index = make(tmp_path)
+    first = ticket(1)
+    path = store.create("active", first["ticket_id"], first)
+    assert index.query(limit=0)[0] == 1
+
+    # 粗粒度 mtime：新文件写入后目录 mtime 不变
+    day_dir = path.parent
+    before = os.stat(day_dir)
+    second = ticket(2)
+    store.create("active", second["ticket_id"], second)
+    os.utime(day_dir, ns=(before.st_atime_ns, before.st_mtime_ns))
+
+    assert index.query(limit=0)[0] == 2
+
+
+def test_move_and_compaction_keep_one_row_per_ticket(tmp_path):
+    store, archive, index = make(tmp_path)
+    t = {**ticket(1), "completed_at": "2020-01-01T00:00:00"}
+    store.create("active", t["ticket_id"], t)
+    assert index.query(state="active", limit=0)[0] == 1
+
+    store.move(t["ticket_id"], "active", "completed", {**t, "status": "completed"})
+    assert index.query(state="active", limit=0)[0] == 0
+    assert index.query(state="completed", limit=0)[0] == 1
+
+    assert archive.compact(store, older_than_days=30)[0] == 1
+    total, rows = index.query(state="completed")
+    assert total == 1 and rows[0]["ticket_id"] == t["ticket_id"]
+
+
+def test_rebuild_after_deleting_index(tmp_path):
+    store, _, index = make(tmp_path)
+    store.create("active", ticket(1)["ticket_id"], ticket(1))
+    index.query()
+    assert index.rebuild() > 0
+    assert index.query(limit=0)[0] == 1
@@ -0,0 +1,109 @@
+"""Journal 追加 / 残行修复 / 按 seq 读取 / 重放 / 恢复"""
+
+from fis_journal import Journal
+from fis_storage import TicketCache, TicketStore
+
+TID = "TASK_P_20260220_002600_042K7Q9M2XA_w1"
+
+
+def make_journal(tmp_path):
+    return Journal(tmp_path / "journal.jsonl", fsync="off")
+
+
+def ticket(status="pending", **extra):
+    return {"ticket_id": TID, "parent": "p", "role": "worker", "status": status,
+            "task": {"description": "t", "created_at": "2026-02-20T00:26:00", "status": status}, **extra}
+
+
+def test_seq_continues_across_instances(tmp_path):
+    journal = make_journal(tmp_path)
+    assert [journal.append("created", f"t{i}") for i in range(3)] == [1, 2, 3]
+    journal.close()
+
+    other = make_journal(tmp_path)
+    assert other.append("created", "t3") == 4
+    assert [r["seq"] for r, _ in other.read()] == [1, 2, 3, 4]
+
+
+def test_torn_final_line_is_truncated_before_append(tmp_path):
+    journal = make_journal(tmp_path)
+    journal.append("created", "t1")
+    journal.close()
+    with open(journal.path, "ab") as f:
+        f.write(b'{"seq": 2, "event": "comp')
+
+    journal = make_journal(tmp_path)
+    assert journal.append("completed", "t1") == 2
+    records = [r for r, _ in journal.read()]
+    assert [(r["seq"], r["event"]) for r in records] == [(1, "created"), (2, "completed")]
+
+
+def test_read_skips_torn_tail_and_resumes_from_offset(tmp_path):
+    journal = make_journal(tmp_path)
+    for i in range(5):
+        journal.append("created", f"t{i}")
+    with open(journal.path, "ab") as f:
+        f.write(b'{"seq": 6')
+
+    records = list(journal.read(from_seq=3))
+    assert [r["seq"] for r, _ in records] == [3, 4, 5]
+    _, offset = records[0]
+    assert [r["seq"] for r, _ in journal.read(offset=offset)] == [4, 5]
+    assert journal.offset_for_seq(4) == offset
+
+
+def test_offset_for_seq_bisects_large_journal(tmp_path):
+    journal = make_journal(tmp_path)
+    for i in range(500):
+        journal.append("created", f"t{i}", detail_pad="x" * 40)
+    offset = journal.offset_for_seq(321)
+    assert next(journal.read(offset=offset))[0]["seq"] == 321
+
+
+def test_replay_feeds_listener_in_order(tmp_path):
+    journal = make_journal(tmp_path)
+    journal.on_lifecycle_event("created", ticket())
+    journal.on_lifecycle_event("verified", ticket(), complete=True)
+    journal.on_expiry("timeout", "mark", ticket("timeout"))
+
+    seen = []
+    last = journal.replay(lambda event, t, **detail: seen.append((event, t["ticket_id"], detail)))
+    assert last == 3
+    assert seen == [("created", TID, {}), ("verified", TID, {"complete": True}),
+                    ("expired", TID, {"kind": "timeout", "action": "mark"})]
+
+
+def test_recover_restores_missing_and_finishes_interrupted_move(tmp_path):
+    store = TicketStore(tmp_path / "tickets", cache=TicketCache())
+    journal = make_journal(tmp_path)
+
+    # 快照记录为 completed，文件仍在 active (移动中途崩溃)
+    store.create("active", TID, ticket())
+    journal.on_lifecycle_event("created", ticket())
+    journal.on_lifecycle_event("completed", ticket("completed"))
+
+    # 文件整个丢失
+    lost = TID.replace("w1", "w2")
+    journal.on_lifecycle_event("created", {**ticket(), "ticket_id": lost})
+
+    assert journal.recover(store, dry_run=True) == 2
+    assert store.locate("completed", TID) is None
+
+    assert journal.recover(store) == 2
+    assert store.locate("active", TID) is None
+    assert store.read("completed", TID)["status"] == "completed"
+    assert store.read("active", lost)["ticket_id"] == lost
+    assert journal.recover(store) == 0
+
+
+def test_recover_does_not_restore_archived_tickets(tmp_path):
+    from fis_archive import TicketArchive
+
+    store = TicketStore(tmp_path / "tickets", cache=TicketCache())
+    archive = TicketArchive(tmp_path / "archive", codec="gzip")
+    journal = make_journal(tmp_path)
+    journal.on_lifecycle_event("completed", ticket("completed"))
+    archive.write_segment([ticket("completed")])
+
+    assert journal.recover(store, archive) == 0
+    assert store.locate("completed", TID) is None
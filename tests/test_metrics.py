@@ -0,0 +1,43 @@
+"""HubMetrics 标签键与导出"""
+
+from fis_metrics import HubMetrics
+
+
+def ticket(parent, role, **extra):
+    return {"ticket_id": f"{parent}-t", "parent": parent, "role": role,
+            "task": {"created_at": "2026-01-01T10:00:00"}, **extra}
+
+
+def test_labels_with_separator_characters(tmp_path):
+    metrics = HubMetrics(tmp_path / "metrics.json")
+    odd = ticket('a|b "c"', "work|er")
+    metrics.on_lifecycle_event("created", odd)
+    metrics.on_lifecycle_event("rejected", odd)
+    metrics.on_lifecycle_event("completed", {**odd, "completed_at": "2026-01-01T10:05:00"})
+    metrics.on_expiry("timeout", "fail", ticket("p", "worker", completed_at="2026-01-01T11:00:00"))
+
+    text = metrics.render()
+    assert 'fis_tickets_created_total{parent="a|b \\"c\\"",role="work|er"} 1' in text
+    assert 'fis_admission_rejected_total{parent="a|b \\"c\\"",role="work|er"} 1' in text
+    assert 'outcome="complete"} 1' in text
+    assert 'fis_expiry_events_total{kind="timeout",action="fail"} 1' in text
+    assert "failed: 1" in metrics.summary()
+
+
+def test_legacy_pipe_keys_still_render(tmp_path):
+    metrics = HubMetrics(tmp_path / "metrics.json")
+    state = metrics.load()
+    state["created"] = {"cybermao|worker": 2}
+    state["completed"] = {"cybermao|worker|forced": 1}
+    text = metrics.render(state)
+    assert 'fis_tickets_created_total{parent="cybermao",role="worker"} 2' in text
+    assert "forced completions: 1" in metrics.summary(state)
+
+
+def test_backlog_tracks_queue_activation(tmp_path):
+    metrics = HubMetrics(tmp_path / "metrics.json")
+    metrics.on_lifecycle_event("created", ticket("p", "worker", status="queued"))
+    assert metrics.load()["queued"] == {"p": 1}
+    metrics.on_lifecycle_event("activated", ticket("p", "worker"))
+    state = metrics.load()
+    assert state["queued"] == {"p": 0} and state["backlog"] == {"p": 1}
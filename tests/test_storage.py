@@ -0,0 +1,89 @@
+"""TicketStore 分片路径查找 / 迁移"""
+
+import pytest
+
+from fis_storage import TicketCache, TicketStore
+
+TID = "CYBERMAO-SA-2026-0001_20260220_002600_abcd"
+
+
+def make_store(root, buckets=0):
+    return TicketStore(root, buckets=buckets, cache=TicketCache())
+
+
+@pytest.mark.parametrize("before, after", [(0, 16), (16, 0), (4, 16)])
+def test_locate_after_bucket_count_change(tmp_path, before, after):
+    path = make_store(tmp_path, before).create("active", TID, {"ticket_id": TID})
+
+    store = make_store(tmp_path, after)
+    assert store.locate("active", TID) == path
+    assert store.read("active", TID)["ticket_id"] == TID
+    # 改写保持原路径，不产生第二份
+    assert store.write("active", TID, {"ticket_id": TID, "n": 1}) == path
+    assert list(store.iter_paths("active")) == [path]
+
+
+def test_locate_legacy_flat_and_migrate(tmp_path):
+    legacy = tmp_path / "active" / f"{TID}.json"
+    legacy.parent.mkdir(parents=True)
+    legacy.write_text(f'{{"ticket_id": "{TID}"}}')
+
+    store = make_store(tmp_path, 16)
+    assert store.locate("active", TID) == legacy
+    assert store.migrate(dry_run=True) == 1
+    assert legacy.exists()
+
+    assert store.migrate() == 1
+    assert not legacy.exists()
+    assert store.locate("active", TID) == store.path_for("active", TID)
+    assert store.read("active", TID) == {"ticket_id": TID}
+
+
+def test_undated_ticket_sharding(tmp_path):
+    store = make_store(tmp_path, 8)
+    path = store.create("active", "legacy-id", {"ticket_id": "legacy-id"})
+    assert "undated" in path.parts
+    assert make_store(tmp_path, 0).locate("active", "legacy-id") == path
+
+
+def test_create_is_exclusive(tmp_path):
+    store = make_store(tmp_path)
+    store.create("active", TID, {"ticket_id": TID})
+    with pytest.raises(FileExistsError):
+        store.create("active", TID, {"ticket_id": TID, "other": True})
+    assert store.read("active", TID) == {"ticket_id": TID}
+
+
+def test_move_and_date_range(tmp_path):
+    store = make_store(tmp_path)
+    other = "CYBERMAO-SA-2026-0002_20260301_000000_ef01"
+    for tid in (TID, other):
+        store.create("active", tid, {"ticket_id": tid})
+    store.move(TID, "active", "completed", {"ticket_id": TID, "status": "completed"})
+
+    assert store.locate("active", TID) is None
+    assert store.read("completed", TID)["status"] == "completed"
+    assert [p.stem for p in store.iter_paths("active", since="20260301")] == [other]
+    assert list(store.iter_paths("active", until="20260228")) == []
+
+
+def test_cache_sees_external_rewrite(tmp_path):
+    store = make_store(tmp_path)
+    path = store.create("active", TID, {"ticket_id": TID})
+    assert store.read("active", TID) == {"ticket_id": TID}
+    path.write_text(f'{{"ticket_id": "{TID}", "edited": true}}')
+    assert store.read("active", TID)["edited"] is True
+
+
+def test_concurrent_writes_same_ticket(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    store = make_store(tmp_path)
+    store.create("active", TID, {"ticket_id": TID})
+    payloads = [{"ticket_id": TID, "writer": i, "pad": "x" * 20000} for i in range(32)]
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(lambda data: store.write("active", TID, data), payloads))
+
+    path = store.locate("active", TID)
+    assert TicketStore(tmp_path, cache=TicketCache(0)).read("active", TID) in payloads
+    assert list(path.parent.glob("*.tmp")) == []